@@ -2,6 +2,7 @@ from loguru import logger
 
 from sc2 import maps
 from sc2.bot_ai import BotAI
+from sc2.combat_simulator import simulate_fight
 from sc2.data import Difficulty, Race
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.main import run_game
@@ -31,6 +32,13 @@ class FightBot(BotAI):
 
         if (self.units or self.structures) and (self.enemy_units or self.enemy_structures):
             self.enemy_location = (self.enemy_units + self.enemy_structures).center
+            if not self.fight_started:
+                # Offline prediction of the fight, to compare it with the outcome in the game
+                distance = 0
+                if self.units and self.enemy_units:
+                    distance = self.units.center.distance_to(self.enemy_units.center)
+                prediction = simulate_fight(self.units, self.enemy_units, self.game_data, distance=distance)
+                logger.info(f"Predicted outcome: {prediction.outcome}, remaining army value: {prediction.army_value}")
             self.fight_started = True
 
         await self.manage_enemy_units()
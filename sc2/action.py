@@ -1,7 +1,6 @@
 from __future__ import annotations
 
-from itertools import groupby
-from typing import TYPE_CHECKING, Union
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple, Union
 
 from s2clientprotocol import raw_pb2 as raw_pb
 
@@ -13,8 +12,35 @@ if TYPE_CHECKING:
     from sc2.unit_command import UnitCommand
 
 
+def group_actions(action_iter: Iterable[UnitCommand]) -> List[Tuple[tuple, List[UnitCommand]]]:
+    """Groups unit commands by their combining_tuple, regardless of their order in 'action_iter'.
+    The commands of each unit stay in their original order: a command is only added to an existing group
+    if that group is not before the group of the previous command of the same unit, otherwise a new group is started.
+
+    Example: unit A moves and then queues an attack, unit B queues the same attack and then moves to the same point.
+    This results in 3 groups: [move A], [attack A and B], [move B]
+
+    :param action_iter:"""
+    groups: List[Tuple[tuple, List[UnitCommand]]] = []
+    # combining_tuple -> index of the latest group with that combining_tuple
+    latest_group_index: Dict[tuple, int] = {}
+    # unit tag -> index of the group which contains the latest command of that unit
+    unit_group_index: Dict[int, int] = {}
+    for action in action_iter:
+        key = action.combining_tuple
+        tag: int = action.unit.tag
+        index = latest_group_index.get(key, -1)
+        if index == -1 or index < unit_group_index.get(tag, -1):
+            index = len(groups)
+            groups.append((key, []))
+            latest_group_index[key] = index
+        groups[index][1].append(action)
+        unit_group_index[tag] = index
+    return groups
+
+
 # pylint: disable=R0912
-def combine_actions(action_iter):
+def combine_actions(action_iter: Iterable[UnitCommand]):
     """
     Example input:
     [
@@ -23,8 +49,10 @@ def combine_actions(action_iter):
         UnitCommand(AbilityId.TRAINQUEEN_QUEEN, Unit(name='Lair', tag=4359979012), None, False),
         UnitCommand(AbilityId.TRAINQUEEN_QUEEN, Unit(name='Hatchery', tag=4359454723), None, False),
     ]
+
+    Commands with the same combining_tuple are combined even if they are not adjacent in 'action_iter', see group_actions
     """
-    for key, items in groupby(action_iter, key=lambda a: a.combining_tuple):
+    for key, items in group_actions(action_iter):
         ability: AbilityId
         target: Union[None, Point2, Unit]
         queue: bool
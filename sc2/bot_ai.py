@@ -1,16 +1,19 @@
 # pylint: disable=W0212,R0916,R0904
 from __future__ import annotations
 
+import asyncio
 import math
 import random
 import warnings
 from collections import Counter
 from functools import cached_property
-from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple, Union
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
 
+import numpy as np
 from loguru import logger
 
 from sc2.bot_ai_internal import BotAIInternal
+from sc2.bot_executor import SharedSnapshot
 from sc2.cache import property_cache_once_per_frame
 from sc2.constants import (
     CREATION_ABILITY_FIX,
@@ -30,6 +33,8 @@ from sc2.ids.ability_id import AbilityId
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.ids.upgrade_id import UpgradeId
 from sc2.position import Point2
+from sc2.shared_memory import SharedArrayHandle
+from sc2.step_scheduler import ScheduledTask
 from sc2.unit import Unit
 from sc2.units import Units
 
@@ -1164,6 +1169,101 @@ class BotAI(BotAIInternal):
         assert isinstance(message, str), f"{message} is not a string"
         await self.client.chat_send(message, team_only)
 
+    def schedule(
+        self,
+        function: Callable[[], Awaitable[Any]],
+        every_game_loops: int,
+        priority: int = 0,
+        max_delay: Optional[int] = None,
+        name: Optional[str] = None,
+    ) -> ScheduledTask:
+        """Runs the coroutine function 'function' every 'every_game_loops' game loops after on_step.
+        In realtime games, the task only runs if the step has time left, see StepScheduler.
+        Otherwise it is postponed to the next step, so the bot does not miss observations.
+        In other games SC2 waits for the bot, so the task always runs at its cadence.
+        Useful for expensive work which does not have to run every step, e.g. re-planning expansions.
+
+        Example::
+
+            async def on_start(self):
+                self.schedule(self.plan_expansions, every_game_loops=224, priority=1)
+                self.schedule(self.update_influence_map, every_game_loops=16, max_delay=64)
+
+        :param function: Coroutine function without arguments
+        :param every_game_loops: Target cadence in game loops, 22.4 game loops are one second
+        :param priority: Tasks with higher priority are run first
+        :param max_delay: Realtime only: if set, the task is run even without time left once it is this many game loops overdue
+        :param name: Name used in warnings about tasks exceeding the step budget"""
+        return self.scheduler.add(
+            function,
+            every_game_loops,
+            priority=priority,
+            max_delay=max_delay,
+            name=name,
+            start_game_loop=self.state.game_loop if hasattr(self, "state") else 0,
+        )
+
+    def unschedule(self, task: ScheduledTask):
+        """Removes a task which was added with self.schedule
+
+        :param task:"""
+        self.scheduler.remove(task)
+
+    def run_in_executor(self, function: Callable[..., Any], *args, **kwargs) -> asyncio.Future:
+        """Runs 'function(*args, **kwargs)' in a worker process of self.executor, so it does not block the game loop.
+        Requires 'self.executor_workers' to be set before the game starts.
+        The returned future can be awaited directly or kept and checked with 'future.done()' in a later step.
+        With processes, the function has to be defined at module level and its arguments have to be picklable.
+        Large arrays should be passed as shared memory handles, see self.share_snapshot and self.share_array.
+
+        Example::
+
+            # At module level
+            def find_path(snapshot: SharedSnapshot, start: Tuple[int, int], goal: Tuple[int, int]) -> List[Tuple[int, int]]:
+                with snapshot.pathing_grid.open() as pathing_grid:
+                    ...
+
+            class MyBot(BotAI):
+                def __init__(self):
+                    self.executor_workers = 2
+
+                async def on_step(self, iteration: int):
+                    if iteration % 16 == 0:
+                        self.path_future = self.run_in_executor(find_path, self.share_snapshot(), start, goal)
+                    if self.path_future is not None and self.path_future.done():
+                        path = self.path_future.result()
+
+        :param function:
+        :param args:
+        :param kwargs:"""
+        assert self.executor is not None, "Set 'self.executor_workers' to a positive number before the game starts"
+        return self.executor.submit(function, *args, **kwargs)
+
+    def share_array(self, name: str, array: np.ndarray) -> SharedArrayHandle:
+        """Copies 'array' into the shared memory block 'name' and returns a picklable handle for self.run_in_executor.
+        The block is updated in place by later calls with the same name, shape and dtype.
+
+        :param name:
+        :param array:"""
+        assert self.executor is not None, "Set 'self.executor_workers' to a positive number before the game starts"
+        return self.executor.share(name, array)
+
+    def share_snapshot(self) -> SharedSnapshot:
+        """Copies the pathing grid, placement grid, terrain height and the positions and tags of all units
+        into shared memory and returns their handles, see self.run_in_executor."""
+        if self.unit_snapshot is not None:
+            unit_tags = self.unit_snapshot["tag"]
+        else:
+            unit_tags = np.fromiter((unit.tag for unit in self.all_units), dtype=np.uint64, count=len(self.all_units))
+        return SharedSnapshot(
+            game_loop=self.state.game_loop,
+            pathing_grid=self.share_array("pathing_grid", self.game_info.pathing_grid.data_numpy),
+            placement_grid=self.share_array("placement_grid", self.game_info.placement_grid.data_numpy),
+            terrain_height=self.share_array("terrain_height", self.game_info.terrain_height.data_numpy),
+            unit_positions=self.share_array("unit_positions", self._unit_positions),
+            unit_tags=self.share_array("unit_tags", unit_tags),
+        )
+
     def in_map_bounds(self, pos: Union[Point2, tuple, list]) -> bool:
         """Tests if a 2 dimensional point is within the map boundaries of the pixelmaps.
 
@@ -1297,6 +1397,20 @@ class BotAI(BotAIInternal):
         :param amount_damage_taken:
         """
 
+    async def on_units_took_damage(self, damaged_units: List[Tuple[Unit, float]]):
+        """
+        Override this in your bot class. Same as on_unit_took_damage, but called once per frame with all own units
+        which took damage this frame, so large battles do not cost one call per unit.
+        It is only called if at least one unit took damage.
+
+        Examples::
+
+            total_damage = sum(amount for _unit, amount in damaged_units)
+            print(f"{len(damaged_units)} of my units took {total_damage} damage")
+
+        :param damaged_units: Pairs of unit and the amount of damage it took
+        """
+
     async def on_enemy_unit_entered_vision(self, unit: Unit):
         """
         Override this in your bot class. This function is called when an enemy unit (unit or structure) entered vision (which was not visible last frame).
@@ -8,14 +8,16 @@ import warnings
 from abc import ABC
 from collections import Counter
 from contextlib import suppress
+from pathlib import Path
 from typing import TYPE_CHECKING, Any
 from typing import Counter as CounterType
-from typing import Dict, Generator, Iterable, List, Set, Tuple, Union, final
+from typing import Dict, Generator, Iterable, List, Optional, Set, Tuple, Union, final
 
 import numpy as np
 from loguru import logger
 from s2clientprotocol import sc2api_pb2 as sc_pb
 
+from sc2.bot_executor import BotExecutor
 from sc2.cache import property_cache_once_per_frame
 from sc2.constants import (
     ALL_GAS,
@@ -33,20 +35,58 @@ from sc2.game_state import Blip, EffectData, GameState
 from sc2.ids.ability_id import AbilityId
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.ids.upgrade_id import UpgradeId
+from sc2.map_analysis import RAMP_OPTIONAL_POSITIONS, RAMP_POSITION_SETS, MapAnalysis, map_analysis_path
 from sc2.pixel_map import PixelMap
 from sc2.position import Point2
+from sc2.shared_memory import SharedGrids
+from sc2.step_profiler import StepProfiler
+from sc2.step_scheduler import StepScheduler
 from sc2.unit import Unit
 from sc2.unit_command import UnitCommand
+from sc2.unit_events import (
+    EVENT_HOOKS,
+    GROUP_ENEMY_STRUCTURES,
+    GROUP_ENEMY_UNITS,
+    GROUP_OWN_STRUCTURES,
+    GROUP_OWN_UNITS,
+    UnitFrame,
+    UnitFrameDiff,
+    diff_unit_frames,
+)
+from sc2.unit_snapshot import UnitSnapshot
 from sc2.units import Units
 
 with warnings.catch_warnings():
     warnings.simplefilter("ignore")
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    from scipy.spatial import cKDTree
     from scipy.spatial.distance import cdist, pdist
 
 if TYPE_CHECKING:
     from sc2.client import Client
     from sc2.game_info import GameInfo
 
+# Used by distance_calculation_method 4: above this amount of units, no distance matrix is calculated
+DISTANCE_MATRIX_MAX_UNITS = 400
+
+# Used by persistent_units: units that were not seen for this many game loops lose their Unit object (3 minutes)
+# Their death is not always reported, e.g. enemies that die in the fog of war or units that merge into another unit
+PERSISTENT_UNITS_MAX_AGE = 4032
+# Game loops between two checks for units that were not seen for PERSISTENT_UNITS_MAX_AGE game loops
+PERSISTENT_UNITS_PRUNE_INTERVAL = 224
+
+# Unit type categories used in _prepare_units_from_snapshot, 0 means no category
+_CATEGORY_MINERAL_FIELD = 1
+_CATEGORY_VESPENE_GEYSER = 2
+_CATEGORY_TOWNHALL = 3
+_CATEGORY_GAS_BUILDING = 4
+_CATEGORY_TECHLAB = 5
+_CATEGORY_REACTOR = 6
+_CATEGORY_WORKER = 7
+_CATEGORY_LARVA = 8
+_CATEGORY_WATCHTOWER = 9
+
 
 class BotAIInternal(ABC):
     """Base class for bots."""
@@ -67,6 +107,61 @@ class BotAIInternal(ABC):
         # Select if the Unit.command should return UnitCommand objects. Set this to True if your bot uses 'self.do(unit(ability, target))'
         if not hasattr(self, "unit_command_uses_self_do"):
             self.unit_command_uses_self_do: bool = False
+        # Set this to True to store all units of a frame in a numpy based snapshot, see self.unit_snapshot
+        # Then Unit objects and Units groups like self.mineral_field are only created when they are accessed
+        if not hasattr(self, "use_unit_snapshot"):
+            self.use_unit_snapshot: bool = False
+        self.unit_snapshot: UnitSnapshot = None
+        # Set this to True to keep one Unit object per tag across frames, which is refreshed with the raw unit of each frame
+        # Caches that only depend on the unit type survive, but Unit objects from earlier frames show the values of the current frame
+        if not hasattr(self, "persistent_units"):
+            self.persistent_units: bool = False
+        self._persistent_units: Dict[int, Unit] = {}
+        self._persistent_units_next_prune: int = 0
+        # Select how the pathing grid is updated each step, see _should_request_game_info function
+        if not hasattr(self, "pathing_grid_update_method"):
+            self.pathing_grid_update_method: int = 0
+        # Used by pathing_grid_update_method 1: amount of game loops after which a new game info is requested
+        if not hasattr(self, "game_info_request_interval"):
+            self.game_info_request_interval: int = 16
+        # Set this to True to send the action, debug, step and observation requests back to back without waiting for each response
+        # This saves round trips to the SC2 client each step, but errors of actions are not logged. Only used if realtime=False
+        if not hasattr(self, "pipeline_requests"):
+            self.pipeline_requests: bool = False
+        # Set this to a StepProfiler to record how long each phase of each iteration takes, see step_profiler.py
+        if not hasattr(self, "step_profiler"):
+            self.step_profiler: Optional[StepProfiler] = None
+        # Set this to the amount of worker processes (or threads) of self.executor, see self.run_in_executor. 0 disables the executor
+        if not hasattr(self, "executor_workers"):
+            self.executor_workers: int = 0
+        # Set this to False to use threads instead of processes in self.executor
+        if not hasattr(self, "executor_uses_processes"):
+            self.executor_uses_processes: bool = True
+        self.executor: Optional[BotExecutor] = None
+        # Set this to a name that is unique on this machine to publish the pathing grid, placement grid, terrain height,
+        # visibility and creep in shared memory each step, so other processes can read them with SharedGridsReader(name)
+        if not hasattr(self, "shared_grids_name"):
+            self.shared_grids_name: Optional[str] = None
+        self.shared_grids: Optional[SharedGrids] = None
+        # Runs the tasks added with self.schedule, set 'self.scheduler.budget_fraction' to change the time a step may take
+        if not hasattr(self, "scheduler"):
+            self.scheduler: StepScheduler = StepScheduler()
+        # Set this to a directory to store expansion locations, ramps and vision blockers per map and start location
+        # On maps that were played before, they are then loaded in _prepare_first_step instead of being calculated
+        if not hasattr(self, "map_analysis_cache_dir"):
+            self.map_analysis_cache_dir: Optional[Union[str, Path]] = None
+        self._game_info_game_loop: int = -1
+        self._game_info_refresh_required: bool = False
+        self._pathing_grid_base: PixelMap = None
+        self._pathing_grid_base_structures: Dict[Tuple[int, Tuple[float, float]], Tuple[int, int, int, int, bool]] = {}
+        self._pathing_grid_base_destructables: Set[int] = set()
+        self._lazy_unit_groups: Dict[str, np.ndarray] = {}
+        self._cached_unit_positions: np.ndarray = None
+        self._cached_spatial_index: cKDTree = None
+        self._cached_distance_rows: Dict[int, np.ndarray] = {}
+        self._previous_distance_row_miss: Tuple[int, int] = (-1, -1)
+        self._unit_type_categories: np.ndarray = np.zeros(1, dtype=np.int8)
+        self._unit_type_is_structure: np.ndarray = np.zeros(1, dtype=bool)
         # This value will be set to True by main.py in self._prepare_start if game is played in realtime (if true, the bot will have limited time per step)
         self.realtime: bool = False
         self.base_build: int = -1
@@ -106,11 +201,9 @@ class BotAIInternal(ABC):
         self._generated_frame = -100
         self._units_created: Counter = Counter()
         self._unit_tags_seen_this_game: Set[int] = set()
-        self._units_previous_map: Dict[int, Unit] = {}
-        self._structures_previous_map: Dict[int, Unit] = {}
-        self._enemy_units_previous_map: Dict[int, Unit] = {}
-        self._enemy_structures_previous_map: Dict[int, Unit] = {}
-        self._all_units_previous_map: Dict[int, Unit] = {}
+        # Columns of the units of the current and previous frame which are compared in issue_events
+        self._unit_frame: UnitFrame = None
+        self._previous_unit_frame: UnitFrame = None
         self._previous_upgrades: Set[UpgradeId] = set()
         self._expansion_positions_list: List[Point2] = []
         self._resource_location_to_expansion_position_dict: Dict[Point2, Point2] = {}
@@ -179,72 +272,72 @@ class BotAIInternal(ABC):
 
         # Distance we group resources by
         resource_spread_threshold: float = 8.5
-        # Create a group for every resource
-        resource_groups: List[List[Unit]] = [
-            [resource] for resource in self.resources
+        resources: List[Unit] = [
+            resource for resource in self.resources
             if resource.name != "MineralField450"  # dont use low mineral count patches
         ]
-        # Loop the merging process as long as we change something
-        merged_group = True
-        height_grid: PixelMap = self.game_info.terrain_height
-        while merged_group:
-            merged_group = False
-            # Check every combination of two groups
-            for group_a, group_b in itertools.combinations(resource_groups, 2):
-                # Check if any pair of resource of these groups is closer than threshold together
-                # And that they are on the same terrain level
-                if any(
-                    resource_a.distance_to(resource_b) <= resource_spread_threshold
-                    # check if terrain height measurement at resources is within 10 units
-                    # this is since some older maps have inconsistent terrain height
-                    # tiles at certain expansion locations
-                    and abs(height_grid[resource_a.position.rounded] - height_grid[resource_b.position.rounded]) <= 10
-                    for resource_a, resource_b in itertools.product(group_a, group_b)
-                ):
-                    # Remove the single groups and add the merged group
-                    resource_groups.remove(group_a)
-                    resource_groups.remove(group_b)
-                    resource_groups.append(group_a + group_b)
-                    merged_group = True
-                    break
+        if not resources:
+            return
+        positions: np.ndarray = np.array([resource.position_tuple for resource in resources], dtype=np.float64)
+        # Terrain height at the rounded (floored) resource positions
+        heights: np.ndarray = self.game_info.terrain_height.data_numpy[
+            np.floor(positions[:, 1]).astype(int), np.floor(positions[:, 0]).astype(int)
+        ].astype(int)
+        # Connect all pairs of resources which are closer than threshold together
+        # And that are on the same terrain level
+        pairs: np.ndarray = cKDTree(positions).query_pairs(resource_spread_threshold + 1e-6, output_type="ndarray")
+        pairs = pairs[(((positions[pairs[:, 0]] - positions[pairs[:, 1]])**2).sum(axis=1)
+                       <= resource_spread_threshold**2)
+                      # check if terrain height measurement at resources is within 10 units
+                      # this is since some older maps have inconsistent terrain height
+                      # tiles at certain expansion locations
+                      & (np.abs(heights[pairs[:, 0]] - heights[pairs[:, 1]]) <= 10)]
+        # Each connected component of resources is one resource group
+        amount_of_groups, group_labels = connected_components(
+            coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(len(resources), len(resources))),
+            directed=False,
+        )
         # Distance offsets we apply to center of each resource group to find expansion position
         offset_range = 7
-        offsets = [
-            (x, y) for x, y in itertools.product(range(-offset_range, offset_range + 1), repeat=2)
-            if 4 < math.hypot(x, y) <= 8
-        ]
-        # Dict we want to return
-        centers = {}
+        offsets: np.ndarray = np.array(
+            [
+                (x, y) for x, y in itertools.product(range(-offset_range, offset_range + 1), repeat=2)
+                if 4 < math.hypot(x, y) <= 8
+            ],
+            dtype=np.float64,
+        )
+        placement_grid: np.ndarray = self.game_info.placement_grid.data_numpy
+        is_geyser: np.ndarray = np.array([resource._proto.unit_type in geyser_ids for resource in resources])
         # For every resource group:
-        for resources in resource_groups:
-            # Possible expansion points
-            amount = len(resources)
+        for group_label in range(amount_of_groups):
+            group_indices: np.ndarray = np.flatnonzero(group_labels == group_label)
+            group_positions: np.ndarray = positions[group_indices]
             # Calculate center, round and add 0.5 because expansion location will have (x.5, y.5)
             # coordinates because bases have size 5.
-            center_x = int(sum(resource.position.x for resource in resources) / amount) + 0.5
-            center_y = int(sum(resource.position.y for resource in resources) / amount) + 0.5
-            possible_points = (Point2((offset[0] + center_x, offset[1] + center_y)) for offset in offsets)
-            # Filter out points that are too near
-            possible_points = (
-                point for point in possible_points
-                # Check if point can be built on
-                if self.game_info.placement_grid[point.rounded] == 1
-                # Check if all resources have enough space to point
-                and all(
-                    point.distance_to(resource) >= (7 if resource._proto.unit_type in geyser_ids else 6)
-                    for resource in resources
-                )
-            )
-            # Choose best fitting point
-            result: Point2 = min(
-                possible_points, key=lambda point: sum(point.distance_to(resource_) for resource_ in resources)
-            )
-            centers[result] = resources
+            center_x = int(group_positions[:, 0].sum() / len(group_indices)) + 0.5
+            center_y = int(group_positions[:, 1].sum() / len(group_indices)) + 0.5
+            # Possible expansion points
+            possible_points: np.ndarray = offsets + (center_x, center_y)
+            # Check if point can be built on
+            possible_points = possible_points[placement_grid[np.floor(possible_points[:, 1]).astype(int),
+                                                             np.floor(possible_points[:, 0]).astype(int)] == 1]
+            # Distances of shape (possible points, resources), differences are multiples of 0.5 so the distances are exact
+            differences: np.ndarray = possible_points[:, None, :] - group_positions[None, :, :]
+            distances: np.ndarray = np.sqrt((differences**2).sum(axis=2))
+            # Filter out points that are too near: check if all resources have enough space to point
+            required_distances: np.ndarray = np.where(is_geyser[group_indices], 7, 6)
+            valid: np.ndarray = (distances >= required_distances).all(axis=1)
+            possible_points, distances = possible_points[valid], distances[valid]
+            # Choose best fitting point, the distances are summed up resource by resource like python's sum()
+            distance_sums: np.ndarray = np.zeros(len(possible_points))
+            for resource_distances in distances.T:
+                distance_sums += resource_distances
+            result: Point2 = Point2(possible_points[np.argmin(distance_sums)].tolist())
             # Put all expansion locations in a list
             self._expansion_positions_list.append(result)
             # Maps all resource positions to the expansion position
-            for resource in resources:
-                self._resource_location_to_expansion_position_dict[resource.position] = result
+            for index in group_indices.tolist():
+                self._resource_location_to_expansion_position_dict[resources[index].position] = result
 
     @final
     def _correct_zerg_supply(self):
@@ -411,16 +504,19 @@ class BotAIInternal(ABC):
         return r
 
     @final
-    async def _do_actions(self, actions: List[UnitCommand], prevent_double: bool = True):
+    async def _do_actions(
+        self, actions: List[UnitCommand], prevent_double: bool = True, wait_for_response: bool = True
+    ):
         """Used internally by main.py automatically, use self.do() instead!
 
         :param actions:
-        :param prevent_double:"""
+        :param prevent_double:
+        :param wait_for_response:"""
         if not actions:
             return None
         if prevent_double:
             actions = list(filter(self.prevent_double_actions, actions))
-        result = await self.client.actions(actions)
+        result = await self.client.actions(actions, wait_for_response=wait_for_response)
         return result
 
     @final
@@ -474,38 +570,135 @@ class BotAIInternal(ABC):
             self.enemy_race: Race = Race(self.game_info.player_races[3 - self.player_id])
 
         self._distances_override_functions(self.distance_calculation_method)
+        assert 0 <= self.pathing_grid_update_method <= 2, f"Selected method was: {self.pathing_grid_update_method}"
+
+        self._create_unit_type_lookup_tables()
+
+        if self.executor_workers > 0:
+            self.executor = BotExecutor(self.executor_workers, use_processes=self.executor_uses_processes)
+            self.executor.start()
+
+    @final
+    def _release_resources(self):
+        """ Called by main.py at the end of the game. Stops the worker pool and frees all shared memory. """
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        if self.shared_grids is not None:
+            self.shared_grids.close()
+            self.shared_grids = None
 
     @final
     def _prepare_first_step(self):
         """First step extra preparations. Must not be called before _prepare_step."""
         if self.townhalls:
             self.game_info.player_start_location = self.townhalls.first.position
-            # Calculate and cache expansion locations forever inside 'self._cache_expansion_locations', this is done to prevent a bug when this is run and cached later in the game
-            self._find_expansion_locations()
-        self.game_info.map_ramps, self.game_info.vision_blockers = self.game_info._find_ramps_and_vision_blockers()
+        map_analysis_file: Optional[Path] = None
+        if self.map_analysis_cache_dir is not None:
+            map_analysis_file = map_analysis_path(
+                self.map_analysis_cache_dir, self.game_info, self.game_info.player_start_location
+            )
+        if map_analysis_file is None or not self._load_map_analysis(map_analysis_file):
+            if self.townhalls:
+                # Calculate and cache expansion locations forever inside 'self._cache_expansion_locations', this is done to prevent a bug when this is run and cached later in the game
+                self._find_expansion_locations()
+            self.game_info.map_ramps, self.game_info.vision_blockers = self.game_info._find_ramps_and_vision_blockers()
+            if map_analysis_file is not None:
+                self._save_map_analysis(map_analysis_file)
         self._time_before_step: float = time.perf_counter()
 
     @final
-    def _prepare_step(self, state, proto_game_info):
+    def _load_map_analysis(self, path: Path) -> bool:
+        """Sets expansion locations, ramps and vision blockers from the cache file at 'path', see self.map_analysis_cache_dir.
+        Returns False if the file could not be used.
+
+        :param path:"""
+        map_analysis: Optional[MapAnalysis] = MapAnalysis.load(path)
+        if map_analysis is None:
+            return False
+        # The resources of the map have to match the resources that were used for the expansion locations
+        if self.townhalls and set(map_analysis.resource_to_expansion) != {
+            resource.position
+            for resource in self.resources if resource.name != "MineralField450"
+        }:
+            logger.warning(f"Resources do not match the map analysis in {path}, the map analysis is calculated again")
+            return False
+        self._expansion_positions_list = map_analysis.expansion_locations
+        self._resource_location_to_expansion_position_dict = map_analysis.resource_to_expansion
+        self.game_info.map_ramps = map_analysis.ramps(self.game_info)
+        self.game_info.vision_blockers = map_analysis.vision_blockers
+        if map_analysis.main_base_ramp_index != -1:
+            # Fill the cached property, see functools.cached_property
+            self.__dict__["main_base_ramp"] = self.game_info.map_ramps[map_analysis.main_base_ramp_index]
+        return True
+
+    @final
+    def _save_map_analysis(self, path: Path):
+        """Saves expansion locations, ramps and vision blockers to the cache file at 'path', see self.map_analysis_cache_dir.
+
+        :param path:"""
+        main_base_ramp_index = -1
+        main_base_ramp_positions = {}
+        if self.game_info.player_start_location is not None:
+            with suppress(ValueError):
+                main_base_ramp_index = self.game_info.map_ramps.index(self.main_base_ramp)
+        if main_base_ramp_index != -1:
+            for name in RAMP_OPTIONAL_POSITIONS + RAMP_POSITION_SETS:
+                # Some wall positions raise an exception depending on the shape of the ramp, those are not stored
+                # pylint: disable=broad-exception-caught
+                try:
+                    main_base_ramp_positions[name] = getattr(self.main_base_ramp, name)
+                except Exception:
+                    continue
+        map_analysis = MapAnalysis(
+            expansion_locations=self._expansion_positions_list,
+            resource_to_expansion=self._resource_location_to_expansion_position_dict,
+            ramp_points=[ramp.points for ramp in self.game_info.map_ramps],
+            vision_blockers=self.game_info.vision_blockers,
+            main_base_ramp_index=main_base_ramp_index,
+            main_base_ramp_positions=main_base_ramp_positions,
+        )
+        try:
+            map_analysis.save(path)
+        except OSError as e:
+            logger.warning(f"Could not save map analysis to {path}: {e}")
+
+    @final
+    def _should_request_game_info(self, game_loop: int) -> bool:
+        """Called in main.py before self._prepare_step. Returns True if a new game info should be requested to update the pathing grid.
+        method 0: Request a new game info every step
+        method 1: Request a new game info every 'self.game_info_request_interval' game loops, the pathing grid is not updated in between
+        method 2: Update the pathing grid from the footprints of structures, see _update_pathing_grid_from_footprints
+            A new game info is only requested after destructible rocks were destroyed
+
+        :param game_loop:"""
+        if self.pathing_grid_update_method == 0:
+            return True
+        if self.pathing_grid_update_method == 1:
+            return game_loop - self._game_info_game_loop >= self.game_info_request_interval
+        return self._game_info_refresh_required
+
+    @final
+    def _prepare_step(self, state, proto_game_info=None):
         """
         :param state:
-        :param proto_game_info:
+        :param proto_game_info: Response of a RequestGameInfo, may be None if no new game info was requested, see _should_request_game_info
         """
         # Set attributes from new state before on_step."""
         self.state: GameState = state  # See game_state.py
-        # update pathing grid, which unfortunately is in GameInfo instead of GameState
-        self.game_info.pathing_grid = PixelMap(proto_game_info.game_info.start_raw.pathing_grid, in_bits=True)
-        # Required for events, needs to be before self.units are initialized so the old units are stored
-        self._units_previous_map: Dict[int, Unit] = {unit.tag: unit for unit in self.units}
-        self._structures_previous_map: Dict[int, Unit] = {structure.tag: structure for structure in self.structures}
-        self._enemy_units_previous_map: Dict[int, Unit] = {unit.tag: unit for unit in self.enemy_units}
-        self._enemy_structures_previous_map: Dict[int, Unit] = {
-            structure.tag: structure
-            for structure in self.enemy_structures
-        }
-        self._all_units_previous_map: Dict[int, Unit] = {unit.tag: unit for unit in self.all_units}
-
+        if proto_game_info is not None:
+            # update pathing grid, which unfortunately is in GameInfo instead of GameState
+            self.game_info.pathing_grid = PixelMap(proto_game_info.game_info.start_raw.pathing_grid, in_bits=True)
+            self._game_info_game_loop = state.game_loop
+        # Required for events, the units of the previous frame are compared to the new ones in issue_events
+        self._previous_unit_frame = self._unit_frame
         self._prepare_units()
+        self._unit_frame = UnitFrame.from_bot(self)
+        if self.step_profiler is not None:
+            self.step_profiler.mark("prepare_units")
+        if self.pathing_grid_update_method == 2:
+            self._update_pathing_grid_from_footprints(game_info_received=proto_game_info is not None)
+        if self.shared_grids_name is not None:
+            self._update_shared_grids()
         self.minerals: int = state.common.minerals
         self.vespene: int = state.common.vespene
         self.supply_army: int = state.common.food_army
@@ -527,8 +720,101 @@ class BotAIInternal(ABC):
         if self.enemy_race == Race.Random and self.all_enemy_units:
             self.enemy_race = Race(self.all_enemy_units.first.race)
 
+    @final
+    def _update_shared_grids(self):
+        """ Copies the grids of this step into shared memory, see self.shared_grids_name. """
+        grids = {
+            "pathing_grid": self.game_info.pathing_grid.data_numpy,
+            "visibility": self.state.visibility.data_numpy,
+            "creep": self.state.creep.data_numpy,
+        }
+        if self.shared_grids is None:
+            self.shared_grids = SharedGrids(self.shared_grids_name)
+            # These grids do not change during the game
+            grids["placement_grid"] = self.game_info.placement_grid.data_numpy
+            grids["terrain_height"] = self.game_info.terrain_height.data_numpy
+        self.shared_grids.update(grids, self.state.game_loop)
+
+    @final
+    def _update_pathing_grid_from_footprints(self, game_info_received: bool):
+        """Used by pathing_grid_update_method 2.
+        Remembers the pathing grid and the structures of the last received game info,
+        then marks the footprints of structures that were built since then as not pathable,
+        and the footprints of structures that were destroyed or lifted since then as pathable.
+
+        :param game_info_received: True if the pathing grid was just updated from a new game info"""
+        blocking_structures: Dict[Tuple[int, Tuple[float, float]], Tuple[int, int, int, int, bool]] = {}
+        for structure in itertools.chain(self.structures, self.enemy_structures):
+            footprint = self._pathing_grid_footprint(structure)
+            if footprint is not None:
+                blocking_structures[structure.tag, structure.position_tuple] = footprint
+        destructable_tags: Set[int] = {destructable.tag for destructable in self.destructables}
+
+        if game_info_received or self._pathing_grid_base is None:
+            self._pathing_grid_base = self.game_info.pathing_grid
+            self._pathing_grid_base_structures = blocking_structures
+            self._pathing_grid_base_destructables = destructable_tags
+            self._game_info_refresh_required = False
+            return
+
+        # The shape of destroyed rocks is unknown, so request a new game info in the next step
+        if not self._pathing_grid_base_destructables <= destructable_tags:
+            self._game_info_refresh_required = True
+
+        # Copy from the proto data, so changes made by the bot to the pathing grid in the previous step are not kept
+        pathing_grid: PixelMap = self._pathing_grid_base.copy()
+        for key, footprint in blocking_structures.items():
+            if key not in self._pathing_grid_base_structures:
+                self._set_pathing_grid_footprint(pathing_grid, footprint, 0)
+        for key, footprint in self._pathing_grid_base_structures.items():
+            if key not in blocking_structures:
+                self._set_pathing_grid_footprint(pathing_grid, footprint, 1)
+        self.game_info.pathing_grid = pathing_grid
+
+    @final
+    @staticmethod
+    def _pathing_grid_footprint(structure: Unit) -> Optional[Tuple[int, int, int, int, bool]]:
+        """Returns the cells (x_min, x_max, y_min, y_max, corners_pathable) that a structure blocks in the pathing grid,
+        or None if the structure does not block the pathing grid.
+        Resources are not part of the pathing grid, so gas buildings are ignored as well."""
+        if structure.is_flying or structure.type_id in {
+            UnitTypeId.SUPPLYDEPOTLOWERED,
+            UnitTypeId.CREEPTUMOR,
+            UnitTypeId.CREEPTUMORBURROWED,
+            UnitTypeId.CREEPTUMORQUEEN,
+        } or structure.type_id in ALL_GAS:
+            return None
+        radius: Optional[float] = structure.footprint_radius
+        if not radius:
+            return None
+        x, y = structure.position_tuple
+        # The corners of 5x5 townhalls are pathable
+        return round(x - radius), round(x + radius), round(y - radius), round(y + radius), radius == 2.5
+
+    @final
+    @staticmethod
+    def _set_pathing_grid_footprint(pathing_grid: PixelMap, footprint: Tuple[int, int, int, int, bool], value: int):
+        x_min, x_max, y_min, y_max, corners_pathable = footprint
+        data: np.ndarray = pathing_grid.data_numpy
+        if corners_pathable:
+            corner_rows, corner_columns = [y_min, y_min, y_max - 1, y_max - 1], [x_min, x_max - 1, x_min, x_max - 1]
+            corners = data[corner_rows, corner_columns]
+            data[y_min:y_max, x_min:x_max] = value
+            data[corner_rows, corner_columns] = corners
+        else:
+            data[y_min:y_max, x_min:x_max] = value
+
     @final
     def _prepare_units(self):
+        # Positions, spatial index and distances of the previous frame are no longer valid
+        self._cached_unit_positions = None
+        self._cached_spatial_index = None
+        self._cached_distance_rows = {}
+        self._previous_distance_row_miss = (-1, -1)
+        self._remove_stale_persistent_units()
+        if self.use_unit_snapshot:
+            self._prepare_units_from_snapshot()
+            return
         # Set of enemy units detected by own sensor tower, as blips have less unit information than normal visible units
         self.blips: Set[Blip] = set()
         self.all_units: Units = Units([], self)
@@ -553,6 +839,8 @@ class BotAIInternal(ABC):
 
         worker_types: Set[UnitTypeId] = {UnitTypeId.DRONE, UnitTypeId.DRONEBURROWED, UnitTypeId.SCV, UnitTypeId.PROBE}
 
+        persistent_units: Optional[Dict[int, Unit]] = self._persistent_units if self.persistent_units else None
+        game_loop: int = self.state.game_loop
         index: int = 0
         for unit in self.state.observation_raw.units:
             if unit.is_blip:
@@ -563,7 +851,14 @@ class BotAIInternal(ABC):
                 if unit_type in FakeEffectID:
                     self.state.effects.add(EffectData(unit, fake=True))
                     continue
-                unit_obj = Unit(unit, self, distance_calculation_index=index, base_build=self.base_build)
+                if persistent_units is not None:
+                    unit_obj = persistent_units.get(unit.tag)
+                    if unit_obj is None or unit_obj.game_loop > game_loop:
+                        unit_obj = self._persistent_unit(unit, index, game_loop)
+                    else:
+                        unit_obj._refresh(unit, index, game_loop)
+                else:
+                    unit_obj = Unit(unit, self, distance_calculation_index=index, base_build=self.base_build)
                 index += 1
                 self.all_units.append(unit_obj)
                 if unit.display_type == IS_PLACEHOLDER:
@@ -625,11 +920,176 @@ class BotAIInternal(ABC):
                     else:
                         self.enemy_units.append(unit_obj)
 
-        # Force distance calculation and caching on all units using scipy pdist or cdist
-        if self.distance_calculation_method == 1:
-            _ = self._pdist
-        elif self.distance_calculation_method in {2, 3}:
-            _ = self._cdist
+        self._prepare_distances()
+
+    @final
+    def _persistent_unit(self, proto, distance_calculation_index: int, game_loop: int) -> Unit:
+        """Returns the Unit object of the tag of 'proto' that is kept across frames, refreshed with 'proto'.
+        Units of a frame before the last refresh get their own Unit object.
+
+        :param proto:
+        :param distance_calculation_index:
+        :param game_loop:"""
+        unit_obj: Optional[Unit] = self._persistent_units.get(proto.tag)
+        if unit_obj is None:
+            unit_obj = Unit(proto, self, distance_calculation_index=distance_calculation_index, base_build=self.base_build)
+            unit_obj.game_loop = game_loop
+            self._persistent_units[proto.tag] = unit_obj
+        elif unit_obj.game_loop <= game_loop:
+            unit_obj._refresh(proto, distance_calculation_index, game_loop)
+        else:
+            unit_obj = Unit(proto, self, distance_calculation_index=distance_calculation_index, base_build=self.base_build)
+            unit_obj.game_loop = game_loop
+        return unit_obj
+
+    @final
+    def _remove_stale_persistent_units(self):
+        """Units stay in self._persistent_units while they are out of vision, so they keep their object when they return.
+        They are removed when they die, or if they were not seen for PERSISTENT_UNITS_MAX_AGE game loops."""
+        if not self._persistent_units:
+            return
+        for unit_tag in self.state.dead_units:
+            self._persistent_units.pop(unit_tag, None)
+        game_loop: int = self.state.game_loop
+        if game_loop < self._persistent_units_next_prune:
+            return
+        self._persistent_units_next_prune = game_loop + PERSISTENT_UNITS_PRUNE_INTERVAL
+        # With use_unit_snapshot, units are only refreshed when they are accessed, so visible units are kept as well
+        visible_tags: Set[int] = {unit.tag for unit in self.state.observation_raw.units}
+        oldest_game_loop = game_loop - PERSISTENT_UNITS_MAX_AGE
+        stale_tags = [
+            tag for tag, unit in self._persistent_units.items()
+            if unit.game_loop < oldest_game_loop and tag not in visible_tags
+        ]
+        for tag in stale_tags:
+            del self._persistent_units[tag]
+
+    @final
+    def _create_unit_type_lookup_tables(self):
+        """ Creates the arrays used in _prepare_units_from_snapshot to look up the group and structure attribute of a unit type id. """
+        size = self.game_data.unit_types.size
+        self._unit_type_is_structure = self.game_data.unit_types["is_structure"]
+        self._unit_type_categories = np.zeros(size, dtype=np.int8)
+        category_types: Dict[int, Iterable[Union[int, UnitTypeId]]] = {
+            _CATEGORY_MINERAL_FIELD: mineral_ids,
+            _CATEGORY_VESPENE_GEYSER: geyser_ids,
+            _CATEGORY_TOWNHALL: race_townhalls[self.race],
+            _CATEGORY_GAS_BUILDING: ALL_GAS,
+            _CATEGORY_TECHLAB: {
+                UnitTypeId.TECHLAB,
+                UnitTypeId.BARRACKSTECHLAB,
+                UnitTypeId.FACTORYTECHLAB,
+                UnitTypeId.STARPORTTECHLAB,
+            },
+            _CATEGORY_REACTOR: {
+                UnitTypeId.REACTOR,
+                UnitTypeId.BARRACKSREACTOR,
+                UnitTypeId.FACTORYREACTOR,
+                UnitTypeId.STARPORTREACTOR,
+            },
+            _CATEGORY_WORKER: {UnitTypeId.DRONE, UnitTypeId.DRONEBURROWED, UnitTypeId.SCV, UnitTypeId.PROBE},
+            _CATEGORY_LARVA: {UnitTypeId.LARVA},
+            _CATEGORY_WATCHTOWER: {UnitTypeId.XELNAGATOWER},
+        }
+        for category, unit_types in category_types.items():
+            for unit_type in unit_types:
+                unit_id: int = unit_type.value if isinstance(unit_type, UnitTypeId) else unit_type
+                self._unit_type_categories[unit_id] = category
+
+    @final
+    def _prepare_units_from_snapshot(self):
+        """Same as _prepare_units, but stores the units in self.unit_snapshot and only calculates which rows belong to which group.
+        The Units groups are created on first access, see __getattr__ below."""
+        snapshot = UnitSnapshot(self.state.observation_raw.units, self)
+        self.unit_snapshot = snapshot
+        self.blips: Set[Blip] = {Blip(unit) for unit in snapshot.blips}
+        # Convert these units to effects: reaper grenade, parasitic bomb dummy, forcefield
+        for unit in snapshot.fake_effects:
+            self.state.effects.add(EffectData(unit, fake=True))
+
+        # Unknown unit types are mapped to the last entry of the lookup tables which is 0
+        type_ids: np.ndarray = np.minimum(snapshot["type_id"], len(self._unit_type_categories) - 1)
+        categories: np.ndarray = self._unit_type_categories[type_ids]
+        is_structure: np.ndarray = self._unit_type_is_structure[type_ids]
+        alliance: np.ndarray = snapshot["alliance"]
+        not_placeholder: np.ndarray = snapshot["display_type"] != IS_PLACEHOLDER
+
+        # Alliance.Neutral.value = 3
+        neutral = not_placeholder & (alliance == 3)
+        watchtowers = neutral & (categories == _CATEGORY_WATCHTOWER)
+        mineral_field = neutral & (categories == _CATEGORY_MINERAL_FIELD)
+        vespene_geyser = neutral & (categories == _CATEGORY_VESPENE_GEYSER)
+        destructables = neutral & ~watchtowers & ~mineral_field & ~vespene_geyser
+
+        # Alliance.Self.value = 1
+        all_own_units = not_placeholder & (alliance == 1)
+        structures = all_own_units & is_structure
+        townhalls = structures & (categories == _CATEGORY_TOWNHALL)
+        gas_buildings = structures & (categories == _CATEGORY_GAS_BUILDING)
+        # TODO: remove this loop when a new linux client newer than version 4.10.0 is released
+        for index in np.flatnonzero(structures & (categories == 0)).tolist():
+            if snapshot.unit(index).vespene_contents:
+                gas_buildings[index] = True
+        techlabs = structures & (categories == _CATEGORY_TECHLAB)
+        reactors = structures & (categories == _CATEGORY_REACTOR)
+        units = all_own_units & ~is_structure
+        workers = units & (categories == _CATEGORY_WORKER)
+        larva = units & (categories == _CATEGORY_LARVA)
+
+        # Alliance.Enemy.value = 4
+        all_enemy_units = not_placeholder & (alliance == 4)
+
+        self.techlab_tags: Set[int] = set(snapshot.tags(techlabs))
+        self.reactor_tags: Set[int] = set(snapshot.tags(reactors))
+
+        # Remove the Units groups of the previous frame, so that __getattr__ creates them from the new snapshot on access
+        group_masks: Dict[str, np.ndarray] = {
+            "units": units,
+            "workers": workers,
+            "larva": larva,
+            "structures": structures,
+            "townhalls": townhalls,
+            "gas_buildings": gas_buildings,
+            "all_own_units": all_own_units,
+            "enemy_units": all_enemy_units & ~is_structure,
+            "enemy_structures": all_enemy_units & is_structure,
+            "all_enemy_units": all_enemy_units,
+            "resources": mineral_field | vespene_geyser,
+            "destructables": destructables,
+            "watchtowers": watchtowers,
+            "mineral_field": mineral_field,
+            "vespene_geyser": vespene_geyser,
+            "placeholders": ~not_placeholder,
+        }
+        self._lazy_unit_groups = {name: np.flatnonzero(mask) for name, mask in group_masks.items()}
+        self._lazy_unit_groups["all_units"] = np.arange(len(snapshot))
+        for name in self._lazy_unit_groups:
+            self.__dict__.pop(name, None)
+
+        self._prepare_distances()
+
+    def __getattr__(self, name: str):
+        """ Only called if the attribute was not found, creates the Units groups which were removed in _prepare_units_from_snapshot. """
+        lazy_unit_groups = self.__dict__.get("_lazy_unit_groups")
+        if lazy_unit_groups and name in lazy_unit_groups:
+            group = self.unit_snapshot.units(lazy_unit_groups.pop(name))
+            setattr(self, name, group)
+            return group
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    @final
+    async def _run_scheduled_tasks(self):
+        """Executed by main.py after each on_step function. Runs the due tasks of self.scheduler.
+        In realtime games, they only run while the step has time left: a step may take
+        'self.client.game_step / 22.4 * self.scheduler.budget_fraction' seconds, measured from the end of _prepare_step.
+        Otherwise SC2 waits for the bot, so the tasks run at their cadence and the bot does not depend on the hardware."""
+        if not self.scheduler.tasks:
+            return
+        if not self.realtime:
+            await self.scheduler.run(self.state.game_loop, math.inf)
+            return
+        budget: float = self.client.game_step / 22.4 * self.scheduler.budget_fraction
+        await self.scheduler.run(self.state.game_loop, self._time_before_step + budget)
 
     @final
     async def _after_step(self) -> int:
@@ -642,14 +1102,20 @@ class BotAIInternal(ABC):
         self._last_step_step_time = step_duration
         self._total_time_in_on_step += step_duration
         self._total_steps_iterations += 1
+        # With pipelined requests, the responses are received together with the next observation, see main.py
+        wait_for_response: bool = not self.pipeline_requests or self.realtime
         # Commit and clear bot actions
         if self.actions:
-            await self._do_actions(self.actions)
+            await self._do_actions(self.actions, wait_for_response=wait_for_response)
             self.actions.clear()
         # Clear set of unit tags that were given an order this frame by self.do()
         self.unit_tags_received_action.clear()
+        if self.step_profiler is not None:
+            self.step_profiler.mark("actions")
         # Commit debug queries
-        await self.client._send_debug()
+        await self.client._send_debug(wait_for_response=wait_for_response)
+        if self.step_profiler is not None:
+            self.step_profiler.mark("debug")
 
         return self.state.game_loop
 
@@ -666,103 +1132,174 @@ class BotAIInternal(ABC):
         self._prepare_step(gs, proto_game_info)
         await self.issue_events()
 
+    @final
+    def _previous_frame_units(self, group: int) -> Dict[int, Unit]:
+        if self._previous_unit_frame is None:
+            return {}
+        return {unit.tag: unit for unit in self._previous_unit_frame.units(group)}
+
+    @final
+    @property_cache_once_per_frame
+    def _units_previous_map(self) -> Dict[int, Unit]:
+        """ Own units of the previous frame by tag. """
+        return self._previous_frame_units(GROUP_OWN_UNITS)
+
+    @final
+    @property_cache_once_per_frame
+    def _structures_previous_map(self) -> Dict[int, Unit]:
+        """ Own structures of the previous frame by tag. """
+        return self._previous_frame_units(GROUP_OWN_STRUCTURES)
+
+    @final
+    @property_cache_once_per_frame
+    def _enemy_units_previous_map(self) -> Dict[int, Unit]:
+        """ Enemy units of the previous frame by tag. """
+        return self._previous_frame_units(GROUP_ENEMY_UNITS)
+
+    @final
+    @property_cache_once_per_frame
+    def _enemy_structures_previous_map(self) -> Dict[int, Unit]:
+        """ Enemy structures of the previous frame by tag. """
+        return self._previous_frame_units(GROUP_ENEMY_STRUCTURES)
+
+    @final
+    @property_cache_once_per_frame
+    def _all_units_previous_map(self) -> Dict[int, Unit]:
+        """ All units of the previous frame by tag, including neutral units and placeholders. """
+        if self._previous_unit_frame is None:
+            return {}
+        frame = self._previous_unit_frame
+        return {unit.tag: unit for unit in (frame.unit(row) for row in range(len(frame)))}
+
+    @final
+    def _overridden_event_hooks(self) -> Set[str]:
+        """ Names of the event hooks which the bot overrides, only these are called by issue_events. """
+        # pylint: disable=C0415
+        from sc2.bot_ai import BotAI
+
+        return {
+            name
+            for name in EVENT_HOOKS
+            if getattr(getattr(self, name), "__func__", None) is not getattr(BotAI, name)
+        }
+
     @final
     async def issue_events(self):
         """This function will be automatically run from main.py and triggers the following functions:
         - on_unit_created
         - on_unit_destroyed
+        - on_unit_type_changed
+        - on_unit_took_damage and on_units_took_damage
         - on_building_construction_started
         - on_building_construction_complete
         - on_upgrade_complete
+        - on_enemy_unit_entered_vision
+        - on_enemy_unit_left_vision
+
+        The units of this frame are compared to the previous frame once with array operations, see sc2/unit_events.py.
+        Only the hooks which the bot overrides are called.
         """
-        await self._issue_unit_dead_events()
-        await self._issue_unit_added_events()
-        await self._issue_building_events()
-        await self._issue_upgrade_events()
-        await self._issue_vision_events()
-
-    @final
-    async def _issue_unit_added_events(self):
-        for unit in self.units:
-            if unit.tag not in self._units_previous_map and unit.tag not in self._unit_tags_seen_this_game:
-                self._unit_tags_seen_this_game.add(unit.tag)
-                self._units_created[unit.type_id] += 1
-                await self.on_unit_created(unit)
-            elif unit.tag in self._units_previous_map:
-                previous_frame_unit: Unit = self._units_previous_map[unit.tag]
-                # Check if a unit took damage this frame and then trigger event
-                if unit.health < previous_frame_unit.health or unit.shield < previous_frame_unit.shield:
-                    damage_amount = previous_frame_unit.health - unit.health + previous_frame_unit.shield - unit.shield
-                    await self.on_unit_took_damage(unit, damage_amount)
-                # Check if a unit type has changed
-                if previous_frame_unit.type_id != unit.type_id:
-                    await self.on_unit_type_changed(unit, previous_frame_unit.type_id)
-
-    @final
-    async def _issue_upgrade_events(self):
+        hooks = self._overridden_event_hooks()
+        previous = self._previous_unit_frame or UnitFrame.empty(self)
+        dead_units = self.state.dead_units
+        diff = diff_unit_frames(
+            previous, self._unit_frame, np.fromiter(dead_units, dtype=np.uint64, count=len(dead_units))
+        )
+        await self._issue_unit_dead_events(diff, hooks)
+        await self._issue_unit_added_events(diff, hooks, previous)
+        await self._issue_upgrade_events(hooks)
+        await self._issue_vision_events(diff, hooks)
+
+    @final
+    async def _issue_unit_added_events(self, diff: UnitFrameDiff, hooks: Set[str], previous: UnitFrame):
+        """Issues the events of own units and structures in the order of self.units, then in the order of self.structures.
+
+        :param diff:
+        :param hooks:
+        :param previous:"""
+        frame = self._unit_frame
+        own_rows = diff.own_rows
+        damage_by_row: Dict[int, float] = dict(
+            zip(own_rows[diff.took_damage].tolist(), diff.damage[diff.took_damage].tolist())
+        )
+        previous_type_by_row: Dict[int, int] = dict(
+            zip(
+                own_rows[diff.type_changed].tolist(),
+                previous.type_ids[diff.own_previous_rows[diff.type_changed]].tolist()
+            )
+        )
+        completed_rows: Set[int] = set(own_rows[diff.construction_completed].tolist())
+        new_rows: Set[int] = set(diff.new_own_units.tolist()) | set(diff.new_own_structures.tolist())
+        if "on_unit_took_damage" not in hooks and "on_units_took_damage" not in hooks:
+            damage_by_row = {}
+        if "on_unit_type_changed" not in hooks:
+            previous_type_by_row = {}
+        damaged: List[Tuple[Unit, float]] = []
+        rows = sorted(new_rows | damage_by_row.keys() | previous_type_by_row.keys() | completed_rows)
+        for group in (GROUP_OWN_UNITS, GROUP_OWN_STRUCTURES):
+            for row in rows:
+                if frame.groups[row] != group:
+                    continue
+                unit = frame.unit(row)
+                if row in new_rows:
+                    if group == GROUP_OWN_UNITS:
+                        if unit.tag not in self._unit_tags_seen_this_game:
+                            self._unit_tags_seen_this_game.add(unit.tag)
+                            self._units_created[unit.type_id] += 1
+                            if "on_unit_created" in hooks:
+                                await self.on_unit_created(unit)
+                    elif unit.build_progress < 1:
+                        if "on_building_construction_started" in hooks:
+                            await self.on_building_construction_started(unit)
+                    else:
+                        # Include starting townhall
+                        self._units_created[unit.type_id] += 1
+                        if "on_building_construction_complete" in hooks:
+                            await self.on_building_construction_complete(unit)
+                    continue
+                if row in damage_by_row:
+                    damaged.append((unit, damage_by_row[row]))
+                    if "on_unit_took_damage" in hooks:
+                        await self.on_unit_took_damage(unit, damage_by_row[row])
+                if row in previous_type_by_row:
+                    await self.on_unit_type_changed(unit, UnitTypeId(previous_type_by_row[row]))
+                if row in completed_rows:
+                    self._units_created[unit.type_id] += 1
+                    if "on_building_construction_complete" in hooks:
+                        await self.on_building_construction_complete(unit)
+        if damaged and "on_units_took_damage" in hooks:
+            await self.on_units_took_damage(damaged)
+
+    @final
+    async def _issue_upgrade_events(self, hooks: Set[str]):
         difference = self.state.upgrades - self._previous_upgrades
-        for upgrade_completed in difference:
-            await self.on_upgrade_complete(upgrade_completed)
+        if "on_upgrade_complete" in hooks:
+            for upgrade_completed in difference:
+                await self.on_upgrade_complete(upgrade_completed)
         self._previous_upgrades = self.state.upgrades
 
     @final
-    async def _issue_building_events(self):
-        for structure in self.structures:
-            if structure.tag not in self._structures_previous_map:
-                if structure.build_progress < 1:
-                    await self.on_building_construction_started(structure)
-                else:
-                    # Include starting townhall
-                    self._units_created[structure.type_id] += 1
-                    await self.on_building_construction_complete(structure)
-            elif structure.tag in self._structures_previous_map:
-                # Check if a structure took damage this frame and then trigger event
-                previous_frame_structure: Unit = self._structures_previous_map[structure.tag]
-                if (
-                    structure.health < previous_frame_structure.health
-                    or structure.shield < previous_frame_structure.shield
-                ):
-                    damage_amount = (
-                        previous_frame_structure.health - structure.health + previous_frame_structure.shield -
-                        structure.shield
-                    )
-                    await self.on_unit_took_damage(structure, damage_amount)
-                # Check if a structure changed its type
-                if previous_frame_structure.type_id != structure.type_id:
-                    await self.on_unit_type_changed(structure, previous_frame_structure.type_id)
-                # Check if structure completed
-                if structure.build_progress == 1 and previous_frame_structure.build_progress < 1:
-                    self._units_created[structure.type_id] += 1
-                    await self.on_building_construction_complete(structure)
-
-    @final
-    async def _issue_vision_events(self):
-        # Call events for enemy unit entered vision
-        for enemy_unit in self.enemy_units:
-            if enemy_unit.tag not in self._enemy_units_previous_map:
-                await self.on_enemy_unit_entered_vision(enemy_unit)
-        for enemy_structure in self.enemy_structures:
-            if enemy_structure.tag not in self._enemy_structures_previous_map:
-                await self.on_enemy_unit_entered_vision(enemy_structure)
-
-        # Call events for enemy unit left vision
-        enemy_units_left_vision: Set[int] = set(self._enemy_units_previous_map) - self.enemy_units.tags
-        for enemy_unit_tag in enemy_units_left_vision:
-            await self.on_enemy_unit_left_vision(enemy_unit_tag)
-        enemy_structures_left_vision: Set[int] = set(self._enemy_structures_previous_map) - self.enemy_structures.tags
-        for enemy_structure_tag in enemy_structures_left_vision:
-            await self.on_enemy_unit_left_vision(enemy_structure_tag)
-
-    @final
-    async def _issue_unit_dead_events(self):
-        for unit_tag in self.state.dead_units & set(self._all_units_previous_map):
-            await self.on_unit_destroyed(unit_tag)
+    async def _issue_vision_events(self, diff: UnitFrameDiff, hooks: Set[str]):
+        if "on_enemy_unit_entered_vision" in hooks:
+            for row in diff.entered_vision.tolist():
+                await self.on_enemy_unit_entered_vision(self._unit_frame.unit(row))
+        if "on_enemy_unit_left_vision" in hooks:
+            for enemy_unit_tag in diff.left_vision_tags.tolist():
+                await self.on_enemy_unit_left_vision(enemy_unit_tag)
+
+    @final
+    async def _issue_unit_dead_events(self, diff: UnitFrameDiff, hooks: Set[str]):
+        if "on_unit_destroyed" in hooks:
+            for unit_tag in diff.destroyed_tags.tolist():
+                await self.on_unit_destroyed(unit_tag)
 
     # DISTANCE CALCULATION
 
     @final
     @property
     def _units_count(self) -> int:
+        if self.unit_snapshot is not None:
+            return len(self.unit_snapshot)
         return len(self.all_units)
 
     @final
@@ -782,16 +1319,69 @@ class BotAIInternal(ABC):
         return self._cached_cdist
 
     @final
-    def _calculate_distances_method1(self) -> np.ndarray:
-        self._generated_frame = self.state.game_loop
+    def _prepare_distances(self):
+        """ Called at the end of _prepare_units """
+        # Force distance calculation and caching on all units using scipy pdist or cdist
+        if self.distance_calculation_method == 1:
+            _ = self._pdist
+        elif self.distance_calculation_method in {2, 3}:
+            _ = self._cdist
+        elif self.distance_calculation_method == 4:
+            # The memory and time to calculate the distance matrix grows quadratic with the amount of units
+            if self._units_count <= DISTANCE_MATRIX_MAX_UNITS:
+                self._distance_squared_unit_to_unit = self._distance_squared_unit_to_unit_method2
+                _ = self._cdist
+            else:
+                self._distance_squared_unit_to_unit = self._distance_squared_unit_to_unit_method0
+
+    @final
+    @property
+    def _unit_positions(self) -> np.ndarray:
+        """ Positions of all units as array of shape (n, 2), row i is the unit with distance_calculation_index i. Cached until the next frame. """
+        if self._cached_unit_positions is None:
+            self._cached_unit_positions = self._positions_array()
+        return self._cached_unit_positions
+
+    @final
+    @property
+    def _spatial_index(self) -> cKDTree:
+        """ KD-tree of self._unit_positions, used by Units functions on large groups. Cached until the next frame. """
+        if self._cached_spatial_index is None:
+            self._cached_spatial_index = cKDTree(self._unit_positions)
+        return self._cached_spatial_index
+
+    @final
+    def _distance_calculation_indices(self, units: Iterable[Unit]) -> Optional[np.ndarray]:
+        """Returns the distance_calculation_index of each unit as numpy array,
+        or None if one of the units is not from this frame (e.g. kept in memory from a previous frame).
+
+        :param units:"""
+        game_loop: int = self.state.game_loop
+        indices: List[int] = []
+        for unit in units:
+            if unit.game_loop != game_loop or unit.distance_calculation_index < 0:
+                return None
+            indices.append(unit.distance_calculation_index)
+        return np.array(indices, dtype=int)
+
+    @final
+    def _positions_array(self) -> np.ndarray:
+        """ Returns the positions of all units as array of shape (n, 2), row i is the unit with distance_calculation_index i. """
+        if self.unit_snapshot is not None:
+            return self.unit_snapshot.positions
         # Converts tuple [(1, 2), (3, 4)] to flat list like [1, 2, 3, 4]
         flat_positions = (coord for unit in self.all_units for coord in unit.position_tuple)
         # Converts to numpy array, then converts the flat array back to shape (n, 2): [[1, 2], [3, 4]]
-        positions_array: np.ndarray = np.fromiter(
+        return np.fromiter(
             flat_positions,
             dtype=float,
             count=2 * self._units_count,
-        ).reshape((self._units_count, 2))
+        ).reshape((-1, 2))
+
+    @final
+    def _calculate_distances_method1(self) -> np.ndarray:
+        self._generated_frame = self.state.game_loop
+        positions_array: np.ndarray = self._unit_positions
         assert len(positions_array) == self._units_count
         # See performance benchmarks
         self._cached_pdist = pdist(positions_array, "sqeuclidean")
@@ -801,14 +1391,7 @@ class BotAIInternal(ABC):
     @final
     def _calculate_distances_method2(self) -> np.ndarray:
         self._generated_frame = self.state.game_loop
-        # Converts tuple [(1, 2), (3, 4)] to flat list like [1, 2, 3, 4]
-        flat_positions = (coord for unit in self.all_units for coord in unit.position_tuple)
-        # Converts to numpy array, then converts the flat array back to shape (n, 2): [[1, 2], [3, 4]]
-        positions_array: np.ndarray = np.fromiter(
-            flat_positions,
-            dtype=float,
-            count=2 * self._units_count,
-        ).reshape((self._units_count, 2))
+        positions_array: np.ndarray = self._unit_positions
         assert len(positions_array) == self._units_count
         # See performance benchmarks
         self._cached_cdist = cdist(positions_array, positions_array, "sqeuclidean")
@@ -819,12 +1402,7 @@ class BotAIInternal(ABC):
     def _calculate_distances_method3(self) -> np.ndarray:
         """ Nearly same as above, but without asserts"""
         self._generated_frame = self.state.game_loop
-        flat_positions = (coord for unit in self.all_units for coord in unit.position_tuple)
-        positions_array: np.ndarray = np.fromiter(
-            flat_positions,
-            dtype=float,
-            count=2 * self._units_count,
-        ).reshape((-1, 2))
+        positions_array: np.ndarray = self._unit_positions
         # See performance benchmarks
         self._cached_cdist = cdist(positions_array, positions_array, "sqeuclidean")
 
@@ -889,6 +1467,34 @@ class BotAIInternal(ABC):
         # Calculate index, needs to be after cdist has been calculated and cached
         return self._cdist[unit1.distance_calculation_index, unit2.distance_calculation_index]
 
+    @final
+    def _distance_squared_unit_to_unit_method5(self, unit1: Unit, unit2: Unit) -> float:
+        # Use the row that is already calculated, otherwise calculate the row of unit2 because Units functions pass the target as unit2
+        row = self._cached_distance_rows.get(unit2.distance_calculation_index)
+        if row is not None:
+            return row[unit1.distance_calculation_index]
+        row = self._cached_distance_rows.get(unit1.distance_calculation_index)
+        if row is not None:
+            return row[unit2.distance_calculation_index]
+        # If unit1 was also part of the previous uncached request, it is probably compared to many units, e.g. 'unit.distance_to(target)' in a loop
+        if unit1.distance_calculation_index in self._previous_distance_row_miss:
+            return self._distance_row(unit1.distance_calculation_index)[unit2.distance_calculation_index]
+        self._previous_distance_row_miss = (unit1.distance_calculation_index, unit2.distance_calculation_index)
+        return self._distance_row(unit2.distance_calculation_index)[unit1.distance_calculation_index]
+
+    @final
+    def _distance_row(self, index: int) -> np.ndarray:
+        """Returns the squared distances from the unit with distance_calculation_index 'index' to all units.
+        The row is calculated on first access and cached until the next frame.
+
+        :param index:"""
+        row = self._cached_distance_rows.get(index)
+        if row is None:
+            differences = self._unit_positions - self._unit_positions[index]
+            row = np.einsum("ij,ij->i", differences, differences)
+            self._cached_distance_rows[index] = row
+        return row
+
     # Distance calculation using the fastest distance calculation functions
 
     @final
@@ -925,8 +1531,11 @@ class BotAIInternal(ABC):
         The following methods calculate the distances between all units once:
         method 1: Use scipy's pdist condensed matrix (1d array)
         method 2: Use scipy's cidst square matrix (2d array)
-        method 3: Use scipy's cidst square matrix (2d array) without asserts (careful: very weird error messages, but maybe slightly faster)"""
-        assert 0 <= method <= 3, f"Selected method was: {method}"
+        method 3: Use scipy's cidst square matrix (2d array) without asserts (careful: very weird error messages, but maybe slightly faster)
+        method 4: Same as method 3, but if there are more than DISTANCE_MATRIX_MAX_UNITS units, no matrix is calculated and math.hypot is used instead
+        method 5: Calculate the distances from one unit to all other units only when a distance to that unit is requested, see _distance_row
+        Independent of the method, distance functions of large Units objects use a scipy cKDTree of all unit positions, see units.py"""
+        assert 0 <= method <= 5, f"Selected method was: {method}"
         if method == 0:
             self._distance_squared_unit_to_unit = self._distance_squared_unit_to_unit_method0
         elif method == 1:
@@ -935,6 +1544,8 @@ class BotAIInternal(ABC):
         elif method == 2:
             self._distance_squared_unit_to_unit = self._distance_squared_unit_to_unit_method2
             self.calculate_distances = self._calculate_distances_method2
-        elif method == 3:
+        elif method in {3, 4}:
             self._distance_squared_unit_to_unit = self._distance_squared_unit_to_unit_method2
             self.calculate_distances = self._calculate_distances_method3
+        elif method == 5:
+            self._distance_squared_unit_to_unit = self._distance_squared_unit_to_unit_method5
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from loguru import logger
+
+from sc2.shared_memory import SharedArray, SharedArrayHandle
+
+
+@dataclass(frozen=True)
+class SharedSnapshot:
+    """Handles of the map grids and unit positions of one game loop in shared memory, see BotAI.share_snapshot.
+    It can be passed to functions which run in BotAI.run_in_executor."""
+
+    game_loop: int
+    pathing_grid: SharedArrayHandle
+    placement_grid: SharedArrayHandle
+    terrain_height: SharedArrayHandle
+    # Array of shape (n, 2) with the positions of all units, row i belongs to unit_tags[i]
+    unit_positions: SharedArrayHandle
+    unit_tags: SharedArrayHandle
+
+
+class BotExecutor:
+    """Process or thread pool of a bot, so that CPU heavy work does not block the websocket of the game.
+    Started in BotAI._prepare_start if 'self.executor_workers' is larger than 0, see BotAI.run_in_executor.
+
+    Arrays which are sent to workers can be put into shared memory with self.share, so they are not pickled and copied."""
+
+    def __init__(self, max_workers: int, use_processes: bool = True):
+        """
+        :param max_workers:
+        :param use_processes: Use a ProcessPoolExecutor if True, otherwise a ThreadPoolExecutor
+        """
+        assert max_workers > 0
+        self.max_workers: int = max_workers
+        self.use_processes: bool = use_processes
+        self._executor: Optional[Executor] = None
+        self._shared_arrays: Dict[str, SharedArray] = {}
+
+    @property
+    def is_running(self) -> bool:
+        return self._executor is not None
+
+    def start(self):
+        if self._executor is not None:
+            return
+        if self.use_processes:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sc2-bot-executor")
+        logger.info(f"Started {type(self._executor).__name__} with {self.max_workers} workers")
+
+    def submit(self, function: Callable[..., Any], *args, **kwargs) -> asyncio.Future:
+        """Runs 'function(*args, **kwargs)' in the pool and returns an awaitable future of its result.
+        With processes, the function and its arguments have to be picklable, e.g. functions defined at module level.
+
+        :param function:
+        :param args:
+        :param kwargs:"""
+        assert self._executor is not None, "The executor is not running"
+        return asyncio.get_running_loop().run_in_executor(self._executor, partial(function, *args, **kwargs))
+
+    def share(self, name: str, array: np.ndarray) -> SharedArrayHandle:
+        """Copies 'array' into the shared memory block 'name' of this executor and returns its handle.
+        The block is reused and updated in place if the shape and dtype did not change,
+        so workers which still read it from an earlier call see the new values.
+
+        :param name:
+        :param array:"""
+        shared_array = self._shared_arrays.get(name)
+        if shared_array is None or not shared_array.matches(array):
+            if shared_array is not None:
+                shared_array.close()
+            shared_array = SharedArray(array.shape, array.dtype)
+            self._shared_arrays[name] = shared_array
+        shared_array.array[...] = array
+        return shared_array.handle
+
+    def shutdown(self, wait: bool = True):
+        """Stops the pool and frees all shared memory blocks. Called by main.py at the end of the game.
+
+        :param wait: Wait for running calls to finish"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+        for shared_array in self._shared_arrays.values():
+            shared_array.close()
+        self._shared_arrays.clear()
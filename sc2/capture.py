@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import gzip
+import queue
+import struct
+import threading
+import time
+from collections import deque
+from contextlib import suppress
+from pathlib import Path
+from typing import Deque, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2.data import Status
+
+CAPTURE_MAGIC = b"SC2CAPTURE1\n"
+CAPTURE_REQUEST = 0
+CAPTURE_RESPONSE = 1
+# Kind of the record, perf_counter_ns when it was sent or received, length of the serialized message
+_RECORD_HEADER = struct.Struct("<BqI")
+# Requests which belong to one step of the game, their responses are only looked up until the next step request
+_STEP_LOCAL_REQUESTS = {"action", "debug", "query", "obs_action"}
+
+
+class CaptureRecord(NamedTuple):
+    kind: int
+    timestamp_ns: int
+    data: bytes
+
+    @property
+    def is_request(self) -> bool:
+        return self.kind == CAPTURE_REQUEST
+
+    def parse(self) -> Union[sc_pb.Request, sc_pb.Response]:
+        message = sc_pb.Request() if self.is_request else sc_pb.Response()
+        message.ParseFromString(self.data)
+        return message
+
+
+class CaptureWriter:
+    """Writes the serialized requests and responses of a Protocol to a gzip compressed stream of length prefixed records.
+    Compressing and writing happens in a background thread, so capturing only costs the game loop a queue put per message.
+    See Protocol.start_capture and the 'capture_as' argument of run_game."""
+
+    def __init__(self, path: Union[str, Path], compresslevel: int = 1):
+        """
+        :param path:
+        :param compresslevel: gzip compression level, 1 is the fastest
+        """
+        self.path: Path = Path(path)
+        self._file = gzip.open(self.path, "wb", compresslevel=compresslevel)
+        self._file.write(CAPTURE_MAGIC)
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write_records, name="sc2-capture-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, kind: int, data: bytes, timestamp_ns: Optional[int] = None):
+        """
+        :param kind: CAPTURE_REQUEST or CAPTURE_RESPONSE
+        :param data: Serialized message
+        :param timestamp_ns: perf_counter_ns when the message was sent or received, defaults to now"""
+        self._queue.put((kind, timestamp_ns or time.perf_counter_ns(), data))
+
+    def _write_records(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            kind, timestamp_ns, data = record
+            self._file.write(_RECORD_HEADER.pack(kind, timestamp_ns, len(data)))
+            self._file.write(data)
+        self._file.close()
+
+    def close(self):
+        """ Writes the remaining records and closes the file. """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+def read_capture(path: Union[str, Path]) -> Iterator[CaptureRecord]:
+    """Yields the records of a capture file in the order they were written.
+
+    :param path:"""
+    with gzip.open(Path(path), "rb") as f:
+        assert f.read(len(CAPTURE_MAGIC)) == CAPTURE_MAGIC, f"{path} is not a capture file"
+        # The file of a game that crashed ends in the middle of a record
+        with suppress(EOFError):
+            while True:
+                header = f.read(_RECORD_HEADER.size)
+                if len(header) < _RECORD_HEADER.size:
+                    return
+                kind, timestamp_ns, length = _RECORD_HEADER.unpack(header)
+                data = f.read(length)
+                if len(data) < length:
+                    return
+                yield CaptureRecord(kind, timestamp_ns, data)
+
+
+def pair_capture_records(records: Iterable[CaptureRecord]) -> List[Tuple[sc_pb.Request, bytes]]:
+    """Returns each request with the serialized response to it. SC2 answers requests in order,
+    so the n-th response belongs to the n-th request. Requests without a response are left out.
+
+    :param records:"""
+    requests: List[sc_pb.Request] = []
+    responses: List[bytes] = []
+    for record in records:
+        if record.is_request:
+            requests.append(record.parse())
+        else:
+            responses.append(record.data)
+    return list(zip(requests, responses))
+
+
+class CaptureWebSocket:
+    """Stands in for the websocket of a Protocol and answers requests with the recorded responses of a capture,
+    so a game can be replayed without SC2, see main.replay_capture.
+
+    Each request is answered with the response of the next recorded request of the same type.
+    Recorded requests that the replaying bot does not send are skipped. Action, debug and query requests
+    that were not recorded in the current step get an empty response."""
+
+    def __init__(self, exchanges: List[Tuple[sc_pb.Request, bytes]]):
+        """
+        :param exchanges: See pair_capture_records
+        """
+        self.exchanges: List[Tuple[sc_pb.Request, bytes]] = exchanges
+        self._request_types: List[str] = [request.WhichOneof("request") for request, _ in exchanges]
+        self._cursor: int = 0
+        self._responses: Deque[bytes] = deque()
+        self.closed: bool = False
+        # Amount of requests that were answered with an empty response because they were not recorded
+        self.unmatched_requests: int = 0
+
+    def _find(self, request_type: str) -> Optional[int]:
+        for index in range(self._cursor, len(self.exchanges)):
+            recorded_type = self._request_types[index]
+            if recorded_type == request_type:
+                return index
+            if recorded_type == "step" and request_type in _STEP_LOCAL_REQUESTS:
+                return None
+        return None
+
+    async def send_bytes(self, data: bytes):
+        request = sc_pb.Request()
+        request.ParseFromString(data)
+        request_type = request.WhichOneof("request")
+        index = self._find(request_type)
+        if index is not None:
+            self._cursor = index + 1
+            self._responses.append(self.exchanges[index][1])
+        elif request_type in _STEP_LOCAL_REQUESTS:
+            self.unmatched_requests += 1
+            response = sc_pb.Response(status=Status.in_game.value)
+            getattr(response, request_type).SetInParent()
+            self._responses.append(response.SerializeToString())
+        else:
+            # The capture ended, e.g. because the recorded game crashed
+            self.closed = True
+
+    async def receive_bytes(self) -> bytes:
+        if not self._responses:
+            # Same as a closed aiohttp websocket, see Protocol._receive_next_response
+            raise TypeError("The capture has no more responses")
+        return self._responses.popleft()
+
+    async def close(self):
+        self.closed = True
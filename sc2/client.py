@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 
 from loguru import logger
@@ -45,6 +46,9 @@ class Client(Protocol):
 
         self._renderer = None
         self.raw_affects_selection = False
+        # Amount of unit commands that were sent and how many raw actions were saved by combining them, see combine_actions
+        self.unit_commands_sent: int = 0
+        self.raw_actions_saved: int = 0
 
     @property
     def in_game(self) -> bool:
@@ -126,8 +130,14 @@ class Client(Protocol):
             f.write(result.save_replay.data)
         logger.info(f"Saved replay to {path}")
 
-    async def observation(self, game_loop: int = None):
-        if game_loop is not None:
+    async def observation(self, game_loop: int = None, request: asyncio.Future = None):
+        """
+        :param game_loop:
+        :param request: Future of an observation request which was already sent with self._send_request, see BotAI.pipeline_requests
+        """
+        if request is not None:
+            result = await self._receive_response(request)
+        elif game_loop is not None:
             result = await self._execute(observation=sc_pb.RequestObservation(game_loop=game_loop))
         else:
             result = await self._execute(observation=sc_pb.RequestObservation())
@@ -150,9 +160,16 @@ class Client(Protocol):
 
         return result
 
-    async def step(self, step_size: int = None):
-        """ EXPERIMENTAL: Change self._client.game_step during the step function to increase or decrease steps per second """
+    async def step(self, step_size: int = None, wait_for_response: bool = True):
+        """EXPERIMENTAL: Change self._client.game_step during the step function to increase or decrease steps per second
+
+        :param step_size:
+        :param wait_for_response: If False, the request is only sent and its response is received together with the next awaited request
+        """
         step_size = step_size or self.game_step
+        if not wait_for_response:
+            await self._send_request(step=sc_pb.RequestStep(count=step_size))
+            return None
         return await self._execute(step=sc_pb.RequestStep(count=step_size))
 
     async def get_game_data(self) -> GameData:
@@ -185,16 +202,29 @@ class Client(Protocol):
         result = await self._execute(game_info=sc_pb.RequestGameInfo())
         return GameInfo(result.game_info)
 
-    async def actions(self, actions, return_successes=False):
+    async def actions(self, actions, return_successes=False, wait_for_response: bool = True):
+        """
+        :param actions:
+        :param return_successes:
+        :param wait_for_response: If False, the request is only sent and None is returned, errors are then not reported
+        """
         if not actions:
             return None
         if not isinstance(actions, list):
             actions = [actions]
 
+        raw_actions = list(combine_actions(actions))
+        self.unit_commands_sent += len(actions)
+        self.raw_actions_saved += len(actions) - len(raw_actions)
+        if not wait_for_response:
+            await self._send_request(
+                action=sc_pb.RequestAction(actions=(sc_pb.Action(action_raw=a) for a in raw_actions))
+            )
+            return None
         # On realtime=True, might get an error here: sc2.protocol.ProtocolError: ['Not in a game']
         try:
             res = await self._execute(
-                action=sc_pb.RequestAction(actions=(sc_pb.Action(action_raw=a) for a in combine_actions(actions)))
+                action=sc_pb.RequestAction(actions=(sc_pb.Action(action_raw=a) for a in raw_actions))
             )
         except ProtocolError:
             return []
@@ -577,10 +607,13 @@ class Client(Protocol):
         assert isinstance(p, Point3)
         self._debug_spheres.append(DrawItemSphere(start_point=p, radius=r, color=color))
 
-    async def _send_debug(self):
+    async def _send_debug(self, wait_for_response: bool = True):
         """Sends the debug draw execution. This is run by main.py now automatically, if there is any items in the list. You do not need to run this manually any longer.
         Check examples/terran/ramp_wall.py for example drawing. Each draw request needs to be sent again in every single on_step iteration.
+
+        :param wait_for_response: If False, the debug requests are only sent and their responses are received together with the next awaited request
         """
+        execute = self._execute if wait_for_response else self._send_request
         debug_hash = (
             sum(hash(item) for item in self._debug_texts),
             sum(hash(item) for item in self._debug_lines),
@@ -592,7 +625,7 @@ class Client(Protocol):
                 # Something has changed, either more or less is to be drawn, or a position of a drawing changed (e.g. when drawing on a moving unit)
                 self._debug_hash_tuple_last_iteration = debug_hash
                 try:
-                    await self._execute(
+                    await execute(
                         debug=sc_pb.RequestDebug(
                             debug=[
                                 debug_pb.DebugCommand(
@@ -620,7 +653,7 @@ class Client(Protocol):
         elif self._debug_draw_last_frame:
             # Clear drawing if we drew last frame but nothing to draw this frame
             self._debug_hash_tuple_last_iteration = (0, 0, 0, 0)
-            await self._execute(
+            await execute(
                 debug=sc_pb.RequestDebug(
                     debug=[
                         debug_pb.DebugCommand(draw=debug_pb.DebugDraw(text=None, lines=None, boxes=None, spheres=None))
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, AbstractSet, Dict, Iterable, List, NamedTuple, Union
+
+import numpy as np
+
+from sc2.data import Result
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.ids.upgrade_id import UpgradeId
+from sc2.unit_damage import DamageAttackers, DamageTargets, damage_matrix
+from sc2.units import Units
+
+if TYPE_CHECKING:
+    from sc2.game_data import GameData
+    from sc2.unit import Unit
+
+# Health and shield below this are treated as depleted, to avoid rounding errors when a pool is emptied exactly
+_DEPLETED = 1e-6
+
+
+class UnitTypeVitals(NamedTuple):
+    """Health, shield and if a unit type is flying, which the API does not provide per unit type."""
+
+    health: float
+    shield: float = 0
+    is_flying: bool = False
+
+    @classmethod
+    def from_units(cls, units: Iterable[Unit]) -> Dict[UnitTypeId, UnitTypeVitals]:
+        """Collects the vitals of the unit types of the units, e.g. of all enemy units that were seen so far.
+
+        Example::
+
+            self.vitals.update(UnitTypeVitals.from_units(self.enemy_units))
+
+        :param units:"""
+        return {unit.type_id: cls(unit.health_max, unit.shield_max, unit.is_flying) for unit in units}
+
+
+class FightArmy(NamedTuple):
+    """The units of one side of a fight, see simulate_fight."""
+
+    attackers: DamageAttackers
+    targets: DamageTargets
+    movement_speed: np.ndarray
+    # Minerals plus vespene of each unit
+    value: np.ndarray
+
+    @property
+    def size(self) -> int:
+        return len(self.value)
+
+    @classmethod
+    def from_units(cls, units: Units) -> FightArmy:
+        """
+        :param units:"""
+        game_data = units._bot_object.game_data if units else None
+        return cls(
+            attackers=DamageAttackers.from_units(units),
+            targets=DamageTargets.from_units(units),
+            movement_speed=np.array([unit.movement_speed for unit in units], dtype=np.float64),
+            value=_unit_values(game_data, [unit._proto.unit_type for unit in units]),
+        )
+
+    @classmethod
+    def from_unit_types(
+        cls,
+        unit_types: Dict[UnitTypeId, int],
+        vitals: Dict[UnitTypeId, UnitTypeVitals],
+        game_data: GameData,
+        attack_upgrade_level: int = 0,
+        armor_upgrade_level: int = 0,
+        shield_upgrade_level: int = 0,
+        upgrades: AbstractSet[UpgradeId] = frozenset(),
+        is_mine: bool = True,
+    ) -> FightArmy:
+        """Creates an army of completed units without buffs, e.g. to test a composition that is planned.
+
+        Example::
+
+            vitals = {UnitTypeId.MARINE: UnitTypeVitals(45), UnitTypeId.MEDIVAC: UnitTypeVitals(150, is_flying=True)}
+            army = FightArmy.from_unit_types({UnitTypeId.MARINE: 20, UnitTypeId.MEDIVAC: 2}, vitals, self.game_data)
+
+        :param unit_types: Amount of units of each type
+        :param vitals: Health, shield and if the unit type is flying for each of the unit types
+        :param game_data:
+        :param attack_upgrade_level:
+        :param armor_upgrade_level:
+        :param shield_upgrade_level:
+        :param upgrades: Upgrades of the owner of the units
+        :param is_mine: If the units belong to the bot, otherwise they belong to the enemy
+        """
+        types: List[UnitTypeId] = [unit_type for unit_type, amount in unit_types.items() for _ in range(amount)]
+        type_values = np.array([unit_type.value for unit_type in types], dtype=np.int64)
+        return cls(
+            attackers=DamageAttackers.from_unit_types(types, attack_upgrade_level, upgrades, is_mine),
+            targets=DamageTargets.from_unit_types(
+                types,
+                [vitals[unit_type].is_flying for unit_type in types],
+                [vitals[unit_type].health for unit_type in types],
+                [vitals[unit_type].shield for unit_type in types],
+                game_data,
+                armor_upgrade_level,
+                shield_upgrade_level,
+                upgrades,
+                is_mine,
+            ),
+            movement_speed=game_data.unit_types.lookup("movement_speed", type_values),
+            value=_unit_values(game_data, type_values.tolist()),
+        )
+
+    @classmethod
+    def concatenate(cls, armies: Iterable[FightArmy]) -> FightArmy:
+        """Combines armies into one, e.g. the units we have and the units that we are about to produce.
+
+        :param armies:"""
+        armies = list(armies)
+        return cls(
+            attackers=DamageAttackers(*map(np.concatenate, zip(*(army.attackers for army in armies)))),
+            targets=DamageTargets(*map(np.concatenate, zip(*(army.targets for army in armies)))),
+            movement_speed=np.concatenate([army.movement_speed for army in armies]),
+            value=np.concatenate([army.value for army in armies]),
+        )
+
+
+def _unit_values(game_data: GameData, unit_types: List[int]) -> np.ndarray:
+    """Minerals plus vespene of each unit, the same as BotAI.calculate_unit_value.
+
+    :param game_data:
+    :param unit_types:"""
+    values: Dict[int, float] = {}
+    for unit_type in set(unit_types):
+        unit_type_data = game_data.units.get(unit_type)
+        values[unit_type] = (
+            unit_type_data._proto.mineral_cost + unit_type_data._proto.vespene_cost if unit_type_data else 0
+        )
+    return np.array([values[unit_type] for unit_type in unit_types], dtype=np.float64)
+
+
+class FightResult(NamedTuple):
+    """Outcome of a simulated fight, seen from the first army."""
+
+    # Victory if only the first army has units left, Defeat if only the second army has units left, Tie otherwise
+    outcome: Result
+    # Game seconds until the fight ended or max_duration was reached
+    duration: float
+    # Minerals plus vespene of the units that survived
+    army_value: float
+    enemy_army_value: float
+    # Masks of the units that survived
+    army_survivors: np.ndarray
+    enemy_army_survivors: np.ndarray
+
+
+class _FightSide:
+    """Health and shield of the units of one army during simulate_fight, and their damage against the other army."""
+
+    def __init__(self, army: FightArmy, enemy_army: FightArmy, game_data: GameData, distance: float):
+        """
+        :param army:
+        :param enemy_army:
+        :param game_data:
+        :param distance:
+        """
+        self.health: np.ndarray = army.targets.health.astype(np.float64)
+        self.shield: np.ndarray = army.targets.shield.astype(np.float64)
+        self.alive: np.ndarray = self.health > 0
+        damage, attack_speed, attack_range = damage_matrix(army.attackers, enemy_army.targets, game_data)
+        self.dps_vs_shield: np.ndarray = np.divide(
+            damage, attack_speed, out=np.zeros_like(damage), where=attack_speed != 0
+        )
+        self.dps_vs_health: np.ndarray = self.dps_vs_shield
+        if enemy_army.targets.shield.any():
+            # Shield armor differs from armor, so the damage against the health of shielded units is separate
+            damage, attack_speed, _ = damage_matrix(
+                army.attackers,
+                enemy_army.targets._replace(shield=np.zeros_like(enemy_army.targets.shield)),
+                game_data,
+            )
+            self.dps_vs_health = np.divide(damage, attack_speed, out=np.zeros_like(damage), where=attack_speed != 0)
+        gap = np.maximum(distance - attack_range, 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Seconds per damage, infinite if the unit can't damage the enemy
+            self.seconds_per_damage_vs_shield: np.ndarray = 1 / self.dps_vs_shield
+            self.seconds_per_damage_vs_health: np.ndarray = 1 / self.dps_vs_health
+            # Units that can't move never reach enemies outside of their range
+            self.reach_time: np.ndarray = np.where(gap > 0, gap / army.movement_speed[:, None], 0)
+        self.reach_times: np.ndarray = np.unique(
+            self.reach_time[(self.reach_time > 0) & np.isfinite(self.reach_time) &
+                            ((self.dps_vs_shield > 0) | (self.dps_vs_health > 0))]
+        )
+
+    def damage_rates(self, enemy: _FightSide, time: float) -> np.ndarray:
+        """Returns the damage per second that each enemy unit takes. Each unit attacks the enemy in reach that it kills
+        the fastest.
+
+        :param enemy:
+        :param time:"""
+        enemy_has_shield = enemy.shield > 0
+        seconds_per_damage = np.where(
+            enemy_has_shield, self.seconds_per_damage_vs_shield, self.seconds_per_damage_vs_health
+        )
+        time_to_kill = np.where(enemy.alive, enemy.health + enemy.shield, np.inf) * seconds_per_damage
+        if self.reach_times.size:
+            time_to_kill[self.reach_time > time] = np.inf
+        targets = time_to_kill.argmin(axis=1)
+        attackers = np.flatnonzero(self.alive & np.isfinite(time_to_kill.min(axis=1)))
+        targets = targets[attackers]
+        dps = np.where(
+            enemy_has_shield[targets],
+            self.dps_vs_shield[attackers, targets],
+            self.dps_vs_health[attackers, targets],
+        )
+        return np.bincount(targets, weights=dps, minlength=len(enemy.health))
+
+    def take_damage(self, damage: np.ndarray):
+        """
+        :param damage: Damage that each unit takes, which does not exceed its shield if it has shield"""
+        has_shield = self.shield > 0
+        self.shield -= np.where(has_shield, damage, 0)
+        self.health -= np.where(has_shield, 0, damage)
+        self.shield[self.shield < _DEPLETED] = 0
+        self.health[self.health < _DEPLETED] = 0
+        self.alive = self.health > 0
+
+
+def simulate_fight(
+    army: Union[Units, FightArmy],
+    enemy_army: Union[Units, FightArmy],
+    game_data: GameData,
+    distance: float = 0,
+    max_duration: float = 60,
+) -> FightResult:
+    """Simulates a fight between two armies without a game, e.g. to decide if the bot should engage or retreat.
+
+    The fight is simplified: positions, unit collision, abilities, spells and healing are not simulated.
+    Each unit has a health and shield pool and deals its DPS from Unit.calculate_dps_vs_target, see sc2.unit_damage,
+    to the enemy it kills the fastest. Shields are damaged before health.
+    The armies start 'distance' apart. Each unit walks towards the enemy at its movement speed
+    until the enemy is in its attack range, so ranged units deal damage first. Units that can't move,
+    e.g. static defense, only attack enemies that are in range from the start.
+    Damage is dealt continuously, so the fight can be calculated in steps from one shield break or death to the next.
+
+    Example::
+
+        result = simulate_fight(self.units.not_structure, self.enemy_units, self.game_data)
+        if result.outcome == Result.Defeat:
+            for unit in self.units.not_structure:
+                unit.move(self.start_location)
+
+    :param army:
+    :param enemy_army:
+    :param game_data:
+    :param distance: Distance between the armies at the start
+    :param max_duration: Game seconds after which the fight ends
+    """
+    if isinstance(army, Units):
+        army = FightArmy.from_units(army)
+    if isinstance(enemy_army, Units):
+        enemy_army = FightArmy.from_units(enemy_army)
+    sides = (_FightSide(army, enemy_army, game_data, distance), _FightSide(enemy_army, army, game_data, distance))
+    # Units reaching an enemy change the damage rates
+    reach_times: List[float] = sorted(set(sides[0].reach_times.tolist()) | set(sides[1].reach_times.tolist()))
+    reach_index = 0
+
+    time = 0.0
+    while time < max_duration and sides[0].alive.any() and sides[1].alive.any():
+        while reach_index < len(reach_times) and reach_times[reach_index] <= time:
+            reach_index += 1
+        next_time = reach_times[reach_index] if reach_index < len(reach_times) else np.inf
+        # Damage per second that the units of each side take
+        damage_rates = (sides[1].damage_rates(sides[0], time), sides[0].damage_rates(sides[1], time))
+        # The rates change when the next shield or health pool is depleted
+        for side, damage_rate in zip(sides, damage_rates):
+            damaged = damage_rate > 0
+            if damaged.any():
+                pool = np.where(side.shield > 0, side.shield, side.health)
+                next_time = min(next_time, time + (pool[damaged] / damage_rate[damaged]).min())
+        if next_time == np.inf:
+            # Nobody can damage anyone
+            break
+        next_time = min(next_time, max_duration)
+        for side, damage_rate in zip(sides, damage_rates):
+            side.take_damage(damage_rate * (next_time - time))
+        time = next_time
+
+    army_alive, enemy_army_alive = sides[0].alive.any(), sides[1].alive.any()
+    if army_alive and not enemy_army_alive:
+        outcome = Result.Victory
+    elif enemy_army_alive and not army_alive:
+        outcome = Result.Defeat
+    else:
+        outcome = Result.Tie
+    return FightResult(
+        outcome=outcome,
+        duration=time,
+        army_value=float(army.value[sides[0].alive].sum()),
+        enemy_army_value=float(enemy_army.value[sides[1].alive].sum()),
+        army_survivors=sides[0].alive,
+        enemy_army_survivors=sides[1].alive,
+    )
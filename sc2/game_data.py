@@ -5,8 +5,11 @@ from bisect import bisect_left
 from contextlib import suppress
 from dataclasses import dataclass
 from functools import lru_cache
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, NamedTuple, Optional, Union
 
+import numpy as np
+
+from sc2.constants import DAMAGE_BONUS_PER_UPGRADE, TARGET_AIR, TARGET_GROUND, UNIT_BATTLECRUISER, UNIT_ORACLE
 from sc2.data import Attribute, Race
 from sc2.ids.ability_id import AbilityId
 from sc2.ids.unit_typeid import UnitTypeId
@@ -33,6 +36,10 @@ class GameData:
         }
         self.units: Dict[int, UnitTypeData] = {u.unit_id: UnitTypeData(self, u) for u in data.units if u.available}
         self.upgrades: Dict[int, UpgradeData] = {u.upgrade_id: UpgradeData(self, u) for u in data.upgrades}
+        # Static attributes of all unit types, shared by all Unit objects and used by vectorized Units filters
+        self.unit_types: UnitTypeTable = UnitTypeTable(self.units)
+        # Weapons of all unit types, used to calculate the damage of many units at once, see sc2.unit_damage
+        self.unit_weapons: UnitWeaponTable = UnitWeaponTable(self.units, self.unit_types.size)
         # Cached UnitTypeIds so that conversion does not take long. This needs to be moved elsewhere if a new GameData object is created multiple times per game
 
     @lru_cache(maxsize=256)
@@ -277,6 +284,174 @@ class UnitTypeData:
         )
 
 
+class UnitTypeRow(NamedTuple):
+    """ Static attributes of one unit type, see UnitTypeTable. Unit properties like 'ground_range' read from it. """
+
+    is_structure: bool
+    is_light: bool
+    is_armored: bool
+    is_biological: bool
+    is_mechanical: bool
+    is_massive: bool
+    is_psionic: bool
+    # Bit 'attribute.value' is set for each Attribute of the unit type
+    attributes: int
+    can_attack: bool
+    can_attack_ground: bool
+    can_attack_air: bool
+    ground_dps: float
+    ground_range: float
+    air_dps: float
+    air_range: float
+    armor: float
+    sight_range: float
+    movement_speed: float
+    footprint_radius: Optional[float]
+    cargo_size: int
+
+    @classmethod
+    def from_unit_type_data(cls, unit_type_data: UnitTypeData) -> UnitTypeRow:
+        proto = unit_type_data._proto
+        attributes = set(proto.attributes)
+        weapons = proto.weapons
+        unit_type = proto.unit_id
+        # Battlecruisers and oracles have no weapons in the game data
+        ground_weapon = next((weapon for weapon in weapons if weapon.type in TARGET_GROUND), None)
+        air_weapon = next((weapon for weapon in weapons if weapon.type in TARGET_AIR), None)
+        can_attack_ground = unit_type in {UNIT_BATTLECRUISER.value, UNIT_ORACLE.value} or ground_weapon is not None
+        can_attack_air = unit_type == UNIT_BATTLECRUISER.value or air_weapon is not None
+        if unit_type == UNIT_ORACLE.value:
+            ground_range = 4
+        elif unit_type == UNIT_BATTLECRUISER.value:
+            ground_range = 6
+        else:
+            ground_range = ground_weapon.range if ground_weapon else 0
+        return cls(
+            is_structure=Attribute.Structure.value in attributes,
+            is_light=Attribute.Light.value in attributes,
+            is_armored=Attribute.Armored.value in attributes,
+            is_biological=Attribute.Biological.value in attributes,
+            is_mechanical=Attribute.Mechanical.value in attributes,
+            is_massive=Attribute.Massive.value in attributes,
+            is_psionic=Attribute.Psionic.value in attributes,
+            attributes=sum(1 << attribute for attribute in attributes),
+            can_attack=bool(weapons) or unit_type in {UNIT_BATTLECRUISER.value, UNIT_ORACLE.value},
+            can_attack_ground=can_attack_ground,
+            can_attack_air=can_attack_air,
+            ground_dps=(ground_weapon.damage * ground_weapon.attacks) / ground_weapon.speed if ground_weapon else 0,
+            ground_range=ground_range,
+            air_dps=(air_weapon.damage * air_weapon.attacks) / air_weapon.speed if air_weapon else 0,
+            air_range=6 if unit_type == UNIT_BATTLECRUISER.value else air_weapon.range if air_weapon else 0,
+            armor=proto.armor,
+            sight_range=proto.sight_range,
+            movement_speed=proto.movement_speed,
+            footprint_radius=unit_type_data.footprint_radius,
+            cargo_size=proto.cargo_size,
+        )
+
+
+class UnitTypeTable:
+    """Static attributes of all unit types, built once in GameData.__init__.
+
+    'rows' contains a UnitTypeRow per available unit type id, which Unit objects read their type attributes from.
+    Each attribute is also available as numpy array with one entry per unit type id, e.g. 'table["ground_range"]',
+    so that they can be looked up for many units at once. Unknown unit type ids are mapped to the last entry,
+    which is 0, or NaN for 'footprint_radius', see lookup().
+    """
+
+    def __init__(self, units: Dict[int, UnitTypeData]):
+        """
+        :param units: GameData.units
+        """
+        self.rows: Dict[int, UnitTypeRow] = {
+            unit_type: UnitTypeRow.from_unit_type_data(unit_type_data)
+            for unit_type, unit_type_data in units.items()
+        }
+        self.size: int = max(max(units, default=0), max(unit_type.value for unit_type in UnitTypeId)) + 2
+        self._columns: Dict[str, np.ndarray] = {}
+        for name in UnitTypeRow._fields:
+            if name.startswith(("is_", "can_")):
+                column = np.zeros(self.size, dtype=bool)
+            elif name in {"attributes", "cargo_size"}:
+                column = np.zeros(self.size, dtype=np.int64)
+            else:
+                column = np.zeros(self.size, dtype=np.float64)
+            if name == "footprint_radius":
+                column[:] = np.nan
+            for unit_type, row in self.rows.items():
+                value = getattr(row, name)
+                if value is not None:
+                    column[unit_type] = value
+            self._columns[name] = column
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        """Returns the array of an attribute of UnitTypeRow, with the unit type id as index.
+
+        :param column:"""
+        return self._columns[column]
+
+    def lookup(self, column: str, unit_types: np.ndarray) -> np.ndarray:
+        """Returns the attribute of each unit type id in 'unit_types', unknown unit types get the value of the last entry.
+
+        :param column:
+        :param unit_types:"""
+        return self._columns[column][np.minimum(unit_types, self.size - 1)]
+
+
+class UnitWeaponTable:
+    """Weapons of all unit types as numpy arrays, indexed by unit type id and weapon index, e.g. 'damage[unit_type, 0]'.
+    Bonus damage arrays have the index of the damage bonus as third index. Unit types with fewer weapons or bonuses
+    are padded with weapons of type 0, which match no target, and bonuses of attribute 0, which no unit type has.
+
+    The damage per attack upgrade is taken from DAMAGE_BONUS_PER_UPGRADE, like in Unit.calculate_damage_vs_target.
+    """
+
+    def __init__(self, units: Dict[int, UnitTypeData], size: int):
+        """
+        :param units: GameData.units
+        :param size: UnitTypeTable.size
+        """
+        weapons_of_types = {unit_type: unit_type_data._proto.weapons for unit_type, unit_type_data in units.items()}
+        weapons_count = max((len(weapons) for weapons in weapons_of_types.values()), default=0)
+        bonuses_count = max(
+            (len(weapon.damage_bonus) for weapons in weapons_of_types.values() for weapon in weapons), default=0
+        )
+        shape = (size, max(weapons_count, 1))
+        bonus_shape = shape + (max(bonuses_count, 1), )
+        self.type: np.ndarray = np.zeros(shape, dtype=np.int64)
+        self.damage: np.ndarray = np.zeros(shape, dtype=np.float64)
+        self.attacks: np.ndarray = np.zeros(shape, dtype=np.int64)
+        self.speed: np.ndarray = np.zeros(shape, dtype=np.float64)
+        self.range: np.ndarray = np.zeros(shape, dtype=np.float64)
+        self.damage_per_upgrade: np.ndarray = np.zeros(shape, dtype=np.float64)
+        self.bonus_attribute: np.ndarray = np.zeros(bonus_shape, dtype=np.int64)
+        self.bonus: np.ndarray = np.zeros(bonus_shape, dtype=np.float64)
+        self.bonus_per_upgrade: np.ndarray = np.zeros(bonus_shape, dtype=np.float64)
+        damage_per_upgrade_of_types = {
+            unit_type.value: damage_per_upgrade
+            for unit_type, damage_per_upgrade in DAMAGE_BONUS_PER_UPGRADE.items()
+        }
+        for unit_type, weapons in weapons_of_types.items():
+            damage_per_upgrade_of_type = damage_per_upgrade_of_types.get(unit_type, {})
+            for index, weapon in enumerate(weapons):
+                damage_per_upgrade = damage_per_upgrade_of_type.get(weapon.type, {})
+                self.type[unit_type, index] = weapon.type
+                self.damage[unit_type, index] = weapon.damage
+                self.attacks[unit_type, index] = weapon.attacks
+                self.speed[unit_type, index] = weapon.speed
+                self.range[unit_type, index] = weapon.range
+                self.damage_per_upgrade[unit_type, index] = damage_per_upgrade.get(None, 1)
+                for bonus_index, bonus in enumerate(weapon.damage_bonus):
+                    self.bonus_attribute[unit_type, index, bonus_index] = bonus.attribute
+                    self.bonus[unit_type, index, bonus_index] = bonus.bonus
+                    self.bonus_per_upgrade[unit_type, index, bonus_index] = damage_per_upgrade.get(bonus.attribute, 0)
+
+    @property
+    def weapons_count(self) -> int:
+        """ The maximum amount of weapons of a unit type. """
+        return self.type.shape[1]
+
+
 class UpgradeData:
 
     def __init__(self, game_data: GameData, proto):
@@ -1,17 +1,21 @@
 from __future__ import annotations
 
 import heapq
-from collections import deque
+import warnings
 from dataclasses import dataclass
 from functools import cached_property
-from typing import Deque, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
 
 import numpy as np
 
-from sc2.pixel_map import PixelMap
+from sc2.pixel_map import EIGHT_CONNECTIVITY, PixelMap
 from sc2.player import Player, Race
 from sc2.position import Point2, Rect, Size
 
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from scipy.ndimage import label, maximum_filter, minimum_filter
+
 
 @dataclass
 class Ramp:
@@ -248,68 +252,54 @@ class GameInfo:
         """Calculate points that are pathable but not placeable.
         Then divide them into ramp points if not all points around the points are equal height
         and into vision blockers if they are."""
-
-        def equal_height_around(tile):
-            # mask to slice array 1 around tile
-            sliced = self.terrain_height.data_numpy[tile[1] - 1:tile[1] + 2, tile[0] - 1:tile[0] + 2]
-            return len(np.unique(sliced)) == 1
-
         map_area = self.playable_area
         # all points in the playable area that are pathable but not placable
-        points = [
-            Point2((a, b)) for (b, a), value in np.ndenumerate(self.pathing_grid.data_numpy)
-            if value == 1 and map_area.x <= a < map_area.x + map_area.width and map_area.y <= b < map_area.y +
-            map_area.height and self.placement_grid[(a, b)] == 0
-        ]
+        points: np.ndarray = np.zeros_like(self.pathing_grid.data_numpy, dtype=bool)
+        area_slice = (
+            slice(int(map_area.y), int(map_area.y + map_area.height)),
+            slice(int(map_area.x), int(map_area.x + map_area.width)),
+        )
+        points[area_slice] = (self.pathing_grid.data_numpy[area_slice] == 1
+                              ) & (self.placement_grid.data_numpy[area_slice] == 0)
+
+        # A point has equal height around if the minimum and maximum height of the 3x3 square around it are the same
+        height: np.ndarray = self.terrain_height.data_numpy
+        equal_height_around: np.ndarray = (
+            maximum_filter(height, size=3, mode="nearest") == minimum_filter(height, size=3, mode="nearest")
+        )
+        # Points in the first row or column have been treated as ramp points, as slicing [-1:2] returns an empty array
+        equal_height_around[0, :] = False
+        equal_height_around[:, 0] = False
+
         # divide points into ramp points and vision blockers
-        ramp_points = [point for point in points if not equal_height_around(point)]
-        vision_blockers = frozenset(point for point in points if equal_height_around(point))
-        ramps = [Ramp(group, self) for group in self._find_groups(ramp_points)]
+        vision_blocker_ys, vision_blocker_xs = np.nonzero(points & equal_height_around)
+        vision_blockers = frozenset(
+            Point2(point) for point in zip(vision_blocker_xs.tolist(), vision_blocker_ys.tolist())
+        )
+        ramps = [Ramp(group, self) for group in self._find_groups_in_mask(points & ~equal_height_around)]
         return ramps, vision_blockers
 
+    @staticmethod
+    def _find_groups_in_mask(mask: np.ndarray, minimum_points_per_group: int = 8) -> List[FrozenSet[Point2]]:
+        """Returns the groups of 8-connected points where the mask is True which have at least 'minimum_points_per_group' points.
+
+        :param mask: boolean array of shape (height, width)
+        :param minimum_points_per_group:
+        """
+        labels, amount = label(mask, structure=EIGHT_CONNECTIVITY)
+        return [
+            group for group in PixelMap._labels_to_point_sets(labels, amount)
+            if len(group) >= minimum_points_per_group
+        ]
+
     def _find_groups(self, points: FrozenSet[Point2], minimum_points_per_group: int = 8) -> Iterable[FrozenSet[Point2]]:
         """
         From a set of points, this function will try to group points together by
-        painting clusters of points in a rectangular map using flood fill algorithm.
+        labelling clusters of 8-connected points in a rectangular map.
         Returns groups of points as list, like [{p1, p2, p3}, {p4, p5, p6, p7, p8}]
         """
-        # TODO do we actually need colors here? the ramps will never touch anyways.
-        NOT_COLORED_YET = -1
-        map_width = self.pathing_grid.width
-        map_height = self.pathing_grid.height
-        current_color: int = NOT_COLORED_YET
-        picture: List[List[int]] = [[-2 for _ in range(map_width)] for _ in range(map_height)]
-
-        def paint(pt: Point2) -> None:
-            picture[pt.y][pt.x] = current_color
-
-        nearby: List[Tuple[int, int]] = [(a, b) for a in [-1, 0, 1] for b in [-1, 0, 1] if a != 0 or b != 0]
-
-        remaining: Set[Point2] = set(points)
-        for point in remaining:
-            paint(point)
-        current_color = 1
-        queue: Deque[Point2] = deque()
-        while remaining:
-            current_group: Set[Point2] = set()
-            if not queue:
-                start = remaining.pop()
-                paint(start)
-                queue.append(start)
-                current_group.add(start)
-            while queue:
-                base: Point2 = queue.popleft()
-                for offset in nearby:
-                    px, py = base.x + offset[0], base.y + offset[1]
-                    # Do we ever reach out of map bounds?
-                    if not (0 <= px < map_width and 0 <= py < map_height):
-                        continue
-                    if picture[py][px] != NOT_COLORED_YET:
-                        continue
-                    point: Point2 = Point2((px, py))
-                    remaining.discard(point)
-                    paint(point)
-                    queue.append(point)
-                    current_group.add(point)
-            if len(current_group) >= minimum_points_per_group:
-                yield frozenset(current_group)
+        mask: np.ndarray = np.zeros((self.pathing_grid.height, self.pathing_grid.width), dtype=bool)
+        if points:
+            xs, ys = zip(*points)
+            mask[list(ys), list(xs)] = True
+        return self._find_groups_in_mask(mask, minimum_points_per_group)
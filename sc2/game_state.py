@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import time
+from collections import Counter
 from dataclasses import dataclass
 from functools import cached_property
 from itertools import chain
+from typing import Counter as CounterType
 from typing import List, Optional, Set, Union
 
 from loguru import logger
@@ -193,13 +196,35 @@ class ActionError(AbilityLookupTemplateClass):
     result: int
 
 
+class timed_cached_property(cached_property):
+    """cached_property of GameState which adds the time of its first access to GameState.field_decode_times
+    if GameState.measure_field_decode_times is True."""
+
+    def __get__(self, instance, owner=None):
+        if instance is None or not GameState.measure_field_decode_times:
+            return super().__get__(instance, owner)
+        t0 = time.perf_counter()
+        value = super().__get__(instance, owner)
+        GameState.field_decode_times[self.attrname] += time.perf_counter() - t0
+        GameState.field_decode_counts[self.attrname] += 1
+        return value
+
+
 class GameState:
+    # Set this to True to measure how long decoding each field of the game state takes, see field_decode_time_report
+    measure_field_decode_times: bool = False
+    # Total time in seconds and amount of decodings of each field, summed up over all game states
+    field_decode_times: CounterType[str] = Counter()
+    field_decode_counts: CounterType[str] = Counter()
 
     def __init__(self, response_observation, previous_observation=None):
         """
+        Fields like score, upgrades, visibility, creep and effects are only decoded from the observation on first access.
+
         :param response_observation:
         :param previous_observation:
         """
+        t0 = time.perf_counter()
         # Only filled in realtime=True in case the bot skips frames
         self.previous_observation = previous_observation
         self.response_observation = response_observation
@@ -210,31 +235,67 @@ class GameState:
         self.player_result = response_observation.player_result
         self.common: Common = Common(self.observation.player_common)
 
-        # Area covered by Pylons and Warpprisms
-        self.psionic_matrix: PsionicMatrix = PsionicMatrix.from_proto(self.observation_raw.player.power_sources)
         # 22.4 per second on faster game speed
         self.game_loop: int = self.observation.game_loop
-
-        # https://github.com/Blizzard/s2client-proto/blob/33f0ecf615aa06ca845ffe4739ef3133f37265a9/s2clientprotocol/score.proto#L31
-        self.score: ScoreDetails = ScoreDetails(self.observation.score)
         self.abilities = self.observation.abilities  # abilities of selected units
-        self.upgrades: Set[UpgradeId] = {UpgradeId(upgrade) for upgrade in self.observation_raw.player.upgrade_ids}
+        if GameState.measure_field_decode_times:
+            GameState.field_decode_times["__init__"] += time.perf_counter() - t0
+            GameState.field_decode_counts["__init__"] += 1
+
+    @classmethod
+    def field_decode_time_report(cls) -> str:
+        """Returns a table of the time spent decoding each field of the game state, most expensive fields first.
+        Only filled if 'GameState.measure_field_decode_times = True' was set.
 
-        # self.visibility[point]: 0=Hidden, 1=Fogged, 2=Visible
-        self.visibility: PixelMap = PixelMap(self.observation_raw.map_state.visibility)
-        # self.creep[point]: 0=No creep, 1=creep
-        self.creep: PixelMap = PixelMap(self.observation_raw.map_state.creep, in_bits=True)
+        Example::
 
-        # Effects like ravager bile shot, lurker attack, everything in effect_id.py
-        self.effects: Set[EffectData] = {EffectData(effect) for effect in self.observation_raw.effects}
-        """ Usage:
+            GameState.measure_field_decode_times = True
+            # ... after the game
+            logger.info(GameState.field_decode_time_report())
+        """
+        lines = [f"{'field':<20} {'decodes':>8} {'total ms':>10} {'ms/decode':>10}"]
+        for field, total_time in cls.field_decode_times.most_common():
+            count = cls.field_decode_counts[field]
+            lines.append(f"{field:<20} {count:>8} {1000 * total_time:>10.3f} {1000 * total_time / count:>10.4f}")
+        return "\n".join(lines)
+
+    @timed_cached_property
+    def psionic_matrix(self) -> PsionicMatrix:
+        """ Area covered by Pylons and Warpprisms """
+        return PsionicMatrix.from_proto(self.observation_raw.player.power_sources)
+
+    @timed_cached_property
+    def score(self) -> ScoreDetails:
+        """ https://github.com/Blizzard/s2client-proto/blob/33f0ecf615aa06ca845ffe4739ef3133f37265a9/s2clientprotocol/score.proto#L31 """
+        return ScoreDetails(self.observation.score)
+
+    @timed_cached_property
+    def upgrades(self) -> Set[UpgradeId]:
+        return {UpgradeId(upgrade) for upgrade in self.observation_raw.player.upgrade_ids}
+
+    @timed_cached_property
+    def visibility(self) -> PixelMap:
+        """ self.visibility[point]: 0=Hidden, 1=Fogged, 2=Visible """
+        return PixelMap(self.observation_raw.map_state.visibility)
+
+    @timed_cached_property
+    def creep(self) -> PixelMap:
+        """ self.creep[point]: 0=No creep, 1=creep """
+        return PixelMap(self.observation_raw.map_state.creep, in_bits=True)
+
+    @timed_cached_property
+    def effects(self) -> Set[EffectData]:
+        """Effects like ravager bile shot, lurker attack, everything in effect_id.py
+
+        Usage:
         for effect in self.state.effects:
             if effect.id == EffectId.RAVAGERCORROSIVEBILECP:
                 positions = effect.positions
                 # dodge the ravager biles
         """
+        return {EffectData(effect) for effect in self.observation_raw.effects}
 
-    @cached_property
+    @timed_cached_property
     def dead_units(self) -> Set[int]:
         """ A set of unit tags that died this frame """
         _dead_units = set(self.observation_raw.event.dead_units)
@@ -242,7 +303,7 @@ class GameState:
             return _dead_units | set(self.previous_observation.observation.raw_data.event.dead_units)
         return _dead_units
 
-    @cached_property
+    @timed_cached_property
     def chat(self) -> List[ChatMessage]:
         """List of chat messages sent this frame (by either player)."""
         previous_frame_chat = self.previous_observation.chat if self.previous_observation else []
@@ -251,7 +312,7 @@ class GameState:
             for message in chain(previous_frame_chat, self.response_observation.chat)
         ]
 
-    @cached_property
+    @timed_cached_property
     def alerts(self) -> List[int]:
         """
         Game alerts, see https://github.com/Blizzard/s2client-proto/blob/01ab351e21c786648e4c6693d4aad023a176d45c/s2clientprotocol/sc2api.proto#L683-L706
@@ -260,7 +321,7 @@ class GameState:
             return list(chain(self.previous_observation.observation.alerts, self.observation.alerts))
         return self.observation.alerts
 
-    @cached_property
+    @timed_cached_property
     def actions(self) -> List[Union[ActionRawUnitCommand, ActionRawToggleAutocast, ActionRawCameraMove]]:
         """
         List of successful actions since last frame.
@@ -314,7 +375,7 @@ class GameState:
                 actions.append(ActionRawCameraMove(Point2.from_proto(action.action_raw.camera_move.center_world_space)))
         return actions
 
-    @cached_property
+    @timed_cached_property
     def actions_unit_commands(self) -> List[ActionRawUnitCommand]:
         """
         List of successful unit actions since last frame.
@@ -322,7 +383,7 @@ class GameState:
         """
         return list(filter(lambda action: isinstance(action, ActionRawUnitCommand), self.actions))
 
-    @cached_property
+    @timed_cached_property
     def actions_toggle_autocast(self) -> List[ActionRawToggleAutocast]:
         """
         List of successful autocast toggle actions since last frame.
@@ -330,7 +391,7 @@ class GameState:
         """
         return list(filter(lambda action: isinstance(action, ActionRawToggleAutocast), self.actions))
 
-    @cached_property
+    @timed_cached_property
     def action_errors(self) -> List[ActionError]:
         """
         List of erroneous actions since last frame.
@@ -4,14 +4,13 @@ from __future__ import annotations
 import asyncio
 import json
 import os
-import platform
 import signal
 import sys
 from contextlib import suppress
 from dataclasses import dataclass
 from io import BytesIO
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 
 import mpyq
 import portpicker
@@ -20,16 +19,19 @@ from loguru import logger
 from s2clientprotocol import sc2api_pb2 as sc_pb
 
 from sc2.bot_ai import BotAI
+from sc2.capture import CaptureWebSocket, pair_capture_records, read_capture
 from sc2.client import Client
 from sc2.controller import Controller
-from sc2.data import CreateGameError, Result, Status
+from sc2.data import CreateGameError, Race, Result, Status
 from sc2.game_state import GameState
 from sc2.maps import Map
 from sc2.player import AbstractPlayer, Bot, BotProcess, Human
 from sc2.portconfig import Portconfig
+from sc2.process_pool import LAUNCH_INTERVAL, SC2ProcessPool, close_controller, launch_sc2_processes
 from sc2.protocol import ConnectionAlreadyClosed, ProtocolError
 from sc2.proxy import Proxy
 from sc2.sc2process import SC2Process, kill_switch
+from sc2.step_profiler import StepProfiler
 
 # Set the global logging level
 logger.remove()
@@ -151,6 +153,8 @@ async def _play_game_ai(
         logger.debug(f"Running AI step, it={iteration} {gs.game_loop / 22.4:.2f}s")
         # Issue event like unit created or unit destroyed
         await ai.issue_events()
+        if profiler is not None:
+            profiler.mark("issue_events")
         # In on_step various errors can occur - log properly
         try:
             await ai.on_step(iteration)
@@ -160,12 +164,24 @@ async def _play_game_ai(
         except Exception as e:
             logger.exception(f"Caught unknown exception: {e}")
             raise
+        if profiler is not None:
+            profiler.mark("on_step")
+        await ai._run_scheduled_tasks()
+        if profiler is not None:
+            profiler.mark("scheduled_tasks")
         await ai._after_step()
         logger.debug("Running AI step: done")
 
     # Only used in realtime=True
     previous_state_observation = None
+    # Only used with ai.pipeline_requests: requests which were sent together with the step request of the previous iteration
+    observation_request: Optional[asyncio.Future] = None
+    game_info_request: Optional[asyncio.Future] = None
+    # Only used if the bot has a StepProfiler, see step_profiler.py
+    profiler: Optional[StepProfiler] = ai.step_profiler
     for iteration in range(10**10):
+        if profiler is not None:
+            profiler.begin_iteration(iteration)
         if realtime and gs:
             # On realtime=True, might get an error here: sc2.protocol.ProtocolError: ['Not in a game']
             with suppress(ProtocolError):
@@ -177,7 +193,10 @@ async def _play_game_ai(
                     previous_state_observation = state.observation
                     state = await client.observation(state.observation.observation.game_loop + 1)
         else:
-            state = await client.observation()
+            state = await client.observation(request=observation_request)
+        if profiler is not None:
+            profiler.mark("observation_wait", client._last_receive_ns)
+            profiler.mark("observation_parse")
 
         # check game result every time we get the observation
         if client._game_result:
@@ -185,13 +204,26 @@ async def _play_game_ai(
             return client._game_result[player_id]
         gs = GameState(state.observation, previous_state_observation)
         previous_state_observation = None
-        logger.debug(f"Score: {gs.score.score}")
+        # The score is only decoded if debug logging is enabled
+        logger.opt(lazy=True).debug("Score: {}", lambda: gs.score.score)
+        if profiler is not None:
+            profiler.set_game_loop(gs.game_loop)
+            profiler.mark("game_state")
 
         if game_time_limit and gs.game_loop / 22.4 > game_time_limit:
             await ai.on_end(Result.Tie)
             return Result.Tie
-        proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
+        proto_game_info = None
+        if game_info_request is not None:
+            proto_game_info = await client._receive_response(game_info_request)
+        elif ai._should_request_game_info(gs.game_loop):
+            proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
+        observation_request = game_info_request = None
+        if profiler is not None:
+            profiler.mark("game_info")
         ai._prepare_step(gs, proto_game_info)
+        if profiler is not None:
+            profiler.mark("prepare_step")
 
         await run_bot_iteration(iteration)  # Main bot loop
 
@@ -201,7 +233,17 @@ async def _play_game_ai(
                 return client._game_result[player_id]
 
             # TODO: In bot vs bot, if the other bot ends the game, this bot gets stuck in requesting an observation when using main.py:run_multiple_games
-            await client.step()
+            if ai.pipeline_requests:
+                # Send step, observation and game info back to back, their responses are received in the next iteration
+                await client.step(wait_for_response=False)
+                observation_request = await client._send_request(observation=sc_pb.RequestObservation())
+                # The step request advances the game by exactly client.game_step game loops
+                if ai._should_request_game_info(gs.game_loop + client.game_step):
+                    game_info_request = await client._send_request(game_info=sc_pb.RequestGameInfo())
+            else:
+                await client.step()
+            if profiler is not None:
+                profiler.mark("step")
     return Result.Undecided
 
 
@@ -223,7 +265,10 @@ async def _play_game(
     if isinstance(player, Human):
         result = await _play_game_human(client, player_id, realtime, game_time_limit)
     else:
-        result = await _play_game_ai(client, player_id, player.ai, realtime, game_time_limit)
+        try:
+            result = await _play_game_ai(client, player_id, player.ai, realtime, game_time_limit)
+        finally:
+            player.ai._release_resources()
 
     logger.info(
         f"Result for player {player_id} - {player.name if player.name else str(player)}: "
@@ -280,9 +325,11 @@ async def _play_replay(client, ai, realtime=False, player_id=0):
                     return client._game_result[player_id]
                 return client._game_result[player_id]
             gs = GameState(state.observation)
-            logger.debug(f"Score: {gs.score.score}")
+            logger.opt(lazy=True).debug("Score: {}", lambda: gs.score.score)
 
-            proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
+            proto_game_info = None
+            if ai._should_request_game_info(gs.game_loop):
+                proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
             ai._prepare_step(gs, proto_game_info)
 
         logger.debug(f"Running AI step, it={iteration} {gs.game_loop * 0.725 * (1 / 16):.2f}s")
@@ -348,6 +395,7 @@ async def _host_game(
     random_seed=None,
     sc2_version=None,
     disable_fog=None,
+    capture_as=None,
 ):
 
     assert players, "Can't create a game without players"
@@ -366,7 +414,12 @@ async def _host_game(
         if not isinstance(players[0], Human) and getattr(players[0].ai, "raw_affects_selection", None) is not None:
             client.raw_affects_selection = players[0].ai.raw_affects_selection
 
-        result = await _play_game(players[0], client, realtime, portconfig, game_time_limit, rgb_render_config)
+        if capture_as is not None:
+            client.start_capture(capture_as)
+        try:
+            result = await _play_game(players[0], client, realtime, portconfig, game_time_limit, rgb_render_config)
+        finally:
+            client.stop_capture()
         if client.save_replay_path is not None:
             await client.save_replay(client.save_replay_path)
         try:
@@ -459,6 +512,39 @@ async def _host_replay(replay_path, ai, realtime, _portconfig, base_build, data_
         return result
 
 
+async def a_replay_capture(ai: BotAI, capture_path: Union[str, Path]) -> Optional[Result]:
+    """See replay_capture.
+
+    :param ai:
+    :param capture_path:"""
+    exchanges = pair_capture_records(read_capture(capture_path))
+    join_request = next((request.join_game for request, _ in exchanges if request.HasField("join_game")), None)
+    assert join_request is not None, f"{capture_path} does not contain the start of a game"
+    client = Client(CaptureWebSocket(exchanges))
+    try:
+        return await _play_game(
+            Bot(Race(join_request.race), ai, name=join_request.player_name or None), client, False, None
+        )
+    except ConnectionAlreadyClosed:
+        logger.error("The capture ended before the game ended")
+        return None
+
+
+def replay_capture(ai: BotAI, capture_path: Union[str, Path]) -> Optional[Result]:
+    """Plays a game that was captured with 'capture_as' again without SC2: the bot receives the recorded observations
+    and runs _prepare_step, issue_events and on_step for each of them as fast as possible.
+    Use this to reproduce slow steps of a real game, or as benchmark. Actions of the bot have no effect on the game.
+
+    Example::
+
+        run_game(maps.get("AcropolisLE"), [Bot(Race.Terran, MyBot()), Computer(Race.Zerg, Difficulty.Hard)], capture_as="game.sc2capture")
+        replay_capture(MyBot(), "game.sc2capture")
+
+    :param ai:
+    :param capture_path: File that was written with 'capture_as', see Protocol.start_capture"""
+    return asyncio.run(a_replay_capture(ai, capture_path))
+
+
 def get_replay_version(replay_path: Union[str, Path]) -> Tuple[str, str]:
     with open(replay_path, 'rb') as f:
         replay_data = f.read()
@@ -477,7 +563,9 @@ def run_game(map_settings, players, **kwargs) -> Union[Result, List[Optional[Res
     Returns a list of two Result enums if the game was "Human vs Bot" or "Bot vs Bot".
     """
     if sum(isinstance(p, (Human, Bot)) for p in players) > 1:
-        host_only_args = ["save_replay_as", "rgb_render_config", "random_seed", "sc2_version", "disable_fog"]
+        host_only_args = [
+            "save_replay_as", "rgb_render_config", "random_seed", "sc2_version", "disable_fog", "capture_as"
+        ]
         join_kwargs = {k: v for k, v in kwargs.items() if k not in host_only_args}
 
         portconfig = Portconfig()
@@ -519,11 +607,13 @@ async def play_from_websocket(
     save_replay_as=None,
     game_time_limit: int = None,
     should_close=True,
+    capture_as=None,
 ):
     """Use this to play when the match is handled externally e.g. for bot ladder games.
     Portconfig MUST be specified if not playing vs Computer.
     :param ws_connection: either a string("ws://{address}:{port}/sc2api") or a ClientWebSocketResponse object
     :param should_close: closes the connection if True. Use False if something else will reuse the connection
+    :param capture_as: path of a file to which all requests and responses are written, see replay_capture
 
     e.g. ladder usage: play_from_websocket("ws://127.0.0.1:5162/sc2api", MyBot, False, portconfig=my_PC)
     """
@@ -534,7 +624,12 @@ async def play_from_websocket(
             ws_connection = await session.ws_connect(ws_connection, timeout=120)
             should_close = True
         client = Client(ws_connection)
-        result = await _play_game(player, client, realtime, portconfig, game_time_limit=game_time_limit)
+        if capture_as is not None:
+            client.start_capture(capture_as)
+        try:
+            result = await _play_game(player, client, realtime, portconfig, game_time_limit=game_time_limit)
+        finally:
+            client.stop_capture()
         if save_replay_as is not None:
             await client.save_replay(save_replay_as)
     except ConnectionAlreadyClosed:
@@ -549,19 +644,29 @@ async def play_from_websocket(
     return result
 
 
-async def run_match(controllers: List[Controller], match: GameMatch, close_ws=True):
+async def run_match(controllers: List[Controller], match: GameMatch, close_ws=True, portconfig: Portconfig = None):
+    """
+    :param controllers: One controller for each player that needs SC2, the first one hosts the game
+    :param match:
+    :param close_ws:
+    :param portconfig: Ports of the players of a match with more than one SC2 instance.
+        If None, free ports are picked and returned after the match
+    """
     await _setup_host_game(controllers[0], **match.host_game_kwargs)
 
     # Setup portconfig beforehand, so all players use the same ports
     startport = None
-    portconfig = None
+    picked_portconfig = None
     if match.needed_sc2_count > 1:
+        if portconfig is None:
+            if any(isinstance(player, BotProcess) for player in match.players):
+                portconfig = Portconfig.contiguous_ports()
+            else:
+                portconfig = Portconfig()
+            picked_portconfig = portconfig
         if any(isinstance(player, BotProcess) for player in match.players):
-            portconfig = Portconfig.contiguous_ports()
             # Most ladder bots generate their server and client ports as [s+2, s+3], [s+4, s+5]
             startport = portconfig.server[0] - 2
-        else:
-            portconfig = Portconfig()
 
     proxies = []
     coros = []
@@ -584,7 +689,11 @@ async def run_match(controllers: List[Controller], match: GameMatch, close_ws=Tr
                 )
             )
 
-    async_results = await asyncio.gather(*coros, return_exceptions=True)
+    try:
+        async_results = await asyncio.gather(*coros, return_exceptions=True)
+    finally:
+        if picked_portconfig is not None:
+            picked_portconfig.clean()
 
     if not isinstance(async_results, list):
         async_results = [async_results]
@@ -654,25 +763,14 @@ async def maintain_SCII_count(count: int, controllers: List[Controller], proc_ar
         extra = [SC2Process(**proc_args[(index + _) % len(proc_args)]) for _ in range(needed)]
         logger.info(f"Creating {needed} more SC2 Processes")
         for _ in range(3):
-            if platform.system() == "Linux":
-                # Works on linux: start one client after the other
-                # pylint: disable=C2801
-                new_controllers = [await asyncio.wait_for(sc.__aenter__(), timeout=50) for sc in extra]
-            else:
-                # Doesnt seem to work on linux: starting 2 clients nearly at the same time
-                new_controllers = await asyncio.wait_for(
-                    # pylint: disable=C2801
-                    asyncio.gather(*[sc.__aenter__() for sc in extra], return_exceptions=True),
-                    timeout=50
-                )
+            # Start the clients a few seconds apart, their startups overlap
+            new_controllers = await launch_sc2_processes(extra, LAUNCH_INTERVAL, timeout=50)
 
             controllers.extend(c for c in new_controllers if isinstance(c, Controller))
             if len(controllers) == count:
                 await asyncio.wait_for(asyncio.gather(*(c.ping() for c in controllers)), timeout=20)
                 break
-            extra = [
-                extra[i] for i, result in enumerate(new_controllers) if not isinstance(new_controllers, Controller)
-            ]
+            extra = [extra[i] for i, result in enumerate(new_controllers) if not isinstance(result, Controller)]
         else:
             logger.critical("Could not launch sufficient SC2")
             raise RuntimeError
@@ -766,3 +864,127 @@ async def a_run_multiple_games_nokill(matches: List[GameMatch]) -> List[Dict[Abs
     signal.signal(signal.SIGINT, signal.SIG_DFL)
 
     return results
+
+
+# TODO Catching too general exception Exception (broad-except)
+# pylint: disable=W0703
+async def a_run_multiple_games_pool(matches: List[GameMatch],
+                                    pool: SC2ProcessPool) -> List[Optional[Dict[AbstractPlayer, Result]]]:
+    """Run multiple matches with controllers of a warm SC2ProcessPool, so the matches do not wait for SC2 to start.
+    The processes are reused after matches against the computer and replaced after bot vs bot matches,
+    because keeping them alive after those can cause crashes.
+    """
+    results = []
+    for m in matches:
+        logger.info(f"Starting match {1 + len(results)} / {len(matches)}: {m}")
+        result = None
+        controllers = await pool.acquire(m.needed_sc2_count)
+        try:
+            result = await run_match(controllers, m, close_ws=False)
+        except SystemExit as e:
+            logger.info(f"Game exit'ed as {e} during match {m}")
+        except Exception as e:
+            logger.exception(f"Caught unknown exception: {e}")
+            logger.info(f"Exception {e} thrown in match {m}")
+        finally:
+            await pool.release(controllers, recycle=m.needed_sc2_count == 1)
+            results.append(result)
+    return results
+
+
+async def _run_match_with_timeout(
+    controllers: List[Controller], match: GameMatch, timeout: Optional[float]
+) -> Optional[Dict[AbstractPlayer, Result]]:
+    """Runs the match, raises asyncio.TimeoutError if it did not finish within 'timeout' seconds.
+    Cancelling the match alone does not stop it if SC2 hangs, because a request that was sent still waits for its
+    response, see Protocol._receive_next_response. So the controllers are closed first, which makes that receive fail.
+
+    :param controllers:
+    :param match:
+    :param timeout:"""
+    task = asyncio.ensure_future(run_match(controllers, match, close_ws=False))
+    try:
+        await asyncio.wait({task}, timeout=timeout)
+        if not task.done():
+            raise asyncio.TimeoutError
+        return task.result()
+    finally:
+        if not task.done():
+            for controller in controllers:
+                await close_controller(controller)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+# TODO Catching too general exception Exception (broad-except)
+# pylint: disable=W0703
+async def a_run_multiple_games_concurrently(
+    matches: List[GameMatch],
+    max_parallel: int = 2,
+    pool: Optional[SC2ProcessPool] = None,
+    match_timeout: Optional[float] = None,
+) -> AsyncIterator[Tuple[int, Optional[Dict[AbstractPlayer, Result]]]]:
+    """Runs up to 'max_parallel' matches at the same time on the SC2 processes of a pool,
+    and yields '(index of the match, result)' in the order in which the matches finish.
+
+    Each match runs in its own task: an exception, a crashed SC2 process or a match that takes longer than
+    'match_timeout' seconds only ends that match with the result None, and its SC2 processes are replaced.
+    Python bots still share the event loop of this process, so a bot that blocks it slows down all matches.
+    A bot instance must not be used in two matches at the same time.
+
+    Example::
+
+        async for index, result in a_run_multiple_games_concurrently(matches, max_parallel=8, match_timeout=3600):
+            logger.info(f"Match {index}: {result}")
+
+    :param matches:
+    :param max_parallel: Maximum amount of matches that are played at the same time
+    :param pool: Pool of SC2 processes, whose proc_args are used instead of the sc2_config of the matches.
+        If None, a pool with enough processes for 'max_parallel' matches is created and closed at the end,
+        which requires all matches to have the same sc2_config
+    :param match_timeout: Seconds after which a match is stopped"""
+    if not matches:
+        return
+    assert max_parallel > 0
+    own_pool = pool is None
+    if own_pool:
+        sc2_config = matches[0].sc2_config
+        assert all(m.sc2_config == sc2_config for m in matches), "Matches with different sc2_config need a pool each"
+        pool = SC2ProcessPool(size=max_parallel * max(m.needed_sc2_count for m in matches), proc_args=sc2_config)
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def run(index: int, match: GameMatch) -> Tuple[int, Optional[Dict[AbstractPlayer, Result]]]:
+        async with semaphore:
+            result = None
+            controllers: List[Controller] = []
+            # Keeping processes alive after a bot vs bot match can cause crashes
+            recycle = match.needed_sc2_count == 1
+            try:
+                controllers = await pool.acquire(match.needed_sc2_count)
+                logger.info(f"Starting match {index + 1} / {len(matches)}: {match}")
+                result = await _run_match_with_timeout(controllers, match, match_timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Match {index + 1} did not finish within {match_timeout} seconds: {match}")
+                recycle = False
+            except SystemExit as e:
+                logger.info(f"Game exit'ed as {e} during match {match}")
+                recycle = False
+            except Exception as e:
+                logger.exception(f"Caught unknown exception: {e}")
+                logger.info(f"Exception {e} thrown in match {match}")
+                recycle = False
+            finally:
+                if controllers:
+                    await pool.release(controllers, recycle=recycle)
+            return index, result
+
+    tasks = [asyncio.ensure_future(run(index, match)) for index, match in enumerate(matches)]
+    try:
+        for next_finished in asyncio.as_completed(tasks):
+            yield await next_finished
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if own_pool:
+            await pool.close()
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, Optional, Union
+
+import numpy as np
+from loguru import logger
+
+from sc2.position import Point2
+
+if TYPE_CHECKING:
+    from sc2.game_info import GameInfo, Ramp
+
+# Increase this when the content of the cache files or the analysis itself changes, older files are then ignored
+MAP_ANALYSIS_VERSION = 1
+
+# Cached properties of the main base ramp which are stored in the cache file
+RAMP_OPTIONAL_POSITIONS = (
+    "barracks_in_middle",
+    "depot_in_middle",
+    "barracks_correct_placement",
+    "protoss_wall_pylon",
+    "protoss_wall_warpin",
+)
+RAMP_POSITION_SETS = ("corner_depots", "protoss_wall_buildings")
+
+
+def map_hash(game_info: GameInfo) -> str:
+    """Returns a hash of the static map data: map size, playable area, placement grid and terrain height.
+    The pathing grid is not used as it contains the structures on the map.
+
+    :param game_info:"""
+    start_raw = game_info._proto.start_raw
+    digest = hashlib.sha1()
+    digest.update(
+        np.array(
+            [
+                game_info.map_size.width,
+                game_info.map_size.height,
+                game_info.playable_area.x,
+                game_info.playable_area.y,
+                game_info.playable_area.width,
+                game_info.playable_area.height,
+            ],
+            dtype=np.float64,
+        ).tobytes()
+    )
+    digest.update(start_raw.placement_grid.data)
+    digest.update(start_raw.terrain_height.data)
+    return digest.hexdigest()
+
+
+def map_analysis_path(cache_dir: Union[str, Path], game_info: GameInfo, start_location: Optional[Point2]) -> Path:
+    """Returns the path of the cache file for this map and start location.
+
+    :param cache_dir:
+    :param game_info:
+    :param start_location:"""
+    map_name = re.sub(r"[^\w\-]", "_", game_info.map_name)
+    location = "none" if start_location is None else f"{start_location.x}_{start_location.y}"
+    return Path(cache_dir) / f"{map_name}_{map_hash(game_info)[:16]}_{location}.npz"
+
+
+def _points_to_array(points, dtype: type = np.float64) -> np.ndarray:
+    return np.array([(point.x, point.y) for point in points], dtype=dtype).reshape(-1, 2)
+
+
+def _array_to_points(array: np.ndarray) -> List[Point2]:
+    return [Point2(point) for point in array.tolist()]
+
+
+@dataclass
+class MapAnalysis:
+    """Results of the map analysis done in BotAI._prepare_first_step, which only depend on the map and the start location.
+    They can be saved to and loaded from a compressed npz file, see 'BotAI.map_analysis_cache_dir'."""
+
+    expansion_locations: List[Point2]
+    # Maps resource positions to their expansion location
+    resource_to_expansion: Dict[Point2, Point2]
+    ramp_points: List[FrozenSet[Point2]]
+    vision_blockers: FrozenSet[Point2]
+    # Index in ramp_points, -1 if there is no main base ramp
+    main_base_ramp_index: int
+    # Values of the cached properties of the main base ramp which could be calculated, see RAMP_OPTIONAL_POSITIONS and RAMP_POSITION_SETS
+    main_base_ramp_positions: Dict[str, Union[Optional[Point2], FrozenSet[Point2]]]
+
+    def ramps(self, game_info: GameInfo) -> List[Ramp]:
+        """Returns the ramps with the main base ramp positions already calculated.
+
+        :param game_info:"""
+        # pylint: disable=C0415
+        from sc2.game_info import Ramp
+
+        ramps = [Ramp(points, game_info) for points in self.ramp_points]
+        if self.main_base_ramp_index != -1:
+            # Fill the cached properties, see functools.cached_property
+            ramps[self.main_base_ramp_index].__dict__.update(self.main_base_ramp_positions)
+        return ramps
+
+    def save(self, path: Union[str, Path]):
+        """Saves the analysis to 'path'. The file is written to a temporary file first, so bots running in parallel never read a partial file.
+
+        :param path:"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        expansion_indices = {location: index for index, location in enumerate(self.expansion_locations)}
+        arrays: Dict[str, np.ndarray] = {
+            "version": np.array(MAP_ANALYSIS_VERSION),
+            "expansion_locations": _points_to_array(self.expansion_locations),
+            "resource_positions": _points_to_array(self.resource_to_expansion.keys()),
+            "resource_expansion_indices": np.array(
+                [expansion_indices[location] for location in self.resource_to_expansion.values()], dtype=np.int32
+            ),
+            # Ramp points and vision blockers are grid points and are stored as integers
+            "ramp_points": _points_to_array((point for points in self.ramp_points for point in points), np.int32),
+            "ramp_sizes": np.array([len(points) for points in self.ramp_points], dtype=np.int32),
+            "vision_blockers": _points_to_array(self.vision_blockers, np.int32),
+            "main_base_ramp_index": np.array(self.main_base_ramp_index),
+        }
+        for name, value in self.main_base_ramp_positions.items():
+            if name in RAMP_OPTIONAL_POSITIONS:
+                value = [] if value is None else [value]
+            arrays[f"ramp_{name}"] = _points_to_array(value)
+        temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with temporary_path.open("wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> Optional[MapAnalysis]:
+        """Loads the analysis from 'path'. Returns None if the file does not exist, is broken or was written by a different version.
+
+        :param path:"""
+        path = Path(path)
+        if not path.is_file():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data["version"]) != MAP_ANALYSIS_VERSION:
+                    return None
+                expansion_locations = _array_to_points(data["expansion_locations"])
+                resource_to_expansion = {
+                    resource: expansion_locations[index] for resource, index in
+                    zip(_array_to_points(data["resource_positions"]), data["resource_expansion_indices"].tolist())
+                }
+                ramp_points = [
+                    frozenset(_array_to_points(points)) for points in
+                    np.split(data["ramp_points"], np.cumsum(data["ramp_sizes"])[:-1])
+                ] if len(data["ramp_sizes"]) else []
+                main_base_ramp_positions: Dict[str, Union[Optional[Point2], FrozenSet[Point2]]] = {}
+                for name in RAMP_OPTIONAL_POSITIONS + RAMP_POSITION_SETS:
+                    if f"ramp_{name}" not in data:
+                        continue
+                    points = _array_to_points(data[f"ramp_{name}"])
+                    if name in RAMP_OPTIONAL_POSITIONS:
+                        main_base_ramp_positions[name] = points[0] if points else None
+                    else:
+                        main_base_ramp_positions[name] = frozenset(points)
+                return cls(
+                    expansion_locations=expansion_locations,
+                    resource_to_expansion=resource_to_expansion,
+                    ramp_points=ramp_points,
+                    vision_blockers=frozenset(_array_to_points(data["vision_blockers"])),
+                    main_base_ramp_index=int(data["main_base_ramp_index"]),
+                    main_base_ramp_positions=main_base_ramp_positions,
+                )
+        except (OSError, ValueError, KeyError, IndexError, zipfile.BadZipFile) as e:
+            logger.warning(f"Could not load map analysis from {path}: {e}")
+            return None
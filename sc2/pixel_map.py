@@ -1,3 +1,5 @@
+import warnings
+from functools import cached_property
 from pathlib import Path
 from typing import Callable, FrozenSet, List, Set, Tuple, Union
 
@@ -5,6 +7,13 @@ import numpy as np
 
 from sc2.position import Point2
 
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from scipy.ndimage import label
+
+# Neighbors in all 8 directions are connected
+EIGHT_CONNECTIVITY = np.ones((3, 3), dtype=bool)
+
 
 class PixelMap:
 
@@ -20,10 +29,15 @@ class PixelMap:
         assert self.width * self.height == (8 if in_bits else 1) * len(
             self._proto.data
         ), f"{self.width * self.height} {(8 if in_bits else 1)*len(self._proto.data)}"
+
+    @cached_property
+    def data_numpy(self) -> np.ndarray:
+        """Array of shape (height, width), created on first access.
+        Maps with one byte per pixel share the memory of the proto data, maps in bits are unpacked."""
         buffer_data = np.frombuffer(self._proto.data, dtype=np.uint8)
-        if in_bits:
+        if self._in_bits:
             buffer_data = np.unpackbits(buffer_data)
-        self.data_numpy = buffer_data.reshape(self._proto.size.y, self._proto.size.x)
+        return buffer_data.reshape(self._proto.size.y, self._proto.size.x)
 
     @property
     def width(self) -> int:
@@ -66,36 +80,58 @@ class PixelMap:
     def copy(self) -> "PixelMap":
         return PixelMap(self._proto, in_bits=self._in_bits)
 
-    def flood_fill(self, start_point: Point2, pred: Callable[[int], bool]) -> Set[Point2]:
-        nodes: Set[Point2] = set()
-        queue: List[Point2] = [start_point]
-
-        while queue:
-            x, y = queue.pop()
+    def mask(self, pred: Callable[[int], bool]) -> np.ndarray:
+        """Returns a boolean array of shape (height, width) which is True where 'pred' returns True.
+        'pred' is only called once for each distinct value of the map.
+
+        :param pred:"""
+        values: List[int] = np.unique(self.data_numpy).tolist()
+        return np.isin(self.data_numpy, [value for value in values if pred(value)])
+
+    def label_components(self, pred: Callable[[int], bool]) -> Tuple[np.ndarray, int]:
+        """Labels the groups of 8-connected pixels for which 'pred' returns True.
+        Returns the array of labels with shape (height, width) and the amount of groups.
+        Pixels of the first group have label 1, pixels that do not belong to a group have label 0.
+
+        Example::
+
+            labels, amount = self.game_info.pathing_grid.label_components(lambda value: value == 1)
+            pathable_regions_sizes = np.bincount(labels.ravel())[1:]
+
+        :param pred:"""
+        labels, amount = label(self.mask(pred), structure=EIGHT_CONNECTIVITY)
+        return labels, amount
+
+    @staticmethod
+    def _labels_to_point_sets(labels: np.ndarray, amount: int) -> List[FrozenSet[Point2]]:
+        """ Converts the labels array from label_components to one set of points for each label from 1 to amount. """
+        if amount == 0:
+            return []
+        ys, xs = np.nonzero(labels)
+        order = np.argsort(labels[ys, xs], kind="stable")
+        split_indices = np.cumsum(np.bincount(labels.ravel(), minlength=amount + 1)[1:])[:-1]
+        return [
+            frozenset(Point2(point) for point in zip(group_xs.tolist(), group_ys.tolist()))
+            for group_xs, group_ys in zip(np.split(xs[order], split_indices), np.split(ys[order], split_indices))
+        ]
 
-            if not (0 <= x < self.width and 0 <= y < self.height):
-                continue
-
-            if Point2((x, y)) in nodes:
-                continue
+    def flood_fill(self, start_point: Point2, pred: Callable[[int], bool]) -> Set[Point2]:
+        """Returns all points that are 8-connected to 'start_point' and for which 'pred' returns True.
 
-            if pred(self[x, y]):
-                nodes.add(Point2((x, y)))
-                queue += [Point2((x + a, y + b)) for a in [-1, 0, 1] for b in [-1, 0, 1] if not (a == 0 and b == 0)]
-        return nodes
+        :param start_point:
+        :param pred:"""
+        x, y = start_point
+        if not (0 <= x < self.width and 0 <= y < self.height) or not pred(self[x, y]):
+            return set()
+        labels, _amount = self.label_components(pred)
+        ys, xs = np.nonzero(labels == labels[y, x])
+        return {Point2(point) for point in zip(xs.tolist(), ys.tolist())}
 
     def flood_fill_all(self, pred: Callable[[int], bool]) -> Set[FrozenSet[Point2]]:
-        groups: Set[FrozenSet[Point2]] = set()
-
-        for x in range(self.width):
-            for y in range(self.height):
-                if any((x, y) in g for g in groups):
-                    continue
-
-                if pred(self[x, y]):
-                    groups.add(frozenset(self.flood_fill(Point2((x, y)), pred)))
+        """Returns all groups of 8-connected points for which 'pred' returns True.
 
-        return groups
+        :param pred:"""
+        return set(self._labels_to_point_sets(*self.label_components(pred)))
 
     def print(self, wide: bool = False) -> None:
         for y in range(self.height):
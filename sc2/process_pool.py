@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import asyncio
+import platform
+import time
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from loguru import logger
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2.controller import Controller
+from sc2.data import Status
+from sc2.sc2process import SC2Process, kill_switch
+
+# Seconds between the start of two SC2 processes that are launched together
+# Starting several clients at nearly the same time does not work on linux, but their startups may overlap
+LAUNCH_INTERVAL: float = 3.0 if platform.system() == "Linux" else 0.0
+
+
+async def launch_sc2_processes(
+    processes: Sequence[SC2Process],
+    launch_interval: float = LAUNCH_INTERVAL,
+    timeout: float = 50,
+    metrics: Optional[PoolMetrics] = None,
+) -> List[Union[Controller, BaseException]]:
+    """Starts the processes 'launch_interval' seconds apart without waiting for the previous ones to be ready.
+    Returns a controller for each process, or the exception if the process could not be started within 'timeout' seconds.
+
+    :param processes:
+    :param launch_interval:
+    :param timeout: Seconds that each process may take to start, measured from its own launch
+    :param metrics: Counters in which the launches and their startup durations are recorded"""
+
+    async def launch(index: int, process: SC2Process) -> Controller:
+        await asyncio.sleep(index * launch_interval)
+        t0 = time.perf_counter()
+        # pylint: disable=C2801
+        controller = await asyncio.wait_for(process.__aenter__(), timeout=timeout)
+        if metrics is not None:
+            metrics.launched += 1
+            metrics.launch_time += time.perf_counter() - t0
+        return controller
+
+    results = await asyncio.gather(*(launch(i, process) for i, process in enumerate(processes)), return_exceptions=True)
+    if metrics is not None:
+        metrics.launch_failures += sum(isinstance(result, BaseException) for result in results)
+    return results
+
+
+async def close_controller(controller: Controller):
+    """Closes the websocket of the controller and kills its SC2 process.
+
+    :param controller:"""
+    # pylint: disable=W0212
+    process = controller._process
+    with suppress(Exception):
+        await process._close_connection()
+    process._clean(verbose=False)
+    if process in kill_switch._to_kill:
+        kill_switch._to_kill.remove(process)
+
+
+@dataclass
+class PoolMetrics:
+    """ Counters of a SC2ProcessPool. """
+
+    launched: int = 0
+    launch_failures: int = 0
+    # Controllers that did not answer a ping and were closed
+    health_check_failures: int = 0
+    # Controllers that were returned to the pool after a match and reused
+    recycled: int = 0
+    # Controllers that were closed after a match or a failed health check, and launched again
+    replaced: int = 0
+    acquired: int = 0
+    # Sum of the startup durations of all launched processes, in seconds
+    launch_time: float = 0.0
+    # Sum of the time that acquire() waited for processes to be launched, in seconds
+    acquire_wait_time: float = 0.0
+
+    @property
+    def average_launch_time(self) -> float:
+        return self.launch_time / self.launched if self.launched else 0.0
+
+
+class SC2ProcessPool:
+    """Keeps 'size' SC2 processes running, so matches do not have to wait for SC2 to start.
+    Controllers are handed out with acquire(), which only returns controllers that answered a ping.
+    After a match, release() returns them to the pool, or closes them if they are broken and launches replacements.
+
+    Example::
+
+        async with SC2ProcessPool(size=4) as pool:
+            results = await a_run_multiple_games_pool(matches, pool)
+            logger.info(pool.metrics)
+    """
+
+    def __init__(
+        self,
+        size: int,
+        proc_args: Optional[List[Dict[str, Any]]] = None,
+        launch_interval: float = LAUNCH_INTERVAL,
+        launch_timeout: float = 50,
+        ping_timeout: float = 20,
+        max_launch_attempts: int = 3,
+        process_factory: Callable[..., SC2Process] = SC2Process,
+    ):
+        """
+        :param size: Amount of processes that are kept running
+        :param proc_args: Arguments of the SC2Process of each process, used round robin
+        :param launch_interval: Seconds between the launch of two processes
+        :param launch_timeout: Seconds that a process may take to start
+        :param ping_timeout: Seconds that a process may take to answer the ping of a health check
+        :param max_launch_attempts: Amount of launches that are tried in a row before acquire() gives up
+        :param process_factory:
+        """
+        assert size > 0
+        self.size: int = size
+        self.proc_args: List[Dict[str, Any]] = proc_args or [{}]
+        self.launch_interval: float = launch_interval
+        self.launch_timeout: float = launch_timeout
+        self.ping_timeout: float = ping_timeout
+        self.max_launch_attempts: int = max_launch_attempts
+        self.process_factory: Callable[..., SC2Process] = process_factory
+        self.metrics: PoolMetrics = PoolMetrics()
+        self._idle: List[Controller] = []
+        self._in_use: List[Controller] = []
+        self._launches: int = 0
+        self._fill_task: Optional[asyncio.Task] = None
+        # Serializes acquire() calls of concurrent matches, created in acquire() to use the running event loop
+        self._acquire_lock: Optional[asyncio.Lock] = None
+
+    async def __aenter__(self) -> SC2ProcessPool:
+        await self.fill()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    @property
+    def in_use_count(self) -> int:
+        return len(self._in_use)
+
+    async def fill(self):
+        """ Launches processes until the pool has 'size' processes, or until 'max_launch_attempts' launches failed. """
+        if self._fill_task is None or self._fill_task.done():
+            self._fill_task = asyncio.ensure_future(self._fill())
+        await asyncio.shield(self._fill_task)
+
+    async def _fill(self):
+        for _ in range(self.max_launch_attempts):
+            needed = self.size - len(self._idle) - len(self._in_use)
+            if needed <= 0:
+                return
+            logger.info(f"Launching {needed} SC2 processes")
+            processes = []
+            for _ in range(needed):
+                processes.append(self.process_factory(**self.proc_args[self._launches % len(self.proc_args)]))
+                self._launches += 1
+            results = await launch_sc2_processes(processes, self.launch_interval, self.launch_timeout, self.metrics)
+            for result in results:
+                if isinstance(result, BaseException):
+                    logger.warning(f"Could not launch SC2 process: {result!r}")
+                else:
+                    self._idle.append(result)
+        if len(self._idle) + len(self._in_use) < self.size:
+            logger.error(f"Could not launch {self.size} SC2 processes after {self.max_launch_attempts} attempts")
+
+    async def _is_healthy(self, controller: Controller) -> bool:
+        """Returns True if the websocket is open and the process answers a ping.
+
+        :param controller:"""
+        # pylint: disable=W0212
+        if controller._ws.closed:
+            return False
+        ping = asyncio.ensure_future(controller.ping())
+        await asyncio.wait({ping}, timeout=self.ping_timeout)
+        if not ping.done():
+            # Cancelling the ping would wait for the response forever, so the connection is closed to end it
+            await close_controller(controller)
+            await asyncio.gather(ping, return_exceptions=True)
+            return False
+        if ping.cancelled() or ping.exception() is not None:
+            return False
+        return isinstance(ping.result(), sc_pb.Response)
+
+    async def _remove_unhealthy_idle(self):
+        healthy = await asyncio.gather(*(self._is_healthy(controller) for controller in self._idle))
+        for controller, is_healthy in list(zip(self._idle, healthy)):
+            if not is_healthy and controller in self._idle:
+                logger.warning(f"SC2 process at port {controller._process._port} failed its health check")
+                self.metrics.health_check_failures += 1
+                self.metrics.replaced += 1
+                self._idle.remove(controller)
+                await close_controller(controller)
+
+    async def acquire(self, count: int = 1) -> List[Controller]:
+        """Returns 'count' controllers which answered a ping, launches new processes if not enough are idle.
+        The controllers have to be given back with release().
+
+        :param count:"""
+        assert count <= self.size, f"Cannot acquire {count} controllers from a pool of size {self.size}"
+        if self._acquire_lock is None:
+            self._acquire_lock = asyncio.Lock()
+        async with self._acquire_lock:
+            return await self._acquire(count)
+
+    async def _acquire(self, count: int) -> List[Controller]:
+        t0 = time.perf_counter()
+        while True:
+            if len(self._idle) >= count:
+                await self._remove_unhealthy_idle()
+                if len(self._idle) >= count:
+                    break
+                continue
+            if len(self._idle) + len(self._in_use) >= self.size:
+                # Wait for other matches to release their controllers
+                await asyncio.sleep(0.1)
+                continue
+            launch_failures = self.metrics.launch_failures
+            await self.fill()
+            if len(self._idle) < count and self.metrics.launch_failures > launch_failures:
+                raise RuntimeError("Could not launch sufficient SC2 processes")
+        self.metrics.acquire_wait_time += time.perf_counter() - t0
+        controllers = self._idle[:count]
+        del self._idle[:count]
+        self._in_use.extend(controllers)
+        self.metrics.acquired += count
+        return controllers
+
+    async def release(self, controllers: List[Controller], recycle: bool = True):
+        """Returns the controllers to the pool. Controllers that are still in a game leave it first.
+        Broken controllers, and all controllers if 'recycle' is False, are closed and replaced in the background.
+
+        :param controllers:
+        :param recycle: Set to False to replace the processes, e.g. after bot vs bot matches"""
+        for controller in controllers:
+            self._in_use.remove(controller)
+            if recycle and await self._is_healthy(controller):
+                # pylint: disable=W0212
+                if controller._status != Status.launched:
+                    with suppress(Exception):
+                        await controller._execute(leave_game=sc_pb.RequestLeaveGame())
+                if controller._status == Status.launched:
+                    self.metrics.recycled += 1
+                    self._idle.append(controller)
+                    continue
+            self.metrics.replaced += 1
+            await close_controller(controller)
+        if len(self._idle) + len(self._in_use) < self.size and (self._fill_task is None or self._fill_task.done()):
+            self._fill_task = asyncio.ensure_future(self._fill())
+
+    async def close(self):
+        """ Stops launching processes and closes all controllers of the pool. """
+        if self._fill_task is not None and not self._fill_task.done():
+            self._fill_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._fill_task
+        for controller in self._idle + self._in_use:
+            await close_controller(controller)
+        self._idle.clear()
+        self._in_use.clear()
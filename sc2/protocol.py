@@ -1,11 +1,16 @@
 import asyncio
 import sys
+import time
+from collections import deque
 from contextlib import suppress
+from pathlib import Path
+from typing import Deque, Optional, Union
 
 from aiohttp import ClientWebSocketResponse
 from loguru import logger
 from s2clientprotocol import sc2api_pb2 as sc_pb
 
+from sc2.capture import CAPTURE_REQUEST, CAPTURE_RESPONSE, CaptureWriter
 from sc2.data import Status
 
 
@@ -30,17 +35,55 @@ class Protocol:
         assert ws
         self._ws: ClientWebSocketResponse = ws
         self._status: Status = None
-
-    async def __request(self, request):
+        # Futures of the requests that were sent but whose response was not received yet, in the order they were sent
+        # SC2 answers requests in order, so the next response always belongs to the first future
+        self._pending_responses: Deque[asyncio.Future] = deque()
+        # perf_counter_ns when the last response was received, before it was parsed, see StepProfiler
+        self._last_receive_ns: int = 0
+        # Only one coroutine may receive from the websocket at a time, created on first use to bind to the running event loop
+        self._receive_lock: Optional[asyncio.Lock] = None
+        # Writes all requests and responses to a file if set, see self.start_capture
+        self._capture: Optional[CaptureWriter] = None
+
+    def start_capture(self, path: Union[str, Path]):
+        """Writes every request and response from now on to the capture file at 'path'.
+        The game can then be replayed without SC2 with main.replay_capture.
+
+        :param path:"""
+        self.stop_capture()
+        self._capture = CaptureWriter(path)
+
+    def stop_capture(self):
+        """ Finishes writing the capture file, see self.start_capture. """
+        if self._capture is not None:
+            self._capture.close()
+            self._capture = None
+
+    async def _send_request(self, **kwargs) -> asyncio.Future:
+        """Sends a request without waiting for its response. Several requests can be sent back to back this way,
+        e.g. action, step and observation, so that they only cost one round trip in total.
+        The returned future has to be passed to self._receive_response to get the response.
+        Responses of requests which are never received are still read from the websocket in order and then discarded.
+
+        :param kwargs: exactly one request, e.g. observation=sc_pb.RequestObservation()"""
+        assert len(kwargs) == 1, "Only one request allowed by the API"
+        request = sc_pb.Request(**kwargs)
         logger.debug(f"Sending request: {request !r}")
+        request_bytes = request.SerializeToString()
+        if self._capture is not None:
+            self._capture.write(CAPTURE_REQUEST, request_bytes)
         try:
-            await self._ws.send_bytes(request.SerializeToString())
+            await self._ws.send_bytes(request_bytes)
         except TypeError as exc:
             logger.exception("Cannot send: Connection already closed.")
             raise ConnectionAlreadyClosed("Connection already closed.") from exc
         logger.debug("Request sent")
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._pending_responses.append(future)
+        return future
 
-        response = sc_pb.Response()
+    async def _receive_next_response(self):
+        """ Receives one response from the websocket and resolves the oldest pending request with it. """
         try:
             response_bytes = await self._ws.receive_bytes()
         except TypeError as exc:
@@ -52,32 +95,55 @@ class Protocol:
         except asyncio.CancelledError:
             # If request is sent, the response must be received before reraising cancel
             try:
-                await self._ws.receive_bytes()
+                response_bytes = await self._ws.receive_bytes()
             except asyncio.CancelledError:
                 logger.critical("Requests must not be cancelled multiple times")
                 sys.exit(2)
+            self._resolve_next_response(response_bytes)
             raise
+        self._resolve_next_response(response_bytes)
 
+    def _resolve_next_response(self, response_bytes: bytes):
+        self._last_receive_ns = time.perf_counter_ns()
+        if self._capture is not None:
+            self._capture.write(CAPTURE_RESPONSE, response_bytes, self._last_receive_ns)
+        response = sc_pb.Response()
         response.ParseFromString(response_bytes)
         logger.debug("Response received")
-        return response
-
-    async def _execute(self, **kwargs):
-        assert len(kwargs) == 1, "Only one request allowed by the API"
-
-        response = await self.__request(sc_pb.Request(**kwargs))
 
         new_status = Status(response.status)
         if new_status != self._status:
             logger.info(f"Client status changed to {new_status} (was {self._status})")
         self._status = new_status
 
+        future = self._pending_responses.popleft()
+        # If the future was cancelled, the response is discarded
+        if not future.done():
+            future.set_result(response)
+
+    async def _receive_response(self, future: asyncio.Future):
+        """Waits for the response of a request sent with self._send_request.
+        All responses of requests that were sent before are received first.
+
+        :param future:"""
+        if self._receive_lock is None:
+            self._receive_lock = asyncio.Lock()
+        async with self._receive_lock:
+            while not future.done():
+                await self._receive_next_response()
+        response = future.result()
+
         if response.error:
             logger.debug(f"Response contained an error: {response.error}")
             raise ProtocolError(f"{response.error}")
 
         return response
 
+    async def _execute(self, **kwargs):
+        assert len(kwargs) == 1, "Only one request allowed by the API"
+
+        return await self._receive_response(await self._send_request(**kwargs))
+
     async def ping(self):
         result = await self._execute(ping=sc_pb.RequestPing())
         return result
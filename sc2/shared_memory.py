@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import multiprocessing
+import sys
+import time
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+import numpy as np
+
+# Names of the shared memory blocks which were created by this process
+_owned_blocks: Set[str] = set()
+
+# Grids which are published by BotAI if 'self.shared_grids_name' is set, see SharedGridsReader
+SHARED_GRIDS = ("pathing_grid", "placement_grid", "terrain_height", "visibility", "creep")
+
+
+def attach_shared_memory(name: str) -> SharedMemory:
+    """Attaches to the existing shared memory block 'name'.
+    Before python 3.13, attaching registers the block with the resource tracker of this process, which unlinks it
+    when this process exits. That is only correct for the process that created the block, so independent processes
+    (which were not started by the bot) unregister it again.
+
+    :param name:"""
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)  # pylint: disable=E1123
+    shared_memory = SharedMemory(name=name)
+    if multiprocessing.parent_process() is None and shared_memory._name not in _owned_blocks:
+        resource_tracker.unregister(shared_memory._name, "shared_memory")
+    return shared_memory
+
+
+@dataclass(frozen=True)
+class SharedArrayHandle:
+    """Picklable reference to a numpy array in shared memory, which can be sent to other processes.
+
+    Example::
+
+        def count_pathable(handle: SharedArrayHandle) -> int:
+            # Runs in a worker process, the array is not copied
+            with handle.open() as pathing_grid:
+                return int(pathing_grid.sum())
+    """
+
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+    def attach(self) -> Tuple[SharedMemory, np.ndarray]:
+        """Returns the shared memory block and the array backed by it.
+        The block has to be closed with 'shared_memory.close()' after the array is no longer used."""
+        shared_memory = attach_shared_memory(self.name)
+        return shared_memory, np.ndarray(self.shape, dtype=np.dtype(self.dtype), buffer=shared_memory.buf)
+
+    @contextmanager
+    def open(self) -> Iterator[np.ndarray]:
+        """ Attaches to the shared memory block, yields the array and closes the block afterwards. """
+        shared_memory, array = self.attach()
+        try:
+            yield array
+        finally:
+            del array
+            # The block stays open if the array is still referenced somewhere, it is then closed when it is garbage collected
+            with suppress(BufferError):
+                shared_memory.close()
+
+
+class SharedArray:
+    """A numpy array in a shared memory block which is owned by this process.
+    Other processes can read and write it through self.handle, see SharedArrayHandle."""
+
+    def __init__(self, shape: Tuple[int, ...], dtype, name: Optional[str] = None):
+        """
+        :param shape:
+        :param dtype:
+        :param name: Name of the shared memory block, a random name is used if None
+        """
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        # Shared memory blocks can not be empty
+        self._shared_memory: SharedMemory = SharedMemory(name=name, create=True, size=max(size, 1))
+        _owned_blocks.add(self._shared_memory._name)
+        self.array: np.ndarray = np.ndarray(shape, dtype=dtype, buffer=self._shared_memory.buf)
+        self.handle: SharedArrayHandle = SharedArrayHandle(self._shared_memory.name, tuple(shape), dtype.str)
+
+    @classmethod
+    def from_array(cls, array: np.ndarray, name: Optional[str] = None) -> SharedArray:
+        """Returns a new shared array with a copy of 'array'.
+
+        :param array:
+        :param name:"""
+        shared_array = cls(array.shape, array.dtype, name=name)
+        shared_array.array[...] = array
+        return shared_array
+
+    def matches(self, array: np.ndarray) -> bool:
+        """ Returns True if 'array' has the same shape and dtype, so it can be copied into this shared array. """
+        return self.array.shape == array.shape and self.array.dtype == array.dtype
+
+    def close(self):
+        """ Closes and unlinks the shared memory block. Other processes which are attached to it keep their view. """
+        self.array = None
+        # If the array is still referenced somewhere, the block is closed when it is garbage collected
+        with suppress(BufferError):
+            self._shared_memory.close()
+        with suppress(FileNotFoundError):
+            self._shared_memory.unlink()
+        _owned_blocks.discard(self._shared_memory._name)
+
+
+class SharedGrid:
+    """A 2d numpy array in a named shared memory block, which starts with a header of the shape, dtype and game loop.
+    Other processes can attach to it by its name alone, see SharedGridsReader.
+
+    The header contains a sequence number which is odd while the grid is written,
+    so readers can detect and retry reads that overlap with an update, see self.copy."""
+
+    # int64 sequence, int64 game loop, int64 height, int64 width, 8 bytes of the dtype string, padding
+    HEADER_SIZE = 48
+
+    def __init__(self, shared_memory: SharedMemory, owner: bool):
+        self._shared_memory: Optional[SharedMemory] = shared_memory
+        self.owner: bool = owner
+        self._header: np.ndarray = np.ndarray((4, ), dtype=np.int64, buffer=shared_memory.buf)
+        dtype = np.dtype(bytes(shared_memory.buf[32:40]).rstrip(b"\0").decode())
+        height, width = int(self._header[2]), int(self._header[3])
+        self.array: np.ndarray = np.ndarray((height, width),
+                                            dtype=dtype,
+                                            buffer=shared_memory.buf,
+                                            offset=self.HEADER_SIZE)
+
+    @classmethod
+    def create(cls, name: str, shape: Tuple[int, int], dtype) -> SharedGrid:
+        """Creates the shared memory block 'name' for a grid of 'shape' and 'dtype'.
+
+        :param name:
+        :param shape:
+        :param dtype:"""
+        dtype = np.dtype(dtype)
+        shared_memory = SharedMemory(name=name, create=True, size=cls.HEADER_SIZE + shape[0] * shape[1] * dtype.itemsize)
+        _owned_blocks.add(shared_memory._name)
+        header = np.ndarray((4, ), dtype=np.int64, buffer=shared_memory.buf)
+        header[:] = (0, -1, shape[0], shape[1])
+        del header
+        shared_memory.buf[32:40] = dtype.str.encode().ljust(8, b"\0")
+        return cls(shared_memory, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> SharedGrid:
+        """Attaches to the existing shared memory block 'name'.
+
+        :param name:"""
+        return cls(attach_shared_memory(name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shared_memory.name
+
+    @property
+    def game_loop(self) -> int:
+        """ Game loop of the last update, -1 if the grid was not written yet. """
+        return int(self._header[1])
+
+    def update(self, data: np.ndarray, game_loop: int):
+        """Copies 'data' into the grid in place.
+
+        :param data:
+        :param game_loop:"""
+        self._header[0] += 1
+        self.array[...] = data
+        self._header[1] = game_loop
+        self._header[0] += 1
+
+    def copy(self) -> Tuple[int, np.ndarray]:
+        """ Returns the game loop and a copy of the grid which was not modified while it was copied. """
+        while True:
+            sequence = int(self._header[0])
+            if sequence % 2 == 0:
+                game_loop = int(self._header[1])
+                data = self.array.copy()
+                if int(self._header[0]) == sequence:
+                    return game_loop, data
+            # The grid is being written, give the writer time to finish instead of spinning
+            time.sleep(0)
+
+    def close(self):
+        """ Closes the shared memory block, and unlinks it if it was created by this process. """
+        if self._shared_memory is None:
+            return
+        self.array = None
+        self._header = None
+        with suppress(BufferError):
+            self._shared_memory.close()
+        if self.owner:
+            with suppress(FileNotFoundError):
+                self._shared_memory.unlink()
+            _owned_blocks.discard(self._shared_memory._name)
+        self._shared_memory = None
+
+
+class SharedGrids:
+    """The grids of a bot in shared memory, written by BotAI each step if 'self.shared_grids_name' is set.
+    Each grid is stored in its own block named '{name}_{grid}', see SharedGridsReader to read them from other processes."""
+
+    def __init__(self, name: str):
+        """
+        :param name: Prefix of the names of the shared memory blocks, has to be unique on this machine
+        """
+        self.name: str = name
+        self.grids: Dict[str, SharedGrid] = {}
+
+    def update(self, grids: Dict[str, np.ndarray], game_loop: int):
+        """Copies the 'grids' into their shared memory blocks in place, the blocks are created on the first update.
+
+        :param grids:
+        :param game_loop:"""
+        for grid_name, data in grids.items():
+            grid = self.grids.get(grid_name)
+            if grid is None:
+                grid = SharedGrid.create(f"{self.name}_{grid_name}", data.shape, data.dtype)
+                self.grids[grid_name] = grid
+            grid.update(data, game_loop)
+
+    def close(self):
+        """ Closes and unlinks all blocks. Readers which are still attached keep their view of the last update. """
+        for grid in self.grids.values():
+            grid.close()
+        self.grids.clear()
+
+
+class SharedGridsReader:
+    """Attaches to the grids that a bot publishes with 'self.shared_grids_name', from any process on the same machine.
+    The arrays are views of the shared memory, so they always show the latest step of the bot without being copied.
+
+    Example::
+
+        # In the bot
+        class MyBot(BotAI):
+            def __init__(self):
+                self.shared_grids_name = "my_bot"
+
+        # In a helper process
+        with SharedGridsReader("my_bot") as grids:
+            while True:
+                game_loop, pathing_grid = grids.copy("pathing_grid")
+                ...
+    """
+
+    def __init__(self, name: str, grid_names: Iterable[str] = SHARED_GRIDS):
+        """
+        :param name: The 'shared_grids_name' of the bot
+        :param grid_names: Grids to attach to, the bot has to have published them already
+        """
+        self.name: str = name
+        self.grids: Dict[str, SharedGrid] = {}
+        try:
+            for grid_name in grid_names:
+                self.grids[grid_name] = SharedGrid.attach(f"{name}_{grid_name}")
+        except FileNotFoundError:
+            self.close()
+            raise
+
+    def __enter__(self) -> SharedGridsReader:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getitem__(self, grid_name: str) -> np.ndarray:
+        """Returns a view of the grid, which changes when the bot writes the next step.
+
+        :param grid_name:"""
+        return self.grids[grid_name].array
+
+    def game_loop(self, grid_name: str = "pathing_grid") -> int:
+        """Game loop of the last update of the grid.
+
+        :param grid_name:"""
+        return self.grids[grid_name].game_loop
+
+    def copy(self, grid_name: str) -> Tuple[int, np.ndarray]:
+        """Returns the game loop and a consistent copy of the grid.
+
+        :param grid_name:"""
+        return self.grids[grid_name].copy()
+
+    def close(self):
+        for grid in self.grids.values():
+            grid.close()
+        self.grids.clear()
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import bisect
+import lzma
+import pickle
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+
+import portpicker
+from aiohttp import WSMsgType, web
+from loguru import logger
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2.data import ActionResult, Result, Status
+
+
+class StandInServer:
+    """A websocket server which speaks the SC2 API and answers requests with recorded responses, so the protocol
+    and game loop layers can be run and benchmarked deterministically without a StarCraft II installation.
+
+    Answers ping, create_game, join_game, game_info, data, observation, step, action, query, debug, leave_game and quit.
+    The game advances by the 'count' of each step request. The observation of a game loop is the last recorded
+    observation at or before it, with its game loop set to the current one. Once 'game_loops' game loops are played,
+    the game ends and the observation contains 'result' for the player.
+
+    Example::
+
+        async with StandInServer.from_pickle("test/pickle_data/AcropolisLE.xz", game_loops=2000) as server:
+            result = await play_from_websocket(server.ws_url, Bot(Race.Terran, MyBot()))
+    """
+
+    def __init__(
+        self,
+        game_data: sc_pb.Response,
+        game_info: sc_pb.Response,
+        observations: Sequence[sc_pb.ResponseObservation],
+        game_loops: int = 22 * 60 * 10,
+        result: Result = Result.Victory,
+        base_build: int = 0,
+        host: str = "127.0.0.1",
+        port: Optional[int] = None,
+    ):
+        """
+        :param game_data: Response of a RequestData
+        :param game_info: Response of a RequestGameInfo
+        :param observations: Recorded observations, sorted by game loop
+        :param game_loops: Game loop at which the game ends
+        :param result: Result of the player at the end of the game
+        :param base_build: Base build that is reported by ping
+        :param host:
+        :param port: Port of the websocket server, a free port is picked if None
+        """
+        assert observations, "At least one observation is required"
+        self.game_data: sc_pb.Response = game_data
+        self.game_info: sc_pb.Response = game_info
+        self.observations: Sequence[sc_pb.ResponseObservation] = observations
+        self._observation_game_loops = [observation.observation.game_loop for observation in observations]
+        self.game_loops: int = game_loops
+        self.result: Result = result
+        self.base_build: int = base_build
+        self.host: str = host
+        self.port: int = port or portpicker.pick_unused_port()
+        self.status: Status = Status.launched
+        self.game_loop: int = 0
+        self.player_id: int = 1
+        # Amount of requests of each type that were answered, e.g. request_counts["step"]
+        self.request_counts: Counter = Counter()
+        self._runner: Optional[web.AppRunner] = None
+        # Serializing large responses takes longer than the code that is benchmarked, so they are serialized once
+        # A serialized message followed by a second one parses as the merge of both, which sets status and game loop
+        self._serialized_game_info: bytes = sc_pb.Response(game_info=game_info.game_info).SerializeToString()
+        self._serialized_data: bytes = sc_pb.Response(data=game_data.data).SerializeToString()
+        self._serialized_observations: List[bytes] = [
+            sc_pb.Response(observation=observation).SerializeToString() for observation in observations
+        ]
+
+    @classmethod
+    def from_pickle(cls, path: Union[str, Path], **kwargs) -> StandInServer:
+        """Creates a server from a pickle file in 'test/pickle_data', see 'test/generate_pickle_files_bot.py'.
+
+        :param path:
+        :param kwargs: Arguments of StandInServer"""
+        with lzma.open(str(path), "rb") as f:
+            raw_game_data, raw_game_info, raw_observation = pickle.load(f)
+        return cls(raw_game_data, raw_game_info, [raw_observation], **kwargs)
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/sc2api"
+
+    async def __aenter__(self) -> StandInServer:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/sc2api", self._websocket_handler)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Stand-in SC2 server listening at {self.ws_url}")
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _websocket_handler(self, http_request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(http_request)
+        async for message in ws:
+            if message.type != WSMsgType.BINARY:
+                break
+            await ws.send_bytes(self.respond(message.data))
+            if self.status == Status.quit:
+                break
+        await ws.close()
+        return ws
+
+    def respond(self, data: bytes) -> bytes:
+        """Returns the serialized response of a serialized request and advances the game state.
+
+        :param data:"""
+        request = sc_pb.Request()
+        request.ParseFromString(data)
+        request_type = request.WhichOneof("request")
+        if request_type == "game_info":
+            prefix = self._serialized_game_info
+        elif request_type == "data":
+            prefix = self._serialized_data
+        elif request_type == "observation":
+            prefix = self._serialized_observations[self._observation_index()]
+        else:
+            return self.handle(request).SerializeToString()
+        self.request_counts[request_type] += 1
+        response = sc_pb.Response(id=request.id, status=self.status.value)
+        if request_type == "observation":
+            self._set_observation_game_loop_and_result(response)
+        return prefix + response.SerializeToString()
+
+    def handle(self, request: sc_pb.Request) -> sc_pb.Response:
+        """Returns the response of the request and advances the game state.
+
+        :param request:"""
+        request_type = request.WhichOneof("request")
+        self.request_counts[request_type] += 1
+        response = sc_pb.Response(id=request.id)
+        handler = getattr(self, f"_handle_{request_type}", None)
+        if handler is None:
+            response.error.append(f"Request '{request_type}' is not supported by the stand-in server")
+        else:
+            handler(getattr(request, request_type), response)
+        response.status = self.status.value
+        return response
+
+    def _handle_ping(self, _request: sc_pb.RequestPing, response: sc_pb.Response):
+        response.ping.game_version = "stand-in"
+        response.ping.data_version = ""
+        response.ping.data_build = self.base_build
+        response.ping.base_build = self.base_build
+
+    def _handle_create_game(self, _request: sc_pb.RequestCreateGame, response: sc_pb.Response):
+        self.status = Status.init_game
+        response.create_game.SetInParent()
+
+    def _handle_join_game(self, _request: sc_pb.RequestJoinGame, response: sc_pb.Response):
+        self.status = Status.in_game
+        self.game_loop = 0
+        response.join_game.player_id = self.player_id
+
+    def _handle_leave_game(self, _request: sc_pb.RequestLeaveGame, response: sc_pb.Response):
+        self.status = Status.launched
+        response.leave_game.SetInParent()
+
+    def _handle_quit(self, _request: sc_pb.RequestQuit, response: sc_pb.Response):
+        self.status = Status.quit
+        response.quit.SetInParent()
+
+    def _handle_game_info(self, _request: sc_pb.RequestGameInfo, response: sc_pb.Response):
+        response.game_info.CopyFrom(self.game_info.game_info)
+
+    def _handle_data(self, _request: sc_pb.RequestData, response: sc_pb.Response):
+        response.data.CopyFrom(self.game_data.data)
+
+    def _observation_index(self) -> int:
+        """ Index of the last recorded observation at or before the current game loop. """
+        return max(0, bisect.bisect_right(self._observation_game_loops, self.game_loop) - 1)
+
+    def _handle_observation(self, _request: sc_pb.RequestObservation, response: sc_pb.Response):
+        response.observation.CopyFrom(self.observations[self._observation_index()])
+        self._set_observation_game_loop_and_result(response)
+
+    def _set_observation_game_loop_and_result(self, response: sc_pb.Response):
+        response.observation.observation.game_loop = self.game_loop
+        if self.status == Status.ended:
+            response.observation.player_result.add(player_id=self.player_id, result=self.result.value)
+
+    def _handle_step(self, request: sc_pb.RequestStep, response: sc_pb.Response):
+        if self.status == Status.in_game:
+            self.game_loop += max(1, request.count)
+            if self.game_loop >= self.game_loops:
+                self.status = Status.ended
+        response.step.simulation_loop = self.game_loop
+
+    def _handle_action(self, request: sc_pb.RequestAction, response: sc_pb.Response):
+        response.action.result.extend([ActionResult.Success.value] * len(request.actions))
+
+    def _handle_query(self, request: sc_pb.RequestQuery, response: sc_pb.Response):
+        """ Answers every query with an empty result: no path, no abilities and no valid placements. """
+        for _ in request.pathing:
+            response.query.pathing.add(distance=0)
+        for query in request.abilities:
+            response.query.abilities.add(unit_tag=query.unit_tag)
+        for _ in request.placements:
+            response.query.placements.add(result=ActionResult.Error.value)
+
+    def _handle_debug(self, _request: sc_pb.RequestDebug, response: sc_pb.Response):
+        response.debug.SetInParent()
+
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import csv
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+# Phases of one iteration of the game loop in main.py, in the order they are recorded
+PHASES = (
+    "observation_wait",
+    "observation_parse",
+    "game_state",
+    "game_info",
+    "prepare_units",
+    "prepare_step",
+    "issue_events",
+    "on_step",
+    "scheduled_tasks",
+    "actions",
+    "debug",
+    "step",
+)
+_PHASE_COLUMNS: Dict[str, int] = {phase: column for column, phase in enumerate(PHASES, start=1)}
+
+
+class StepProfiler:
+    """Records how long each phase of an iteration of the game loop takes, for the last 'capacity' iterations.
+    The phases are listed in PHASES, phases that did not happen in an iteration (e.g. 'step' in realtime) take 0 ns.
+
+    Example::
+
+        class MyBot(BotAI):
+            def __init__(self):
+                self.step_profiler = StepProfiler(capacity=10_000)
+
+            async def on_end(self, game_result: Result):
+                self.step_profiler.to_chrome_trace("trace.json")  # Open in chrome://tracing or https://ui.perfetto.dev
+                self.step_profiler.to_csv("steps.csv")
+    """
+
+    def __init__(self, capacity: int = 1000):
+        """
+        :param capacity: Amount of iterations that are stored, older iterations are overwritten
+        """
+        assert capacity > 0
+        self.capacity: int = capacity
+        # Column 0 is the start of the iteration, the other columns are the end of each phase in PHASES, 0 if not recorded
+        self._timestamps: np.ndarray = np.zeros((capacity, len(PHASES) + 1), dtype=np.int64)
+        self._iterations: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self._game_loops: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self._row: int = -1
+        self.recorded_iterations: int = 0
+
+    def __len__(self) -> int:
+        return min(self.recorded_iterations, self.capacity)
+
+    def begin_iteration(self, iteration: int):
+        """Called by main.py at the start of each iteration, before the observation is requested.
+
+        :param iteration:"""
+        self._row = self.recorded_iterations % self.capacity
+        self.recorded_iterations += 1
+        row = self._timestamps[self._row]
+        row[:] = 0
+        row[0] = time.perf_counter_ns()
+        self._iterations[self._row] = iteration
+
+    def mark(self, phase: str, timestamp_ns: Optional[int] = None):
+        """Records the end of 'phase' in the current iteration.
+
+        :param phase: One of PHASES
+        :param timestamp_ns: Time of the end of the phase, defaults to now"""
+        if self._row == -1:
+            return
+        self._timestamps[self._row, _PHASE_COLUMNS[phase]] = timestamp_ns or time.perf_counter_ns()
+
+    def set_game_loop(self, game_loop: int):
+        """
+        :param game_loop:"""
+        if self._row != -1:
+            self._game_loops[self._row] = game_loop
+
+    def _ordered_rows(self) -> np.ndarray:
+        """ Indices of the stored iterations, oldest first. """
+        amount = len(self)
+        return (np.arange(amount) + self.recorded_iterations - amount) % self.capacity
+
+    def durations_ns(self) -> np.ndarray:
+        """Returns the duration of each phase as array of shape (iterations, len(PHASES)), oldest iteration first.
+        Phases that were not recorded in an iteration take 0 ns."""
+        timestamps = self._timestamps[self._ordered_rows()]
+        # Phases that were not recorded end when the previous phase ended
+        filled = np.maximum.accumulate(timestamps, axis=1)
+        return np.diff(filled, axis=1)
+
+    def summary(self) -> Dict[str, float]:
+        """ Returns the average duration in milliseconds of each phase. """
+        durations = self.durations_ns()
+        if not len(durations):
+            return {phase: 0.0 for phase in PHASES}
+        return {phase: float(value) / 1e6 for phase, value in zip(PHASES, durations.mean(axis=0))}
+
+    def to_csv(self, path: Union[str, Path]):
+        """Writes one row per iteration with the duration of each phase in microseconds.
+
+        :param path:"""
+        rows = self._ordered_rows()
+        durations = self.durations_ns()
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["iteration", "game_loop", "start_us"] + [f"{phase}_us" for phase in PHASES])
+            for row, phase_durations in zip(rows.tolist(), durations.tolist()):
+                writer.writerow(
+                    [
+                        int(self._iterations[row]),
+                        int(self._game_loops[row]),
+                        self._timestamps[row, 0] // 1000,
+                    ] + [duration / 1000 for duration in phase_durations]
+                )
+
+    def to_chrome_trace(self, path: Union[str, Path]):
+        """Writes the phases as trace events, which can be opened in chrome://tracing or https://ui.perfetto.dev
+
+        :param path:"""
+        events: List[dict] = []
+        for row, phase_durations in zip(self._ordered_rows().tolist(), self.durations_ns().tolist()):
+            start = int(self._timestamps[row, 0])
+            args = {"iteration": int(self._iterations[row]), "game_loop": int(self._game_loops[row])}
+            events.append(
+                {
+                    "name": "iteration",
+                    "ph": "X",
+                    "ts": start / 1000,
+                    "dur": sum(phase_durations) / 1000,
+                    "pid": 1,
+                    "tid": 1,
+                    "args": args,
+                }
+            )
+            for phase, duration in zip(PHASES, phase_durations):
+                if duration:
+                    events.append(
+                        {
+                            "name": phase,
+                            "ph": "X",
+                            "ts": start / 1000,
+                            "dur": duration / 1000,
+                            "pid": 1,
+                            "tid": 2,
+                            "args": args,
+                        }
+                    )
+                start += duration
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
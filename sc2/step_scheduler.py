@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, Optional
+
+from loguru import logger
+
+# A warning is logged each time a task was postponed this many steps in a row
+DEFERRAL_WARNING_STEPS = 100
+
+
+@dataclass
+class ScheduledTask:
+    """A coroutine function which is run by the StepScheduler every 'interval' game loops, see BotAI.schedule"""
+
+    function: Callable[[], Awaitable[Any]]
+    # Target cadence in game loops
+    interval: int
+    # Tasks with higher priority are run first when several tasks are due
+    priority: int = 0
+    # If set, the task is run even without time left in the step once it is this many game loops overdue
+    max_delay: Optional[int] = None
+    name: str = ""
+    # Game loop at which the task is due next
+    next_game_loop: int = 0
+    runs: int = 0
+    # Amount of steps in which the task was due but was postponed because the step budget was used up
+    deferrals: int = 0
+    # Amount of steps since the task was due in which it was postponed, reset when it runs
+    consecutive_deferrals: int = 0
+    # Amount of runs after which the step took longer than its budget
+    overruns: int = 0
+    # Exponential moving average of the duration of a run in seconds, used to decide if the task fits into a step
+    average_duration: float = 0.0
+
+    def is_due(self, game_loop: int) -> bool:
+        return game_loop >= self.next_game_loop
+
+    def is_overdue(self, game_loop: int) -> bool:
+        return self.max_delay is not None and game_loop - self.next_game_loop >= self.max_delay
+
+
+class StepScheduler:
+    """Runs deferrable tasks of a bot after on_step, but only while the step has time left.
+    The time of one step is 'client.game_step / 22.4' seconds, of which 'budget_fraction' may be used by the bot.
+    Tasks which do not fit into the remaining time are postponed to the next step, see BotAI.schedule for an example."""
+
+    def __init__(self, budget_fraction: float = 0.8):
+        """
+        :param budget_fraction: Fraction of the duration of a step that on_step and the scheduled tasks may use
+        """
+        assert 0 < budget_fraction
+        self.budget_fraction: float = budget_fraction
+        self.tasks: List[ScheduledTask] = []
+        # Amount of steps which took longer than their budget because of a scheduled task
+        self.overruns: int = 0
+
+    def add(
+        self,
+        function: Callable[[], Awaitable[Any]],
+        interval: int,
+        priority: int = 0,
+        max_delay: Optional[int] = None,
+        name: Optional[str] = None,
+        start_game_loop: int = 0,
+    ) -> ScheduledTask:
+        """
+        :param function: Coroutine function without arguments
+        :param interval: Target cadence in game loops
+        :param priority:
+        :param max_delay:
+        :param name:
+        :param start_game_loop: Game loop at which the task is due the first time
+        """
+        assert interval > 0, f"interval has to be positive, got {interval}"
+        task = ScheduledTask(
+            function=function,
+            interval=interval,
+            priority=priority,
+            max_delay=max_delay,
+            name=name or getattr(function, "__name__", repr(function)),
+            next_game_loop=start_game_loop,
+        )
+        self.tasks.append(task)
+        return task
+
+    def remove(self, task: ScheduledTask):
+        """
+        :param task:"""
+        self.tasks.remove(task)
+
+    async def run(self, game_loop: int, deadline: float):
+        """Runs the tasks which are due in this game loop as long as time.perf_counter() is before 'deadline'.
+        Tasks whose estimated duration does not fit into the remaining time are postponed, unless they are overdue.
+        The first due task is always run while time is left, even if it is estimated to take longer than the budget,
+        so a task that once took longer than a whole step is not postponed forever.
+
+        :param game_loop:
+        :param deadline: time.perf_counter() value at which the budget of this step is used up"""
+        due_tasks = [task for task in self.tasks if task.is_due(game_loop)]
+        if not due_tasks:
+            return
+        # Highest priority first, then the task that waited the longest
+        due_tasks.sort(key=lambda task: (-task.priority, task.next_game_loop))
+        ran_task = False
+        for task in due_tasks:
+            t0 = time.perf_counter()
+            fits = t0 + task.average_duration <= deadline or (not ran_task and t0 < deadline)
+            if not fits and not task.is_overdue(game_loop):
+                task.deferrals += 1
+                task.consecutive_deferrals += 1
+                if task.consecutive_deferrals % DEFERRAL_WARNING_STEPS == 0:
+                    logger.warning(
+                        f"Scheduled task '{task.name}' was postponed {task.consecutive_deferrals} steps in a row, "
+                        f"it takes {1000 * task.average_duration:.1f} ms"
+                    )
+                continue
+            ran_task = True
+            task.consecutive_deferrals = 0
+            await task.function()
+            t1 = time.perf_counter()
+            duration = t1 - t0
+            task.average_duration = duration if task.runs == 0 else 0.8 * task.average_duration + 0.2 * duration
+            task.runs += 1
+            task.next_game_loop = game_loop + task.interval
+            if t1 > deadline:
+                task.overruns += 1
+                self.overruns += 1
+                logger.warning(
+                    f"Scheduled task '{task.name}' took {1000 * duration:.1f} ms and exceeded the step budget by {1000 * (t1 - deadline):.1f} ms"
+                )
@@ -11,9 +11,7 @@ from sc2.cache import CacheDict
 from sc2.constants import (
     CAN_BE_ATTACKED,
     DAMAGE_BONUS_PER_UPGRADE,
-    IS_ARMORED,
     IS_ATTACKING,
-    IS_BIOLOGICAL,
     IS_CARRYING_MINERALS,
     IS_CARRYING_RESOURCES,
     IS_CARRYING_VESPENE,
@@ -24,17 +22,13 @@ from sc2.constants import (
     IS_ENEMY,
     IS_GATHERING,
     IS_LIGHT,
-    IS_MASSIVE,
-    IS_MECHANICAL,
     IS_MINE,
     IS_PATROLLING,
     IS_PLACEHOLDER,
-    IS_PSIONIC,
     IS_REPAIRING,
     IS_RETURNING,
     IS_REVEALED,
     IS_SNAPSHOT,
-    IS_STRUCTURE,
     IS_VISIBLE,
     OFF_CREEP_SPEED_INCREASE_DICT,
     OFF_CREEP_SPEED_UPGRADE_DICT,
@@ -46,9 +40,7 @@ from sc2.constants import (
     TARGET_BOTH,
     TARGET_GROUND,
     TARGET_HELPER,
-    UNIT_BATTLECRUISER,
     UNIT_COLOSSUS,
-    UNIT_ORACLE,
     UNIT_PHOTONCANNON,
     transforming,
 )
@@ -62,7 +54,7 @@ from sc2.unit_command import UnitCommand
 
 if TYPE_CHECKING:
     from sc2.bot_ai import BotAI
-    from sc2.game_data import AbilityData, UnitTypeData
+    from sc2.game_data import AbilityData, UnitTypeData, UnitTypeRow
 
 
 @dataclass
@@ -125,6 +117,26 @@ class Unit:
         # Index used in the 2D numpy array to access the 2D distance between two units
         self.distance_calculation_index: int = distance_calculation_index
 
+    def _refresh(self, proto_data, distance_calculation_index: int, game_loop: int):
+        """Replaces the raw unit with the one of a newer frame, used if 'persistent_units' is set on the bot.
+        Cached properties of the previous frame are removed. The ones that only depend on the unit type are kept,
+        unless the unit type changed.
+
+        :param proto_data:
+        :param distance_calculation_index:
+        :param game_loop:
+        """
+        cache = self.__dict__
+        if not CACHED_PROPERTIES.isdisjoint(cache):
+            stale = CACHED_PROPERTIES.intersection(cache)
+            if proto_data.unit_type == self._proto.unit_type:
+                stale -= TYPE_CACHED_PROPERTIES
+            for name in stale:
+                del cache[name]
+        self._proto = proto_data
+        self.game_loop = game_loop
+        self.distance_calculation_index = distance_calculation_index
+
     def __repr__(self) -> str:
         """ Returns string of this form: Unit(name='SCV', tag=4396941328). """
         return f"Unit(name={self.name !r}, tag={self.tag})"
@@ -140,6 +152,11 @@ class Unit:
         """ Provides the unit type data. """
         return self._bot_object.game_data.units[self._proto.unit_type]
 
+    @cached_property
+    def _type_row(self) -> UnitTypeRow:
+        """ Provides the static attributes of the unit type, see GameData.unit_types. """
+        return self._bot_object.game_data.unit_types.rows[self._proto.unit_type]
+
     @cached_property
     def _creation_ability(self) -> AbilityData:
         """ Provides the AbilityData of the creation ability of this unit. """
@@ -163,37 +180,37 @@ class Unit:
     @property
     def is_structure(self) -> bool:
         """ Checks if the unit is a structure. """
-        return IS_STRUCTURE in self._type_data.attributes
+        return self._type_row.is_structure
 
     @property
     def is_light(self) -> bool:
         """ Checks if the unit has the 'light' attribute. """
-        return IS_LIGHT in self._type_data.attributes
+        return self._type_row.is_light
 
     @property
     def is_armored(self) -> bool:
         """ Checks if the unit has the 'armored' attribute. """
-        return IS_ARMORED in self._type_data.attributes
+        return self._type_row.is_armored
 
     @property
     def is_biological(self) -> bool:
         """ Checks if the unit has the 'biological' attribute. """
-        return IS_BIOLOGICAL in self._type_data.attributes
+        return self._type_row.is_biological
 
     @property
     def is_mechanical(self) -> bool:
         """ Checks if the unit has the 'mechanical' attribute. """
-        return IS_MECHANICAL in self._type_data.attributes
+        return self._type_row.is_mechanical
 
     @property
     def is_massive(self) -> bool:
         """ Checks if the unit has the 'massive' attribute. """
-        return IS_MASSIVE in self._type_data.attributes
+        return self._type_row.is_massive
 
     @property
     def is_psionic(self) -> bool:
         """ Checks if the unit has the 'psionic' attribute. """
-        return IS_PSIONIC in self._type_data.attributes
+        return self._type_row.is_psionic
 
     @cached_property
     def tech_alias(self) -> Optional[List[UnitTypeId]]:
@@ -214,76 +231,45 @@ class Unit:
         """ Returns the weapons of the unit. """
         return self._type_data._proto.weapons
 
-    @cached_property
+    @property
     def can_attack(self) -> bool:
         """ Checks if the unit can attack at all. """
-        # TODO BATTLECRUISER doesnt have weapons in proto?!
-        return bool(self._weapons) or self.type_id in {UNIT_BATTLECRUISER, UNIT_ORACLE}
+        return self._type_row.can_attack
 
     @property
     def can_attack_both(self) -> bool:
         """ Checks if the unit can attack both ground and air units. """
         return self.can_attack_ground and self.can_attack_air
 
-    @cached_property
+    @property
     def can_attack_ground(self) -> bool:
         """ Checks if the unit can attack ground units. """
-        if self.type_id in {UNIT_BATTLECRUISER, UNIT_ORACLE}:
-            return True
-        if self._weapons:
-            return any(weapon.type in TARGET_GROUND for weapon in self._weapons)
-        return False
+        return self._type_row.can_attack_ground
 
-    @cached_property
+    @property
     def ground_dps(self) -> float:
         """ Returns the dps against ground units. Does not include upgrades. """
-        if self.can_attack_ground:
-            weapon = next((weapon for weapon in self._weapons if weapon.type in TARGET_GROUND), None)
-            if weapon:
-                return (weapon.damage * weapon.attacks) / weapon.speed
-        return 0
+        return self._type_row.ground_dps
 
-    @cached_property
+    @property
     def ground_range(self) -> float:
         """ Returns the range against ground units. Does not include upgrades. """
-        if self.type_id == UNIT_ORACLE:
-            return 4
-        if self.type_id == UNIT_BATTLECRUISER:
-            return 6
-        if self.can_attack_ground:
-            weapon = next((weapon for weapon in self._weapons if weapon.type in TARGET_GROUND), None)
-            if weapon:
-                return weapon.range
-        return 0
+        return self._type_row.ground_range
 
-    @cached_property
+    @property
     def can_attack_air(self) -> bool:
         """ Checks if the unit can air attack at all. Does not include upgrades. """
-        if self.type_id == UNIT_BATTLECRUISER:
-            return True
-        if self._weapons:
-            return any(weapon.type in TARGET_AIR for weapon in self._weapons)
-        return False
+        return self._type_row.can_attack_air
 
-    @cached_property
+    @property
     def air_dps(self) -> float:
         """ Returns the dps against air units. Does not include upgrades. """
-        if self.can_attack_air:
-            weapon = next((weapon for weapon in self._weapons if weapon.type in TARGET_AIR), None)
-            if weapon:
-                return (weapon.damage * weapon.attacks) / weapon.speed
-        return 0
+        return self._type_row.air_dps
 
-    @cached_property
+    @property
     def air_range(self) -> float:
         """ Returns the range against air units. Does not include upgrades. """
-        if self.type_id == UNIT_BATTLECRUISER:
-            return 6
-        if self.can_attack_air:
-            weapon = next((weapon for weapon in self._weapons if weapon.type in TARGET_AIR), None)
-            if weapon:
-                return weapon.range
-        return 0
+        return self._type_row.air_range
 
     @cached_property
     def bonus_damage(self) -> Optional[Tuple[int, str]]:
@@ -300,19 +286,19 @@ class Unit:
     @property
     def armor(self) -> float:
         """ Returns the armor of the unit. Does not include upgrades """
-        return self._type_data._proto.armor
+        return self._type_row.armor
 
     @property
     def sight_range(self) -> float:
         """ Returns the sight range of the unit. """
-        return self._type_data._proto.sight_range
+        return self._type_row.sight_range
 
     @property
     def movement_speed(self) -> float:
         """Returns the movement speed of the unit.
         This is the unit movement speed on game speed 'normal'. To convert it to 'faster' movement speed, multiply it by a factor of '1.4'. E.g. reaper movement speed is listed here as 3.75, but should actually be 5.25.
         Does not include upgrades or buffs."""
-        return self._type_data._proto.movement_speed
+        return self._type_row.movement_speed
 
     @cached_property
     def real_speed(self) -> float:
@@ -858,7 +844,7 @@ class Unit:
 
         NOTE: This can be None if a building doesn't have a creation ability.
         For rich vespene buildings, flying terran buildings, this returns None"""
-        return self._type_data.footprint_radius
+        return self._type_row.footprint_radius
 
     @property
     def radius(self) -> float:
@@ -1495,3 +1481,21 @@ class Unit:
             subtract_supply=subtract_supply,
             can_afford_check=can_afford_check,
         )
+
+
+# Cached properties of Unit which only depend on the unit type, so they stay valid when the unit is refreshed
+TYPE_CACHED_PROPERTIES: FrozenSet[str] = frozenset(
+    {
+        "_type_data",
+        "_type_row",
+        "_creation_ability",
+        "race",
+        "tech_alias",
+        "unit_alias",
+        "_weapons",
+        "bonus_damage",
+    }
+)
+CACHED_PROPERTIES: FrozenSet[str] = frozenset(
+    name for name, value in vars(Unit).items() if isinstance(value, cached_property)
+)
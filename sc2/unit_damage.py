@@ -0,0 +1,419 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, AbstractSet, Iterable, NamedTuple, Tuple
+
+import numpy as np
+
+from sc2.constants import IS_LIGHT, TARGET_AIR, TARGET_BOTH, TARGET_GROUND
+from sc2.ids.buff_id import BuffId
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.ids.upgrade_id import UpgradeId
+
+if TYPE_CHECKING:
+    from sc2.game_data import GameData
+    from sc2.units import Units
+
+# Hard coded weapons of units that have no weapon in the API: (damage vs ground, damage vs air, attack speed, range)
+BATTLECRUISER_WEAPON = (8, 5, 0.224, 6)
+# Enemy bunkers are expected to be fully loaded with marines: (damage, attack speed, range)
+BUNKER_WEAPON = (24, 0.854, 6)
+# If a weapon type can attack ground units, air units or colossi, which can be attacked by ground and air weapons
+_HITS_GROUND = np.isin(np.arange(max(TARGET_BOTH) + 1), list(TARGET_GROUND))
+_HITS_AIR = np.isin(np.arange(max(TARGET_BOTH) + 1), list(TARGET_AIR))
+_HITS_BOTH = np.isin(np.arange(max(TARGET_BOTH) + 1), list(TARGET_BOTH))
+
+
+class DamageAttackers(NamedTuple):
+    """Attributes of attacking units that their damage depends on, one entry per unit, see damage_matrix."""
+
+    type_id: np.ndarray
+    attack_upgrade_level: np.ndarray
+    is_ready: np.ndarray
+    # Only active enemy bunkers deal damage
+    is_enemy: np.ndarray
+    is_active: np.ndarray
+    # Hellions with the blue flame upgrade
+    has_blue_flame: np.ndarray
+    # Modifiers of attack speed and range by buffs and upgrades, e.g. stim or hydralisk range upgrade
+    attack_speed_divisor: np.ndarray
+    attack_range_bonus: np.ndarray
+
+    @classmethod
+    def from_units(cls, units: Units) -> DamageAttackers:
+        """Reads the attributes of the units with the same rules as Unit.calculate_damage_vs_target.
+
+        :param units:"""
+        upgrades = units._bot_object.state.upgrades if units else set()
+        return cls._from_rows(
+            [
+                cls._row(
+                    unit.type_id,
+                    unit.attack_upgrade_level,
+                    unit.is_ready,
+                    unit.is_mine,
+                    unit.is_enemy,
+                    unit.is_active,
+                    unit.buffs,
+                    upgrades,
+                ) for unit in units
+            ]
+        )
+
+    @classmethod
+    def from_unit_types(
+        cls,
+        unit_types: Iterable[UnitTypeId],
+        attack_upgrade_level: int = 0,
+        upgrades: AbstractSet[UpgradeId] = frozenset(),
+        is_mine: bool = True,
+    ) -> DamageAttackers:
+        """Creates the attributes of completed units without buffs, e.g. of units that are planned or were seen earlier.
+        Enemy bunkers are expected to be loaded.
+
+        :param unit_types: Type of each unit
+        :param attack_upgrade_level:
+        :param upgrades: Upgrades of the owner of the units
+        :param is_mine: If the units belong to the bot, otherwise they belong to the enemy
+        """
+        return cls._from_rows(
+            [
+                cls._row(unit_type, attack_upgrade_level, True, is_mine, not is_mine, True, frozenset(), upgrades)
+                for unit_type in unit_types
+            ]
+        )
+
+    @staticmethod
+    def _row(
+        type_id: UnitTypeId,
+        attack_upgrade_level: int,
+        is_ready: bool,
+        is_mine: bool,
+        is_enemy: bool,
+        is_active: bool,
+        buffs: AbstractSet[BuffId],
+        upgrades: AbstractSet[UpgradeId],
+    ) -> tuple:
+        attack_speed_divisor = 1
+        attack_range_bonus = 0
+        if type_id == UnitTypeId.ZERGLING and is_mine and UpgradeId.ZERGLINGATTACKSPEED in upgrades:
+            attack_speed_divisor = 1.4
+        elif type_id == UnitTypeId.ADEPT and is_mine and UpgradeId.ADEPTPIERCINGATTACK in upgrades:
+            attack_speed_divisor = 1.45
+        elif type_id == UnitTypeId.MARINE and BuffId.STIMPACK in buffs:
+            attack_speed_divisor = 1.5
+        elif type_id == UnitTypeId.MARAUDER and BuffId.STIMPACKMARAUDER in buffs:
+            attack_speed_divisor = 1.5
+        elif type_id == UnitTypeId.HYDRALISK and is_mine and UpgradeId.EVOLVEGROOVEDSPINES in upgrades:
+            attack_range_bonus = 1
+        elif type_id == UnitTypeId.PHOENIX and is_mine and UpgradeId.PHOENIXRANGEUPGRADE in upgrades:
+            attack_range_bonus = 2
+        elif (
+            type_id in {UnitTypeId.PLANETARYFORTRESS, UnitTypeId.MISSILETURRET, UnitTypeId.AUTOTURRET} and is_mine
+            and UpgradeId.HISECAUTOTRACKING in upgrades
+        ):
+            attack_range_bonus = 1
+        return (
+            type_id.value,
+            attack_upgrade_level,
+            is_ready,
+            is_enemy,
+            is_active,
+            type_id == UnitTypeId.HELLION and UpgradeId.HIGHCAPACITYBARRELS in upgrades,
+            attack_speed_divisor,
+            attack_range_bonus,
+        )
+
+    @classmethod
+    def _from_rows(cls, rows) -> DamageAttackers:
+        columns = list(zip(*rows)) or [()] * len(cls._fields)
+        return cls(
+            type_id=np.array(columns[0], dtype=np.int64),
+            attack_upgrade_level=np.array(columns[1], dtype=np.float64),
+            is_ready=np.array(columns[2], dtype=bool),
+            is_enemy=np.array(columns[3], dtype=bool),
+            is_active=np.array(columns[4], dtype=bool),
+            has_blue_flame=np.array(columns[5], dtype=bool),
+            attack_speed_divisor=np.array(columns[6], dtype=np.float64),
+            attack_range_bonus=np.array(columns[7], dtype=np.float64),
+        )
+
+
+class DamageTargets(NamedTuple):
+    """Attributes of attacked units that the damage against them depends on, one entry per unit, see damage_matrix."""
+
+    type_id: np.ndarray
+    is_flying: np.ndarray
+    health: np.ndarray
+    shield: np.ndarray
+    # Armor and shield armor including upgrades and buffs, except guardian shield
+    armor: np.ndarray
+    shield_armor: np.ndarray
+    has_guardian_shield: np.ndarray
+
+    @classmethod
+    def from_units(cls, units: Units) -> DamageTargets:
+        """Reads the attributes of the units with the same rules as Unit.calculate_damage_vs_target.
+
+        :param units:"""
+        upgrades = units._bot_object.state.upgrades if units else set()
+        return cls._from_rows(
+            [
+                cls._row(
+                    unit.type_id,
+                    unit.is_flying,
+                    unit.health,
+                    unit.shield,
+                    unit.armor + unit.armor_upgrade_level,
+                    unit.shield_upgrade_level,
+                    unit.is_mine,
+                    unit.buffs,
+                    upgrades,
+                ) for unit in units
+            ]
+        )
+
+    @classmethod
+    def from_unit_types(
+        cls,
+        unit_types: Iterable[UnitTypeId],
+        is_flying: Iterable[bool],
+        health: Iterable[float],
+        shield: Iterable[float],
+        game_data: GameData,
+        armor_upgrade_level: int = 0,
+        shield_upgrade_level: int = 0,
+        upgrades: AbstractSet[UpgradeId] = frozenset(),
+        is_mine: bool = True,
+    ) -> DamageTargets:
+        """Creates the attributes of units without buffs, e.g. of units that are planned or were seen earlier.
+        The API does not provide health, shield and if a unit type is flying, so they are given for each unit.
+
+        :param unit_types: Type of each unit
+        :param is_flying:
+        :param health:
+        :param shield:
+        :param game_data:
+        :param armor_upgrade_level:
+        :param shield_upgrade_level:
+        :param upgrades: Upgrades of the owner of the units
+        :param is_mine: If the units belong to the bot, otherwise they belong to the enemy
+        """
+        rows = game_data.unit_types.rows
+        return cls._from_rows(
+            [
+                cls._row(
+                    unit_type,
+                    unit_is_flying,
+                    unit_health,
+                    unit_shield,
+                    rows[unit_type.value].armor + armor_upgrade_level,
+                    shield_upgrade_level,
+                    is_mine,
+                    frozenset(),
+                    upgrades,
+                ) for unit_type, unit_is_flying, unit_health, unit_shield in zip(unit_types, is_flying, health, shield)
+            ]
+        )
+
+    @staticmethod
+    def _row(
+        type_id: UnitTypeId,
+        is_flying: bool,
+        health: float,
+        shield: float,
+        armor: float,
+        shield_armor: float,
+        is_mine: bool,
+        buffs: AbstractSet[BuffId],
+        upgrades: AbstractSet[UpgradeId],
+    ) -> tuple:
+        # Ultralisk armor upgrade, only known for units of the bot
+        if (
+            type_id in {UnitTypeId.ULTRALISK, UnitTypeId.ULTRALISKBURROWED} and is_mine
+            and UpgradeId.CHITINOUSPLATING in upgrades
+        ):
+            armor += 2
+        # Anti armor missile of raven
+        if BuffId.RAVENSHREDDERMISSILETINT in buffs:
+            armor -= 2
+            shield_armor -= 2
+        return type_id.value, is_flying, health, shield, armor, shield_armor, BuffId.GUARDIANSHIELD in buffs
+
+    @classmethod
+    def _from_rows(cls, rows) -> DamageTargets:
+        columns = list(zip(*rows)) or [()] * len(cls._fields)
+        return cls(
+            type_id=np.array(columns[0], dtype=np.int64),
+            is_flying=np.array(columns[1], dtype=bool),
+            health=np.array(columns[2], dtype=np.float64),
+            shield=np.array(columns[3], dtype=np.float64),
+            armor=np.array(columns[4], dtype=np.float64),
+            shield_armor=np.array(columns[5], dtype=np.float64),
+            has_guardian_shield=np.array(columns[6], dtype=bool),
+        )
+
+
+def damage_matrix(
+    attackers: DamageAttackers,
+    targets: DamageTargets,
+    game_data: GameData,
+    ignore_armor: bool = False,
+    include_overkill_damage: bool = True,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the damage per full attack, attack speed and attack range of each attacker against each target,
+    as arrays of shape (attackers, targets). Entry [i, j] is the same as the result of
+    'Unit.calculate_damage_vs_target' of attacker i against target j, see there for the rules and the arguments.
+
+    Instead of looping over the pairs, the weapons of all attackers are looked up in GameData.unit_weapons
+    and each rule is applied to all pairs at once.
+
+    :param attackers:
+    :param targets:
+    :param game_data:
+    :param ignore_armor:
+    :param include_overkill_damage:
+    """
+    shape = (len(attackers.type_id), len(targets.type_id))
+    damage = np.zeros(shape, dtype=np.float64)
+    attack_speed = np.zeros(shape, dtype=np.float64)
+    attack_range = np.zeros(shape, dtype=np.float64)
+    if not shape[0] or not shape[1]:
+        return damage, attack_speed, attack_range
+
+    weapons = game_data.unit_weapons
+    attacker_types = np.minimum(attackers.type_id, game_data.unit_types.size - 1)
+    upgrade_level = attackers.attack_upgrade_level[:, None]
+    target_is_colossus = targets.type_id == UnitTypeId.COLOSSUS.value
+    target_is_flying = targets.is_flying[None, :]
+    target_attributes = game_data.unit_types.lookup("attributes", targets.type_id)[None, :]
+    health = targets.health[None, :]
+    shield = targets.shield[None, :]
+    if ignore_armor:
+        armor = np.zeros((1, shape[1]), dtype=np.float64)
+        shield_armor = armor
+        has_guardian_shield = np.zeros((1, shape[1]), dtype=bool)
+    else:
+        armor = targets.armor[None, :]
+        shield_armor = targets.shield_armor[None, :]
+        has_guardian_shield = targets.has_guardian_shield[None, :]
+
+    found = np.zeros(shape, dtype=bool)
+    for index in range(weapons.weapons_count):
+        weapon_type = weapons.type[attacker_types, index][:, None]
+        hits_target = np.where(
+            target_is_colossus[None, :],
+            _HITS_BOTH[weapon_type],
+            np.where(target_is_flying, _HITS_AIR[weapon_type], _HITS_GROUND[weapon_type]),
+        )
+        if not hits_target.any():
+            continue
+        weapon_range = weapons.range[attacker_types, index][:, None]
+        damage_per_upgrade = weapons.damage_per_upgrade[attacker_types, index][:, None]
+        damage_per_attack = weapons.damage[attacker_types, index][:, None] + upgrade_level * damage_per_upgrade
+
+        # Highest bonus damage against the attributes of the target
+        bonus_attribute = weapons.bonus_attribute[attacker_types, index]
+        bonus_per_upgrade = weapons.bonus_per_upgrade[attacker_types, index] + np.where(
+            (bonus_attribute == IS_LIGHT) & attackers.has_blue_flame[:, None], 5, 0
+        )
+        bonus_damage = weapons.bonus[attacker_types, index] + upgrade_level * bonus_per_upgrade
+        has_bonus = (bonus_attribute[:, None, :] > 0) & (
+            (target_attributes[:, :, None] >> bonus_attribute[:, None, :]) & 1
+        ).astype(bool)
+        max_bonus = np.where(has_bonus, bonus_damage[:, None, :], -np.inf).max(axis=2)
+        damage_per_attack = np.where(has_bonus.any(axis=2), damage_per_attack + max_bonus, damage_per_attack)
+
+        # Ranged attacks against units with guardian shield deal 2 less damage
+        guardian_shield_armor = np.where(has_guardian_shield & (weapon_range >= 2), 2, 0)
+        attacks_left = np.broadcast_to(weapons.attacks[attacker_types, index][:, None], shape).copy()
+        max_attacks = int(attacks_left.max())
+
+        # Attacks on the shield, the damage of the attack that breaks the shield carries over to the health
+        shield_left = np.broadcast_to(shield, shape).copy()
+        shield_damage_per_attack = np.maximum(0.5, damage_per_attack - (shield_armor + guardian_shield_armor))
+        for _ in range(max_attacks):
+            attacking = (attacks_left > 0) & (shield_left > 0)
+            if not attacking.any():
+                break
+            shield_left = np.where(attacking, shield_left - shield_damage_per_attack, shield_left)
+            attacks_left -= attacking
+        remaining_damage = np.where(shield_left < 0, -shield_left, 0)
+        shield_left = np.maximum(shield_left, 0)
+
+        # Attacks on the health
+        health_armor = armor + guardian_shield_armor
+        health_left = np.broadcast_to(health, shape).copy()
+        health_left = np.where(
+            remaining_damage > 0, health_left - np.maximum(0.5, remaining_damage - health_armor), health_left
+        )
+        health_damage_per_attack = np.maximum(0.5, damage_per_attack - health_armor)
+        for _ in range(max_attacks):
+            attacking = attacks_left > 0
+            if not include_overkill_damage:
+                attacking &= health_left > 0
+            if not attacking.any():
+                break
+            health_left = np.where(attacking, health_left - health_damage_per_attack, health_left)
+            attacks_left -= attacking
+
+        if not include_overkill_damage:
+            health_left = np.maximum(health_left, 0)
+        weapon_damage = health + shield - health_left - shield_left
+
+        # The weapon with the highest damage is used, the first one if several weapons deal the same damage
+        use_weapon = hits_target & (~found | (weapon_damage > damage))
+        found |= hits_target
+        damage = np.where(use_weapon, weapon_damage, damage)
+        attack_speed = np.where(
+            use_weapon, weapons.speed[attacker_types, index][:, None] / attackers.attack_speed_divisor[:, None],
+            attack_speed
+        )
+        attack_range = np.where(use_weapon, weapon_range + attackers.attack_range_bonus[:, None], attack_range)
+
+    # Battlecruisers have no weapon in the API
+    is_battlecruiser = (attackers.type_id == UnitTypeId.BATTLECRUISER.value)[:, None]
+    if is_battlecruiser.any():
+        ground_damage, air_damage, speed, weapon_range = BATTLECRUISER_WEAPON
+        guardian_shield_armor = np.where(has_guardian_shield, 2, 0)
+        battlecruiser_damage = np.where(target_is_flying, air_damage, ground_damage) + upgrade_level - np.where(
+            shield != 0, shield_armor + guardian_shield_armor, armor + guardian_shield_armor
+        )
+        damage = np.where(is_battlecruiser, battlecruiser_damage, damage)
+        attack_speed = np.where(is_battlecruiser, speed, attack_speed)
+        attack_range = np.where(is_battlecruiser, weapon_range, attack_range)
+
+    # Bunkers have no weapon in the API either, bunkers of the bot have no damage
+    is_bunker = (attackers.type_id == UnitTypeId.BUNKER.value)[:, None]
+    if is_bunker.any():
+        is_loaded_bunker = is_bunker & (attackers.is_enemy & attackers.is_active)[:, None]
+        bunker_damage, speed, weapon_range = BUNKER_WEAPON
+        damage = np.where(is_bunker, np.where(is_loaded_bunker, bunker_damage, 0), damage)
+        attack_speed = np.where(is_bunker, np.where(is_loaded_bunker, speed, 0), attack_speed)
+        attack_range = np.where(is_bunker, np.where(is_loaded_bunker, weapon_range, 0), attack_range)
+
+    # Structures that are not completed can't attack
+    not_ready = ~attackers.is_ready[:, None]
+    damage[np.broadcast_to(not_ready, shape)] = 0
+    attack_speed[np.broadcast_to(not_ready, shape)] = 0
+    attack_range[np.broadcast_to(not_ready, shape)] = 0
+    return damage, attack_speed, attack_range
+
+
+def dps_matrix(
+    attackers: DamageAttackers,
+    targets: DamageTargets,
+    game_data: GameData,
+    ignore_armor: bool = False,
+    include_overkill_damage: bool = True,
+) -> np.ndarray:
+    """Returns the DPS of each attacker against each target as array of shape (attackers, targets),
+    entry [i, j] is the same as the result of 'Unit.calculate_dps_vs_target' of attacker i against target j.
+
+    :param attackers:
+    :param targets:
+    :param game_data:
+    :param ignore_armor:
+    :param include_overkill_damage:
+    """
+    damage, attack_speed, _ = damage_matrix(attackers, targets, game_data, ignore_armor, include_overkill_damage)
+    return np.divide(damage, attack_speed, out=np.zeros_like(damage), where=attack_speed != 0)
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from sc2.constants import IS_PLACEHOLDER
+from sc2.unit import Unit
+from sc2.units import Units
+
+if TYPE_CHECKING:
+    from sc2.bot_ai import BotAI
+    from sc2.unit_snapshot import UnitSnapshot
+
+# Groups of the units in a UnitFrame, placeholders and neutral units are in no group
+GROUP_NONE = 0
+GROUP_OWN_UNITS = 1
+GROUP_OWN_STRUCTURES = 2
+GROUP_ENEMY_UNITS = 3
+GROUP_ENEMY_STRUCTURES = 4
+
+# Event hooks of BotAI which are called by BotAI.issue_events
+EVENT_HOOKS = (
+    "on_unit_destroyed",
+    "on_unit_created",
+    "on_unit_type_changed",
+    "on_building_construction_started",
+    "on_building_construction_complete",
+    "on_upgrade_complete",
+    "on_unit_took_damage",
+    "on_units_took_damage",
+    "on_enemy_unit_entered_vision",
+    "on_enemy_unit_left_vision",
+)
+
+_RAW_COLUMNS_DTYPE = np.dtype(
+    [
+        ("tag", np.uint64),
+        ("alliance", np.int8),
+        ("display_type", np.int8),
+        ("type_id", np.int32),
+        ("health", np.float64),
+        ("shield", np.float64),
+        ("build_progress", np.float64),
+    ]
+)
+
+
+class UnitFrame:
+    """The columns of all units of one frame that are compared to find unit events, see diff_unit_frames.
+    Row i belongs to the unit with 'distance_calculation_index == i', which is only created if it is needed by an event."""
+
+    def __init__(
+        self,
+        bot: BotAI,
+        columns: Dict[str, np.ndarray],
+        all_units: Optional[Units] = None,
+        snapshot: Optional[UnitSnapshot] = None,
+    ):
+        """
+        :param bot:
+        :param columns: Arrays of the columns of _RAW_COLUMNS_DTYPE
+        :param all_units: Units that the rows belong to
+        :param snapshot: UnitSnapshot that the rows belong to, if the bot uses snapshots
+        """
+        self._bot: BotAI = bot
+        self._all_units: Optional[Units] = all_units
+        self._snapshot: Optional[UnitSnapshot] = snapshot
+        self.game_loop: int = bot.state.game_loop
+        # With persistent units, the Unit objects of this frame are refreshed in later frames, see unit()
+        self._protos: Optional[List[Any]] = None
+        if bot.persistent_units:
+            # pylint: disable=W0212
+            self._protos = snapshot._protos if snapshot is not None else [unit._proto for unit in all_units or []]
+        self.tags: np.ndarray = columns["tag"]
+        self.type_ids: np.ndarray = columns["type_id"]
+        self.health: np.ndarray = columns["health"]
+        self.shield: np.ndarray = columns["shield"]
+        self.build_progress: np.ndarray = columns["build_progress"]
+        is_structure_lookup: np.ndarray = bot._unit_type_is_structure
+        is_structure: np.ndarray = is_structure_lookup[np.minimum(self.type_ids, len(is_structure_lookup) - 1)]
+        alliance: np.ndarray = columns["alliance"]
+        not_placeholder: np.ndarray = columns["display_type"] != IS_PLACEHOLDER
+        self.groups: np.ndarray = np.zeros(len(self.tags), dtype=np.int8)
+        # Alliance.Self.value = 1, Alliance.Enemy.value = 4
+        own = not_placeholder & (alliance == 1)
+        enemy = not_placeholder & (alliance == 4)
+        self.groups[own & ~is_structure] = GROUP_OWN_UNITS
+        self.groups[own & is_structure] = GROUP_OWN_STRUCTURES
+        self.groups[enemy & ~is_structure] = GROUP_ENEMY_UNITS
+        self.groups[enemy & is_structure] = GROUP_ENEMY_STRUCTURES
+
+    @classmethod
+    def from_bot(cls, bot: BotAI) -> UnitFrame:
+        """Reads the columns of the units of the current frame.
+
+        :param bot:"""
+        snapshot = bot.unit_snapshot
+        if snapshot is not None:
+            return cls(bot, {name: snapshot[name] for name in _RAW_COLUMNS_DTYPE.names}, snapshot=snapshot)
+        all_units = bot.all_units
+        raw_columns: np.ndarray = np.array(
+            [(
+                proto.tag,
+                proto.alliance,
+                proto.display_type,
+                proto.unit_type,
+                proto.health,
+                proto.shield,
+                proto.build_progress,
+            ) for proto in (unit._proto for unit in all_units)],
+            dtype=_RAW_COLUMNS_DTYPE,
+        )
+        return cls(bot, {name: raw_columns[name] for name in _RAW_COLUMNS_DTYPE.names}, all_units=all_units)
+
+    @classmethod
+    def empty(cls, bot: BotAI) -> UnitFrame:
+        """ The frame before the first frame of the game. """
+        return cls(bot, {name: np.zeros(0, dtype=_RAW_COLUMNS_DTYPE[name]) for name in _RAW_COLUMNS_DTYPE.names})
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def unit(self, row: int) -> Unit:
+        """
+        :param row:"""
+        unit = self._snapshot.unit(row) if self._snapshot is not None else self._all_units[row]
+        if self._protos is not None and unit._proto is not self._protos[row]:
+            # The persistent Unit object was refreshed with a later frame, so the unit of this frame is a copy
+            proto = self._protos[row]
+            unit = Unit(proto, self._bot, base_build=self._bot.base_build)
+            unit.game_loop = self.game_loop
+        return unit
+
+    def group_rows(self, group: int) -> np.ndarray:
+        """
+        :param group: One of the GROUP_ constants"""
+        return np.flatnonzero(self.groups == group)
+
+    def units(self, group: int) -> Units:
+        """ Returns the units of the group, e.g. the own units of the previous frame. """
+        return Units((self.unit(row) for row in self.group_rows(group).tolist()), self._bot)
+
+
+def _match_rows(previous: UnitFrame, current: UnitFrame, group: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Matches the units of a group by tag.
+    Returns the rows of current units that were in the group in the previous frame, their rows in the previous frame,
+    and the rows of current units that were not in the group.
+
+    :param previous:
+    :param current:
+    :param group:"""
+    current_rows = current.group_rows(group)
+    previous_rows = previous.group_rows(group)
+    current_tags = current.tags[current_rows]
+    previous_tags = previous.tags[previous_rows]
+    order = np.argsort(previous_tags)
+    sorted_previous_tags = previous_tags[order]
+    positions = np.minimum(np.searchsorted(sorted_previous_tags, current_tags), max(len(previous_tags) - 1, 0))
+    if len(previous_tags):
+        found = sorted_previous_tags[positions] == current_tags
+    else:
+        found = np.zeros(len(current_tags), dtype=bool)
+    return current_rows[found], previous_rows[order[positions[found]]], current_rows[~found]
+
+
+@dataclass
+class UnitFrameDiff:
+    """The unit events between two frames, as rows of the current or previous UnitFrame, in the order of the rows."""
+
+    destroyed_tags: np.ndarray
+    # Own units and structures which were not in their group in the previous frame
+    new_own_units: np.ndarray
+    new_own_structures: np.ndarray
+    # Own units and structures which are in the same group as in the previous frame, and their previous rows
+    own_rows: np.ndarray
+    own_previous_rows: np.ndarray
+    # Masks over own_rows
+    took_damage: np.ndarray
+    type_changed: np.ndarray
+    construction_completed: np.ndarray
+    # Damage that own_rows took, health and shield combined
+    damage: np.ndarray
+    entered_vision: np.ndarray
+    left_vision_tags: np.ndarray
+
+
+def diff_unit_frames(previous: UnitFrame, current: UnitFrame, dead_tags: np.ndarray) -> UnitFrameDiff:
+    """Compares two frames with array operations on the tags of each group.
+
+    :param previous:
+    :param current:
+    :param dead_tags: Tags of the units which died since the previous frame"""
+    units_rows, units_previous_rows, new_own_units = _match_rows(previous, current, GROUP_OWN_UNITS)
+    structures_rows, structures_previous_rows, new_own_structures = _match_rows(
+        previous, current, GROUP_OWN_STRUCTURES
+    )
+    own_rows = np.concatenate((units_rows, structures_rows))
+    own_previous_rows = np.concatenate((units_previous_rows, structures_previous_rows))
+    health_lost = previous.health[own_previous_rows] - current.health[own_rows]
+    shield_lost = previous.shield[own_previous_rows] - current.shield[own_rows]
+    construction_completed = (current.build_progress[own_rows] == 1) & (previous.build_progress[own_previous_rows] < 1)
+    # Only structures are under construction
+    construction_completed[:len(units_rows)] = False
+
+    enemy_units_rows, _, new_enemy_units = _match_rows(previous, current, GROUP_ENEMY_UNITS)
+    enemy_structures_rows, _, new_enemy_structures = _match_rows(previous, current, GROUP_ENEMY_STRUCTURES)
+    previous_enemy_units_tags = previous.tags[previous.group_rows(GROUP_ENEMY_UNITS)]
+    previous_enemy_structures_tags = previous.tags[previous.group_rows(GROUP_ENEMY_STRUCTURES)]
+    left_vision_tags = np.concatenate(
+        (
+            np.setdiff1d(previous_enemy_units_tags, current.tags[enemy_units_rows], assume_unique=True),
+            np.setdiff1d(previous_enemy_structures_tags, current.tags[enemy_structures_rows], assume_unique=True),
+        )
+    )
+
+    return UnitFrameDiff(
+        destroyed_tags=np.intersect1d(dead_tags, previous.tags),
+        new_own_units=new_own_units,
+        new_own_structures=new_own_structures,
+        own_rows=own_rows,
+        own_previous_rows=own_previous_rows,
+        took_damage=(health_lost > 0) | (shield_lost > 0),
+        type_changed=current.type_ids[own_rows] != previous.type_ids[own_previous_rows],
+        construction_completed=construction_completed,
+        damage=health_lost + shield_lost,
+        entered_vision=np.concatenate((new_enemy_units, new_enemy_structures)),
+        left_vision_tags=left_vision_tags,
+    )
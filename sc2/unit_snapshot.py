@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from operator import attrgetter
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from sc2.constants import FakeEffectID
+from sc2.unit import Unit
+from sc2.units import Units
+
+if TYPE_CHECKING:
+    from sc2.bot_ai import BotAI
+
+# Columns which are read from the raw units when the snapshot is created
+EAGER_COLUMNS_DTYPE = np.dtype(
+    [
+        ("type_id", np.int32),
+        ("alliance", np.int8),
+        ("display_type", np.int8),
+        ("x", np.float64),
+        ("y", np.float64),
+    ]
+)
+
+# Columns which are only read from the raw units on first access: column name -> (dtype, attribute of the raw unit)
+LAZY_COLUMNS: Dict[str, Tuple[type, Callable[[Any], Any]]] = {
+    "tag": (np.uint64, attrgetter("tag")),
+    "owner": (np.int8, attrgetter("owner")),
+    "cloak": (np.int8, attrgetter("cloak")),
+    "z": (np.float64, attrgetter("pos.z")),
+    "facing": (np.float64, attrgetter("facing")),
+    "radius": (np.float64, attrgetter("radius")),
+    "health": (np.float64, attrgetter("health")),
+    "health_max": (np.float64, attrgetter("health_max")),
+    "shield": (np.float64, attrgetter("shield")),
+    "shield_max": (np.float64, attrgetter("shield_max")),
+    "energy": (np.float64, attrgetter("energy")),
+    "energy_max": (np.float64, attrgetter("energy_max")),
+    "build_progress": (np.float64, attrgetter("build_progress")),
+    "mineral_contents": (np.int32, attrgetter("mineral_contents")),
+    "vespene_contents": (np.int32, attrgetter("vespene_contents")),
+    "is_flying": (np.bool_, attrgetter("is_flying")),
+    "is_burrowed": (np.bool_, attrgetter("is_burrowed")),
+}
+
+
+class UnitSnapshot:
+    """Columnar copy of all units of one game loop, used when 'self.use_unit_snapshot = True' is set on the bot.
+
+    Every column of EAGER_COLUMNS_DTYPE and LAZY_COLUMNS can be accessed as numpy array by its name, e.g. 'snapshot["health"]'.
+    Lazy columns are read from the raw units on first access and then reused for this game loop.
+    Row i belongs to the unit with 'distance_calculation_index == i'.
+    Unit objects are only created once they are accessed, see 'self.unit(i)' and 'self.units(indices)'.
+
+    Example::
+
+        snapshot = self.unit_snapshot
+        low_health_enemies: Units = snapshot.units(np.flatnonzero((snapshot["alliance"] == 4) & (snapshot["health"] < 50)))
+    """
+
+    def __init__(self, raw_units: Iterable[Any], bot_object: BotAI):
+        """
+        :param raw_units: units of the raw observation, blips and fake effects are stored in self.blips and self.fake_effects
+        :param bot_object:
+        """
+        self._bot_object: BotAI = bot_object
+        self.game_loop: int = bot_object.state.game_loop
+        self.blips: List[Any] = []
+        self.fake_effects: List[Any] = []
+        self._protos: List[Any] = []
+        rows: List[tuple] = []
+        for proto in raw_units:
+            if proto.is_blip:
+                self.blips.append(proto)
+                continue
+            unit_type: int = proto.unit_type
+            if unit_type in FakeEffectID:
+                self.fake_effects.append(proto)
+                continue
+            self._protos.append(proto)
+            pos = proto.pos
+            rows.append((unit_type, proto.alliance, proto.display_type, pos.x, pos.y))
+        self._unit_objects: List[Optional[Unit]] = [None] * len(self._protos)
+        eager_columns: np.ndarray = np.array(rows, dtype=EAGER_COLUMNS_DTYPE)
+        self._columns: Dict[str, np.ndarray] = {
+            name: np.ascontiguousarray(eager_columns[name])
+            for name in EAGER_COLUMNS_DTYPE.names
+        }
+        # Array of shape (n, 2) which can be used directly in scipy distance functions
+        self.positions: np.ndarray = np.column_stack((self._columns["x"], self._columns["y"]))
+
+    def __len__(self) -> int:
+        return len(self._protos)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        """ Returns a column as numpy array, e.g. snapshot["health"] """
+        values = self._columns.get(column)
+        if values is None:
+            assert column in LAZY_COLUMNS, f"Unknown column {column}"
+            dtype, getter = LAZY_COLUMNS[column]
+            values = np.fromiter((getter(proto) for proto in self._protos), dtype=dtype, count=len(self._protos))
+            self._columns[column] = values
+        return values
+
+    def unit(self, index: int) -> Unit:
+        """Returns the unit of row 'index'. The Unit object is created on first access and then reused for this game loop.
+
+        :param index:"""
+        unit_obj = self._unit_objects[index]
+        if unit_obj is None and self._bot_object.persistent_units:
+            # pylint: disable=W0212
+            unit_obj = self._bot_object._persistent_unit(self._protos[index], index, self.game_loop)
+            self._unit_objects[index] = unit_obj
+        elif unit_obj is None:
+            unit_obj = Unit(
+                self._protos[index],
+                self._bot_object,
+                distance_calculation_index=index,
+                base_build=self._bot_object.base_build,
+            )
+            # Unit objects may be created after the bot already received the next game state, e.g. in _prepare_step
+            unit_obj.game_loop = self.game_loop
+            self._unit_objects[index] = unit_obj
+        return unit_obj
+
+    def units(self, indices: Iterable[int]) -> Units:
+        """Returns a Units object of the rows in 'indices', e.g. the result of np.flatnonzero(mask).
+
+        :param indices:"""
+        if isinstance(indices, np.ndarray):
+            indices = indices.tolist()
+        return Units((self.unit(index) for index in indices), self._bot_object)
+
+    def tags(self, indices: np.ndarray) -> List[int]:
+        """ Returns the tags of the rows in 'indices' as python ints. """
+        return self["tag"][indices].tolist()
@@ -2,21 +2,37 @@
 from __future__ import annotations
 
 import random
-from itertools import chain
+import warnings
+from itertools import chain, compress
 from typing import TYPE_CHECKING, Any, Callable, Generator, Iterable, List, Optional, Set, Tuple, Union
 
+import numpy as np
+
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.position import Point2
 from sc2.unit import Unit
+from sc2.unit_damage import DamageAttackers, DamageTargets, damage_matrix, dps_matrix
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from scipy.spatial import cKDTree
 
 if TYPE_CHECKING:
     from sc2.bot_ai import BotAI
 
+# Distance functions of Units objects with at least this many units use the positions array and spatial index of the bot
+SPATIAL_INDEX_MIN_UNITS = 30
+
 
 # pylint: disable=R0904
 class Units(list):
     """A collection of Unit objects. Makes it easy to select units by selectors."""
 
+    # Distance calculation indices of the units, see self._distance_calculation_indices
+    _cached_indices: Optional[np.ndarray] = None
+    # Game loop, length and last unit of the list when the indices were collected, they are collected again if one differs
+    _cached_indices_key: Optional[Tuple[int, int, Unit]] = None
+
     @classmethod
     def from_proto(cls, units, bot_object: BotAI):
         # pylint: disable=E1120
@@ -174,6 +190,20 @@ class Units(list):
         :param unit:
         :param bonus_distance:
         """
+        indices = self._spatial_index_indices()
+        if indices is not None and self:
+            # Only check the units which are in range of the largest possible attack range
+            max_distance = (
+                max(unit.ground_range, unit.air_range) + unit.radius + max(target.radius for target in self) +
+                bonus_distance
+            )
+            candidates = self._bot_object._spatial_index.query_ball_point(
+                self._position_tuple(unit), max_distance + 1e-6
+            )
+            return self.subgroup(
+                target for target in compress(self, np.isin(indices, candidates))
+                if unit.target_in_range(target, bonus_distance=bonus_distance)
+            )
         return self.filter(lambda x: unit.target_in_range(x, bonus_distance=bonus_distance))
 
     def closest_distance_to(self, position: Union[Unit, Point2]) -> float:
@@ -190,6 +220,9 @@ class Units(list):
         :param position:
         """
         assert self, "Units object is empty"
+        indices = self._spatial_index_indices()
+        if indices is not None:
+            return float(self._distances_squared_to(indices, position).min())**0.5
         if isinstance(position, Unit):
             return min(self._bot_object._distance_squared_unit_to_unit(unit, position) for unit in self)**0.5
         return min(self._bot_object._distance_units_to_pos(self, position))
@@ -209,6 +242,9 @@ class Units(list):
         :param position:
         """
         assert self, "Units object is empty"
+        indices = self._spatial_index_indices()
+        if indices is not None:
+            return float(self._distances_squared_to(indices, position).max())**0.5
         if isinstance(position, Unit):
             return max(self._bot_object._distance_squared_unit_to_unit(unit, position) for unit in self)**0.5
         return max(self._bot_object._distance_units_to_pos(self, position))
@@ -227,6 +263,9 @@ class Units(list):
         :param position:
         """
         assert self, "Units object is empty"
+        indices = self._spatial_index_indices()
+        if indices is not None:
+            return self[int(np.argmin(self._distances_squared_to(indices, position)))]
         if isinstance(position, Unit):
             return min(
                 (unit1 for unit1 in self),
@@ -250,6 +289,9 @@ class Units(list):
         :param position:
         """
         assert self, "Units object is empty"
+        indices = self._spatial_index_indices()
+        if indices is not None:
+            return self[int(np.argmax(self._distances_squared_to(indices, position)))]
         if isinstance(position, Unit):
             return max(
                 (unit1 for unit1 in self),
@@ -274,6 +316,14 @@ class Units(list):
         """
         if not self:
             return self
+        indices = self._spatial_index_indices()
+        if indices is not None:
+            # Candidates from the spatial index include units at exactly 'distance'
+            mask = np.isin(
+                indices, self._bot_object._spatial_index.query_ball_point(self._position_tuple(position), distance)
+            )
+            mask[mask] = self._distances_squared_to(indices[mask], position) < distance**2
+            return self._masked_subgroup(mask, indices)
         if isinstance(position, Unit):
             distance_squared = distance**2
             return self.subgroup(
@@ -299,6 +349,9 @@ class Units(list):
         """
         if not self:
             return self
+        indices = self._spatial_index_indices()
+        if indices is not None:
+            return self._masked_subgroup(distance**2 < self._distances_squared_to(indices, position), indices)
         if isinstance(position, Unit):
             distance_squared = distance**2
             return self.subgroup(
@@ -327,6 +380,12 @@ class Units(list):
         """
         if not self:
             return self
+        indices = self._spatial_index_indices()
+        if indices is not None:
+            distances_squared = self._distances_squared_to(indices, position)
+            return self._masked_subgroup(
+                (distance1**2 < distances_squared) & (distances_squared < distance2**2), indices
+            )
         if isinstance(position, Unit):
             distance1_squared = distance1**2
             distance2_squared = distance2**2
@@ -353,6 +412,11 @@ class Units(list):
         """
         if not self:
             return self
+        indices = self._spatial_index_indices()
+        if indices is not None and 0 < n < len(self):
+            return self.subgroup(
+                self[i] for i in self._n_smallest_indices(self._distances_squared_to(indices, position), n)
+            )
         return self.subgroup(self._list_sorted_by_distance_to(position)[:n])
 
     def furthest_n_units(self, position: Union[Unit, Point2], n: int) -> Units:
@@ -371,6 +435,11 @@ class Units(list):
         """
         if not self:
             return self
+        indices = self._spatial_index_indices()
+        if indices is not None and 0 < n < len(self):
+            return self.subgroup(
+                self[i] for i in self._n_largest_indices(self._distances_squared_to(indices, position), n)
+            )
         return self.subgroup(self._list_sorted_by_distance_to(position)[-n:])
 
     def in_distance_of_group(self, other_units: Units, distance: float) -> Units:
@@ -392,6 +461,11 @@ class Units(list):
                 return self
             return self.subgroup([])
 
+        if len(self) >= SPATIAL_INDEX_MIN_UNITS or len(other_units) >= SPATIAL_INDEX_MIN_UNITS:
+            closest_distances = self._closest_distances_to_group(other_units, distance_upper_bound=distance)
+            if closest_distances is not None:
+                return self.subgroup(compress(self, closest_distances < distance))
+
         return self.subgroup(
             self_unit for self_unit in self if any(
                 self._bot_object._distance_squared_unit_to_unit(self_unit, other_unit) < distance_squared
@@ -408,6 +482,10 @@ class Units(list):
         """
         assert self, "Units object is empty"
         assert other_units, "Given units object is empty"
+        if len(self) >= SPATIAL_INDEX_MIN_UNITS or len(other_units) >= SPATIAL_INDEX_MIN_UNITS:
+            closest_distances = self._closest_distances_to_group(other_units)
+            if closest_distances is not None:
+                return self[int(np.argmin(closest_distances))]
         return min(
             self,
             key=lambda self_unit:
@@ -420,6 +498,14 @@ class Units(list):
         :param position:
         :param distance:
         """
+        indices = self._spatial_index_indices()
+        if indices is not None:
+            distances = self._distances_squared_to(indices, position)
+            # Same keys as below: squared distances for units, distances for positions
+            if not isinstance(position, Unit):
+                distances = np.sqrt(distances)
+            # Stable sort in descending order, same as sorted(reverse=True)
+            return [self[i] for i in np.argsort(-np.abs(distances - distance), kind="stable")]
         if isinstance(position, Unit):
             return sorted(
                 self,
@@ -448,6 +534,155 @@ class Units(list):
         """
         return self.subgroup(self._list_sorted_closest_to_distance(position=position, distance=distance)[-n:])
 
+    def _spatial_index_indices(self) -> Optional[np.ndarray]:
+        """Returns the distance calculation indices of the units if this Units object is large enough to use the positions array and spatial index of the bot.
+        Returns None if the Units object is small or contains units that are not from this frame."""
+        if len(self) < SPATIAL_INDEX_MIN_UNITS:
+            return None
+        return self._distance_calculation_indices()
+
+    def _distance_calculation_indices(self) -> Optional[np.ndarray]:
+        """Returns the distance calculation indices of the units, see BotAI._distance_calculation_indices.
+        Cached until the next frame or until units are added or removed at the end of the list,
+        so repeated queries on a group only collect them once. Units objects are not reordered in place by this library.
+        """
+        key = (self._bot_object.state.game_loop, len(self), self[-1] if self else None)
+        if self._cached_indices_key != key:
+            self._cached_indices = self._bot_object._distance_calculation_indices(self)
+            self._cached_indices_key = key
+        return self._cached_indices
+
+    def _masked_subgroup(self, mask: np.ndarray, indices: np.ndarray) -> Units:
+        """Returns the units where 'mask' is True as new Units object, which already knows their distance calculation indices.
+
+        :param mask:
+        :param indices: Distance calculation indices of all units of self"""
+        units = self.subgroup(compress(self, mask))
+        units._cached_indices = indices[mask]
+        units._cached_indices_key = (self._bot_object.state.game_loop, len(units), units[-1] if units else None)
+        return units
+
+    @staticmethod
+    def _position_tuple(position: Union[Unit, Point2, Tuple[float, float]]) -> Tuple[float, float]:
+        if isinstance(position, Unit):
+            return position.position_tuple
+        return position[0], position[1]
+
+    def _distances_squared_to(self, indices: np.ndarray, position: Union[Unit, Point2]) -> np.ndarray:
+        """Returns the squared distances between the units at 'indices' of the positions array and the position.
+
+        :param indices:
+        :param position:
+        """
+        differences = self._bot_object._unit_positions[indices] - self._position_tuple(position)
+        return np.einsum("ij,ij->i", differences, differences)
+
+    @staticmethod
+    def _n_smallest_indices(values: np.ndarray, n: int) -> List[int]:
+        """Returns the indices of the n smallest values in ascending order of the values.
+        Equal values are ordered by index, the result is the same as the first n elements of a stable sort.
+
+        :param values:
+        :param n:
+        """
+        threshold = np.partition(values, n - 1)[n - 1]
+        smaller = np.flatnonzero(values < threshold)
+        equal = np.flatnonzero(values == threshold)[:n - len(smaller)]
+        selected = np.concatenate((smaller, equal))
+        selected.sort()
+        return selected[np.argsort(values[selected], kind="stable")].tolist()
+
+    @staticmethod
+    def _n_largest_indices(values: np.ndarray, n: int) -> List[int]:
+        """Returns the indices of the n largest values in ascending order of the values.
+        Equal values are ordered by index, the result is the same as the last n elements of a stable sort.
+
+        :param values:
+        :param n:
+        """
+        threshold = np.partition(values, len(values) - n)[len(values) - n]
+        larger = np.flatnonzero(values > threshold)
+        equal = np.flatnonzero(values == threshold)
+        selected = np.concatenate((equal[len(equal) - (n - len(larger)):], larger))
+        selected.sort()
+        return selected[np.argsort(values[selected], kind="stable")].tolist()
+
+    def _closest_distances_to_group(self,
+                                    other_units: Units,
+                                    distance_upper_bound: float = np.inf) -> Optional[np.ndarray]:
+        """For each unit in self, returns the distance to the closest unit of 'other_units' using a KD-tree, or None if one of the units is not from this frame.
+        Distances larger than 'distance_upper_bound' are returned as infinity.
+
+        :param other_units:
+        :param distance_upper_bound:
+        """
+        indices = self._distance_calculation_indices()
+        other_indices = (
+            other_units._distance_calculation_indices() if isinstance(other_units, Units) else
+            self._bot_object._distance_calculation_indices(other_units)
+        )
+        if indices is None or other_indices is None:
+            return None
+        positions: np.ndarray = self._bot_object._unit_positions
+        closest_distances, _ = cKDTree(positions[other_indices]).query(
+            positions[indices], distance_upper_bound=distance_upper_bound
+        )
+        return closest_distances
+
+    def damage_matrix(
+        self,
+        other: Units,
+        ignore_armor: bool = False,
+        include_overkill_damage: bool = True,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the damage per full attack, attack speed and attack range of each unit against each unit of 'other'
+        as arrays of shape (len(self), len(other)). Entry [i, j] is the same as 'self[i].calculate_damage_vs_target(other[j])',
+        but all pairs are calculated at once, see sc2.unit_damage.damage_matrix.
+
+        Example::
+
+            damage, attack_speed, attack_range = self.units.damage_matrix(self.enemy_units)
+            # Enemy that each of our units deals the most damage to
+            best_targets = [self.enemy_units[j] for j in damage.argmax(axis=1)]
+
+        :param other:
+        :param ignore_armor:
+        :param include_overkill_damage:
+        """
+        return damage_matrix(
+            DamageAttackers.from_units(self),
+            DamageTargets.from_units(other),
+            self._bot_object.game_data,
+            ignore_armor,
+            include_overkill_damage,
+        )
+
+    def dps_matrix(
+        self,
+        other: Units,
+        ignore_armor: bool = False,
+        include_overkill_damage: bool = True,
+    ) -> np.ndarray:
+        """Returns the DPS of each unit against each unit of 'other' as array of shape (len(self), len(other)).
+        Entry [i, j] is the same as 'self[i].calculate_dps_vs_target(other[j])'.
+
+        Example::
+
+            # Total DPS of our army against each enemy
+            dps_against_enemies = self.units.dps_matrix(self.enemy_units).sum(axis=0)
+
+        :param other:
+        :param ignore_armor:
+        :param include_overkill_damage:
+        """
+        return dps_matrix(
+            DamageAttackers.from_units(self),
+            DamageTargets.from_units(other),
+            self._bot_object.game_data,
+            ignore_armor,
+            include_overkill_damage,
+        )
+
     def subgroup(self, units: Iterable[Unit]) -> Units:
         """Creates a new mutable Units object from Units or list object.
 
@@ -487,6 +722,12 @@ class Units(list):
         :param position:
         :param reverse:
         """
+        indices = self._spatial_index_indices()
+        if indices is not None:
+            distances_squared = self._distances_squared_to(indices, position)
+            # Stable sort, same as sorted(reverse=reverse)
+            order = np.argsort(-distances_squared if reverse else distances_squared, kind="stable")
+            return [self[i] for i in order]
         if isinstance(position, Unit):
             return sorted(
                 self, key=lambda unit: self._bot_object._distance_squared_unit_to_unit(unit, position), reverse=reverse
@@ -541,11 +782,8 @@ class Units(list):
 
         :param other:
         """
-        if isinstance(other, UnitTypeId):
-            other = {other}
-        elif isinstance(other, list):
-            other = set(other)
-        return self.filter(lambda unit: unit.type_id in other)
+        unit_types: Set[int] = self._unit_type_values(other)
+        return self.subgroup(unit for unit in self if unit._proto.unit_type in unit_types)
 
     def exclude_type(self, other: Union[UnitTypeId, Iterable[UnitTypeId]]) -> Units:
         """Filters all units that are not of a specific type
@@ -557,11 +795,17 @@ class Units(list):
 
         :param other:
         """
-        if isinstance(other, UnitTypeId):
-            other = {other}
-        elif isinstance(other, list):
-            other = set(other)
-        return self.filter(lambda unit: unit.type_id not in other)
+        unit_types: Set[int] = self._unit_type_values(other)
+        return self.subgroup(unit for unit in self if unit._proto.unit_type not in unit_types)
+
+    @staticmethod
+    def _unit_type_values(unit_types: Union[UnitTypeId, Iterable[UnitTypeId]]) -> Set[int]:
+        """Returns the ids of the unit types, so they can be compared to the raw unit type without creating a UnitTypeId per unit.
+
+        :param unit_types:"""
+        if isinstance(unit_types, UnitTypeId):
+            return {unit_types.value}
+        return {unit_type.value for unit_type in unit_types if isinstance(unit_type, UnitTypeId)}
 
     def same_tech(self, other: Set[UnitTypeId]) -> Units:
         """Returns all structures that have the same base structure.
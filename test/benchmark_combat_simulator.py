@@ -0,0 +1,47 @@
+from test.test_pickled_data import MAPS, get_map_specific_bot
+
+import pytest
+
+from sc2.combat_simulator import FightArmy, UnitTypeVitals, simulate_fight
+from sc2.ids.unit_typeid import UnitTypeId
+
+VITALS = {
+    UnitTypeId.MARINE: UnitTypeVitals(45),
+    UnitTypeId.MARAUDER: UnitTypeVitals(125),
+    UnitTypeId.MEDIVAC: UnitTypeVitals(150, is_flying=True),
+    UnitTypeId.ZERGLING: UnitTypeVitals(35),
+    UnitTypeId.ROACH: UnitTypeVitals(145),
+    UnitTypeId.MUTALISK: UnitTypeVitals(120, is_flying=True),
+}
+
+
+def _create_armies(size: int):
+    game_data = get_map_specific_bot(MAPS[0]).game_data
+    army = FightArmy.from_unit_types(
+        {
+            UnitTypeId.MARINE: size // 2,
+            UnitTypeId.MARAUDER: size // 4,
+            UnitTypeId.MEDIVAC: size // 4
+        }, VITALS, game_data
+    )
+    enemy_army = FightArmy.from_unit_types(
+        {
+            UnitTypeId.ZERGLING: size // 2,
+            UnitTypeId.ROACH: size // 4,
+            UnitTypeId.MUTALISK: size // 4
+        },
+        VITALS,
+        game_data,
+        is_mine=False,
+    )
+    return army, enemy_army, game_data
+
+
+@pytest.mark.parametrize("size", [8, 40])
+def test_bench_simulate_fight(benchmark, size):
+    army, enemy_army, game_data = _create_armies(size)
+    _result = benchmark(simulate_fight, army, enemy_army, game_data, 6)
+
+
+# Run this file using
+# poetry run pytest test/benchmark_combat_simulator.py --benchmark-compare
@@ -0,0 +1,56 @@
+import itertools
+from test.test_pickled_data import MAPS, get_map_specific_bot
+
+import pytest
+from s2clientprotocol import raw_pb2 as raw_pb
+
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.unit import Unit
+from sc2.units import Units
+
+ARMY_TYPES = [UnitTypeId.MARINE, UnitTypeId.MARAUDER, UnitTypeId.SIEGETANK, UnitTypeId.VIKINGFIGHTER]
+ENEMY_ARMY_TYPES = [UnitTypeId.ZERGLING, UnitTypeId.ROACH, UnitTypeId.HYDRALISK, UnitTypeId.MUTALISK]
+
+
+def _create_armies(size: int):
+    bot = get_map_specific_bot(MAPS[0])
+    template = bot.workers.first._proto
+    tags = itertools.count(1)
+
+    def create_army(unit_types, alliance: int) -> Units:
+        units = Units([], bot)
+        for unit_type in itertools.islice(itertools.cycle(unit_types), size):
+            proto = raw_pb.Unit()
+            proto.CopyFrom(template)
+            proto.tag = next(tags)
+            proto.unit_type = unit_type.value
+            proto.alliance = alliance
+            proto.is_flying = unit_type in {UnitTypeId.VIKINGFIGHTER, UnitTypeId.MUTALISK}
+            units.append(Unit(proto, bot))
+        return units
+
+    return create_army(ARMY_TYPES, 1), create_army(ENEMY_ARMY_TYPES, 4)
+
+
+def _dps_python(army: Units, enemy_army: Units):
+    return [[unit.calculate_dps_vs_target(enemy) for enemy in enemy_army] for unit in army]
+
+
+def _dps_matrix(army: Units, enemy_army: Units):
+    return army.dps_matrix(enemy_army)
+
+
+@pytest.mark.parametrize("size", [10, 80])
+def test_bench_dps_python(benchmark, size):
+    army, enemy_army = _create_armies(size)
+    _result = benchmark(_dps_python, army, enemy_army)
+
+
+@pytest.mark.parametrize("size", [10, 80])
+def test_bench_dps_matrix(benchmark, size):
+    army, enemy_army = _create_armies(size)
+    _result = benchmark(_dps_matrix, army, enemy_army)
+
+
+# Run this file using
+# poetry run pytest test/benchmark_damage_matrix.py --benchmark-compare
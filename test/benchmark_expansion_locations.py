@@ -0,0 +1,31 @@
+from test.test_pickled_data import MAPS, get_map_specific_bot
+from test.test_pickled_ramp import find_expansion_locations_reference
+from typing import List
+
+from sc2.bot_ai import BotAI
+
+
+def _find_expansion_locations(bots: List[BotAI]):
+    for bot in bots:
+        bot._expansion_positions_list.clear()
+        bot._resource_location_to_expansion_position_dict.clear()
+        bot._find_expansion_locations()
+
+
+def _find_expansion_locations_reference(bots: List[BotAI]):
+    for bot in bots:
+        find_expansion_locations_reference(bot)
+
+
+def test_bench_find_expansion_locations(benchmark):
+    bots = [get_map_specific_bot(map_) for map_ in MAPS]
+    _result = benchmark(_find_expansion_locations, bots)
+
+
+def test_bench_find_expansion_locations_pairwise_merge(benchmark):
+    bots = [get_map_specific_bot(map_) for map_ in MAPS]
+    _result = benchmark.pedantic(_find_expansion_locations_reference, args=(bots, ), rounds=3)
+
+
+# Run this file using
+# poetry run pytest test/benchmark_expansion_locations.py --benchmark-compare
@@ -0,0 +1,39 @@
+from test.test_pickled_data import MAPS, build_bot_object_from_pickle_data, load_map_pickle_data
+from typing import Any, List, Tuple
+
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2.bot_ai import BotAI
+from sc2.game_state import GameState
+
+
+def _get_bot_and_data(map_, pathing_grid_update_method: int) -> Tuple[BotAI, Any, bytes]:
+    raw_game_data, raw_game_info, raw_observation = load_map_pickle_data(map_)
+    bot_object = BotAI()
+    bot_object.pathing_grid_update_method = pathing_grid_update_method
+    bot_object = build_bot_object_from_pickle_data(raw_game_data, raw_game_info, raw_observation, bot=bot_object)
+    # The serialized game info is parsed again in each step, like a response received from the websocket
+    return bot_object, raw_observation, raw_game_info.SerializeToString()
+
+
+def _run_prepare_step(bots_and_data: List[Tuple[BotAI, Any, bytes]]):
+    for bot_object, raw_observation, serialized_game_info in bots_and_data:
+        proto_game_info = None
+        if bot_object._should_request_game_info(bot_object.state.game_loop):
+            proto_game_info = sc_pb.Response()
+            proto_game_info.ParseFromString(serialized_game_info)
+        bot_object._prepare_step(GameState(raw_observation), proto_game_info)
+
+
+def test_bench_prepare_step_request_game_info(benchmark):
+    bots_and_data = [_get_bot_and_data(map_, 0) for map_ in MAPS]
+    _result = benchmark(_run_prepare_step, bots_and_data)
+
+
+def test_bench_prepare_step_footprints(benchmark):
+    bots_and_data = [_get_bot_and_data(map_, 2) for map_ in MAPS]
+    _result = benchmark(_run_prepare_step, bots_and_data)
+
+
+# Run this file using
+# poetry run pytest test/benchmark_prepare_step.py --benchmark-compare
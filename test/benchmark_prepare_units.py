@@ -1,19 +1,86 @@
-from test.test_pickled_data import MAPS, get_map_specific_bot
-from typing import TYPE_CHECKING, List
+from test.test_pickled_data import MAPS, build_bot_object_from_pickle_data, get_map_specific_bot, load_map_pickle_data
+from typing import List
 
-if TYPE_CHECKING:
-    from sc2.bot_ai import BotAI
+from sc2.bot_ai import BotAI
 
 
-def _run_prepare_units(bot_objects: List["BotAI"]):
+def _run_prepare_units(bot_objects: List[BotAI]):
     for bot_object in bot_objects:
         bot_object._prepare_units()
 
 
+def _get_unit_snapshot_bot(map_) -> BotAI:
+    bot_object = BotAI()
+    bot_object.use_unit_snapshot = True
+    return build_bot_object_from_pickle_data(*load_map_pickle_data(map_), bot=bot_object)
+
+
+def _get_persistent_units_bot(map_) -> BotAI:
+    bot_object = BotAI()
+    bot_object.persistent_units = True
+    return build_bot_object_from_pickle_data(*load_map_pickle_data(map_), bot=bot_object)
+
+
+def _get_distance_method_bot(map_, distance_calculation_method: int) -> BotAI:
+    bot_object = BotAI()
+    bot_object.distance_calculation_method = distance_calculation_method
+    return build_bot_object_from_pickle_data(*load_map_pickle_data(map_), bot=bot_object)
+
+
+def _run_prepare_units_and_distances(bot_objects: List[BotAI]):
+    # Only the distances to the own townhall are requested, like a bot in the early game
+    for bot_object in bot_objects:
+        bot_object._prepare_units()
+        # Enforce recalculation of the distance matrix
+        bot_object._generated_frame = -1
+        bot_object._prepare_distances()
+        for townhall in bot_object.townhalls:
+            _ = bot_object.units.closer_than(10, townhall)
+            _ = bot_object.mineral_field.closer_than(10, townhall)
+
+
+def _run_prepare_units_and_type_properties(bot_objects: List[BotAI]):
+    # Properties that only depend on the unit type, like a bot that evaluates fights every step
+    for bot_object in bot_objects:
+        bot_object._prepare_units()
+        for unit in bot_object.all_units:
+            _ = unit.ground_range, unit.air_range, unit.ground_dps, unit.is_structure
+
+
 def test_bench_prepare_units(benchmark):
     bot_objects = [get_map_specific_bot(map_) for map_ in MAPS]
     _result = benchmark(_run_prepare_units, bot_objects)
 
 
+def test_bench_prepare_units_snapshot(benchmark):
+    bot_objects = [_get_unit_snapshot_bot(map_) for map_ in MAPS]
+    _result = benchmark(_run_prepare_units, bot_objects)
+
+
+def test_bench_prepare_units_persistent(benchmark):
+    bot_objects = [_get_persistent_units_bot(map_) for map_ in MAPS]
+    _result = benchmark(_run_prepare_units, bot_objects)
+
+
+def test_bench_prepare_units_type_properties(benchmark):
+    bot_objects = [get_map_specific_bot(map_) for map_ in MAPS]
+    _result = benchmark(_run_prepare_units_and_type_properties, bot_objects)
+
+
+def test_bench_prepare_units_type_properties_persistent(benchmark):
+    bot_objects = [_get_persistent_units_bot(map_) for map_ in MAPS]
+    _result = benchmark(_run_prepare_units_and_type_properties, bot_objects)
+
+
+def test_bench_prepare_units_distance_matrix(benchmark):
+    bot_objects = [_get_distance_method_bot(map_, 2) for map_ in MAPS]
+    _result = benchmark(_run_prepare_units_and_distances, bot_objects)
+
+
+def test_bench_prepare_units_lazy_distance_rows(benchmark):
+    bot_objects = [_get_distance_method_bot(map_, 5) for map_ in MAPS]
+    _result = benchmark(_run_prepare_units_and_distances, bot_objects)
+
+
 # Run this file using
 # poetry run pytest test/benchmark_prepare_units.py --benchmark-compare
@@ -0,0 +1,41 @@
+import asyncio
+from pathlib import Path
+from test.test_pickled_data import MAPS
+from test.test_stand_in_server import StepCountingBot
+
+import pytest
+from loguru import logger
+
+from sc2.data import Race, Result
+from sc2.main import play_from_websocket, replay_capture
+from sc2.player import Bot
+from sc2.stand_in_server import StandInServer
+
+
+@pytest.fixture(scope="module")
+def capture_path(tmp_path_factory) -> Path:
+    path = tmp_path_factory.mktemp("capture") / "game.sc2capture"
+
+    async def capture():
+        async with StandInServer.from_pickle(MAPS[0], game_loops=400) as server:
+            await play_from_websocket(server.ws_url, Bot(Race.Terran, StepCountingBot()), capture_as=path)
+
+    asyncio.run(capture())
+    return path
+
+
+def _replay_capture(path: Path) -> Result:
+    logger.disable("sc2")
+    try:
+        return replay_capture(StepCountingBot(), path)
+    finally:
+        logger.enable("sc2")
+
+
+def test_bench_replay_capture(benchmark, capture_path: Path):
+    result = benchmark.pedantic(_replay_capture, args=(capture_path, ), rounds=3)
+    assert result == Result.Victory
+
+
+# Run this file using
+# poetry run pytest test/benchmark_replay_capture.py --benchmark-compare
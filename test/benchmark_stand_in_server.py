@@ -0,0 +1,39 @@
+import asyncio
+from test.test_pickled_data import MAPS
+from test.test_stand_in_server import StepCountingBot
+
+from loguru import logger
+
+from sc2.data import Race, Result
+from sc2.main import play_from_websocket
+from sc2.player import Bot
+from sc2.stand_in_server import StandInServer
+
+
+def _play_game(pipeline_requests: bool) -> Result:
+
+    async def run():
+        bot = StepCountingBot()
+        bot.pipeline_requests = pipeline_requests
+        async with StandInServer.from_pickle(MAPS[0], game_loops=400) as server:
+            return await play_from_websocket(server.ws_url, Bot(Race.Terran, bot))
+
+    logger.disable("sc2")
+    try:
+        return asyncio.run(run())
+    finally:
+        logger.enable("sc2")
+
+
+def test_bench_play_game(benchmark):
+    result = benchmark.pedantic(_play_game, args=(False, ), rounds=3)
+    assert result == Result.Victory
+
+
+def test_bench_play_game_pipelined(benchmark):
+    result = benchmark.pedantic(_play_game, args=(True, ), rounds=3)
+    assert result == Result.Victory
+
+
+# Run this file using
+# poetry run pytest test/benchmark_stand_in_server.py --benchmark-compare
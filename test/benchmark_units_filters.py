@@ -0,0 +1,54 @@
+from test.test_pickled_data import MAPS, get_map_specific_bot
+from typing import List
+
+from sc2.bot_ai import BotAI
+
+
+def _run_group_distance_functions(bot_objects: List[BotAI]):
+    for bot_object in bot_objects:
+        all_units = bot_object.all_units
+        mineral_fields = bot_object.mineral_field
+        center = bot_object.game_info.map_center
+        _ = all_units.closer_than(10, center)
+        _ = all_units.closest_to(center)
+        _ = all_units.in_distance_of_group(mineral_fields, 5)
+        _ = mineral_fields.in_closest_distance_to_group(bot_object.destructables or bot_object.townhalls)
+        for worker in bot_object.workers[:3]:
+            _ = all_units.in_attack_range_of(worker)
+
+
+def _run_filters(bot_objects: List[BotAI]):
+    for bot_object in bot_objects:
+        all_units = bot_object.all_units
+        center = bot_object.game_info.map_center
+        _ = all_units.further_than(20, center)
+        _ = all_units.in_distance_between(center, 10, 30)
+        _ = all_units.closest_n_units(center, 10)
+        _ = all_units.sorted_by_distance_to(center)
+        _ = all_units.n_closest_to_distance(center, 15, 10)
+
+
+def test_bench_group_distance_functions_spatial_index(benchmark):
+    bot_objects = [get_map_specific_bot(map_) for map_ in MAPS]
+    _result = benchmark(_run_group_distance_functions, bot_objects)
+
+
+def test_bench_group_distance_functions_python(benchmark, monkeypatch):
+    monkeypatch.setattr("sc2.units.SPATIAL_INDEX_MIN_UNITS", 10**9)
+    bot_objects = [get_map_specific_bot(map_) for map_ in MAPS]
+    _result = benchmark(_run_group_distance_functions, bot_objects)
+
+
+def test_bench_filters_vectorized(benchmark):
+    bot_objects = [get_map_specific_bot(map_) for map_ in MAPS]
+    _result = benchmark(_run_filters, bot_objects)
+
+
+def test_bench_filters_python(benchmark, monkeypatch):
+    monkeypatch.setattr("sc2.units.SPATIAL_INDEX_MIN_UNITS", 10**9)
+    bot_objects = [get_map_specific_bot(map_) for map_ in MAPS]
+    _result = benchmark(_run_filters, bot_objects)
+
+
+# Run this file using
+# poetry run pytest test/benchmark_units_filters.py --benchmark-compare
@@ -0,0 +1,59 @@
+import asyncio
+from test.test_pickled_data import MAPS, get_map_specific_bot
+
+import numpy as np
+
+from sc2.bot_executor import BotExecutor, SharedSnapshot
+from sc2.shared_memory import SharedArrayHandle
+
+
+def count_pathable(handle: SharedArrayHandle) -> int:
+    with handle.open() as pathing_grid:
+        return int(pathing_grid.sum())
+
+
+def closest_unit_tag(snapshot: SharedSnapshot, x: float, y: float) -> int:
+    with snapshot.unit_positions.open() as positions, snapshot.unit_tags.open() as tags:
+        distances = ((positions - (x, y))**2).sum(axis=1)
+        return int(tags[distances.argmin()])
+
+
+def test_bot_executor():
+    executor = BotExecutor(max_workers=1)
+
+    async def run():
+        executor.start()
+        array = np.arange(12, dtype=np.uint8).reshape(3, 4) % 2
+        handle = executor.share("grid", array)
+        assert await executor.submit(count_pathable, handle) == 6
+        # Sharing an array with the same shape and dtype updates the block in place
+        assert executor.share("grid", np.ones_like(array)) == handle
+        assert await executor.submit(count_pathable, handle) == 12
+        assert executor.share("grid", np.ones((4, 4), dtype=np.uint8)) != handle
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
+    assert not executor.is_running
+
+
+def test_bot_ai_run_in_executor():
+    bot = get_map_specific_bot(MAPS[0])
+    bot.executor = BotExecutor(max_workers=1)
+
+    async def run():
+        bot.executor.start()
+        snapshot = bot.share_snapshot()
+        assert snapshot.game_loop == bot.state.game_loop
+        assert snapshot.pathing_grid.shape == bot.game_info.pathing_grid.data_numpy.shape
+        assert await bot.run_in_executor(count_pathable, snapshot.pathing_grid) == int(
+            bot.game_info.pathing_grid.data_numpy.sum()
+        )
+        townhall = bot.townhalls.random
+        assert await bot.run_in_executor(closest_unit_tag, snapshot, *townhall.position) == townhall.tag
+
+    try:
+        asyncio.run(run())
+    finally:
+        bot._release_resources()
@@ -0,0 +1,56 @@
+import asyncio
+from pathlib import Path
+from test.test_pickled_data import MAPS
+from test.test_stand_in_server import StepCountingBot
+
+from sc2.capture import read_capture
+from sc2.data import Race, Result
+from sc2.main import a_replay_capture, play_from_websocket
+from sc2.player import Bot
+from sc2.stand_in_server import StandInServer
+
+
+class IdleBot(StepCountingBot):
+    """ Sends no actions and an extra query each step, which were not recorded. """
+
+    async def on_step(self, iteration: int):
+        self.game_loops.append(self.state.game_loop)
+        if self.townhalls:
+            await self.get_available_abilities(self.townhalls)
+
+
+def test_capture_and_replay(tmp_path: Path):
+    capture_path = tmp_path / "game.sc2capture"
+    bot = StepCountingBot()
+
+    async def capture():
+        async with StandInServer.from_pickle(MAPS[0], game_loops=200) as server:
+            return await play_from_websocket(server.ws_url, Bot(Race.Terran, bot), capture_as=capture_path)
+
+    assert asyncio.run(capture()) == Result.Victory
+    records = list(read_capture(capture_path))
+    requests = [record.parse() for record in records if record.is_request]
+    assert len(requests) == len(records) - len(requests)
+    assert requests[0].HasField("join_game")
+    assert sum(request.HasField("step") for request in requests) == 50
+    assert all(a.timestamp_ns <= b.timestamp_ns for a, b in zip(records, records[1:]))
+
+    # The same bot sees the same game loops
+    replayed_bot = StepCountingBot()
+    assert asyncio.run(a_replay_capture(replayed_bot, capture_path)) == Result.Victory
+    assert replayed_bot.game_loops == bot.game_loops
+    assert replayed_bot.result == Result.Victory
+
+    # A bot that sends other requests still sees every recorded step
+    idle_bot = IdleBot()
+    assert asyncio.run(a_replay_capture(idle_bot, capture_path)) == Result.Victory
+    assert idle_bot.game_loops == bot.game_loops
+    assert idle_bot.client._ws.unmatched_requests == 50
+
+    # A capture that was cut off ends the replay without a result
+    truncated_path = tmp_path / "truncated.sc2capture"
+    with open(capture_path, "rb") as f, open(truncated_path, "wb") as truncated:
+        truncated.write(f.read()[:len(capture_path.read_bytes()) // 2])
+    truncated_bot = StepCountingBot()
+    assert asyncio.run(a_replay_capture(truncated_bot, truncated_path)) is None
+    assert 0 < len(truncated_bot.game_loops) < 50
@@ -0,0 +1,116 @@
+import itertools
+from test.test_pickled_data import MAPS, get_map_specific_bot
+from test.test_unit_damage import _create_unit
+
+import numpy as np
+
+from sc2.cache import CacheDict
+from sc2.combat_simulator import FightArmy, UnitTypeVitals, simulate_fight
+from sc2.data import Result
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.unit import Unit
+from sc2.units import Units
+
+VITALS = {
+    UnitTypeId.MARINE: UnitTypeVitals(45),
+    UnitTypeId.ZERGLING: UnitTypeVitals(35),
+    UnitTypeId.ZEALOT: UnitTypeVitals(100, 50),
+    UnitTypeId.MUTALISK: UnitTypeVitals(120, is_flying=True),
+    UnitTypeId.VIKINGFIGHTER: UnitTypeVitals(135, is_flying=True),
+}
+
+
+def test_simulate_fight():
+    bot = get_map_specific_bot(MAPS[0])
+    game_data = bot.game_data
+
+    def army(unit_types, **kwargs) -> FightArmy:
+        return FightArmy.from_unit_types(unit_types, VITALS, game_data, **kwargs)
+
+    marines = army({UnitTypeId.MARINE: 10})
+    enemy_marines = army({UnitTypeId.MARINE: 10}, is_mine=False)
+
+    # Equal armies kill each other
+    result = simulate_fight(marines, enemy_marines, game_data)
+    assert result.outcome == Result.Tie
+    assert result.army_value == result.enemy_army_value == 0
+    assert not result.army_survivors.any() and not result.enemy_army_survivors.any()
+
+    # Upgrades and numbers decide the fight
+    result = simulate_fight(army({UnitTypeId.MARINE: 10}, attack_upgrade_level=1), enemy_marines, game_data)
+    assert result.outcome == Result.Victory
+    result = simulate_fight(army({UnitTypeId.MARINE: 5}), enemy_marines, game_data)
+    assert result.outcome == Result.Defeat
+    assert result.army_value == 0
+    assert result.enemy_army_value == 50 * np.count_nonzero(result.enemy_army_survivors) > 0
+
+    # Shields are damaged before health
+    result = simulate_fight(army({UnitTypeId.ZEALOT: 1}), army({UnitTypeId.ZERGLING: 2}, is_mine=False), game_data)
+    assert result.outcome == Result.Victory
+    assert result.army_value == 100
+
+    # Ranged units deal damage while melee units walk to them
+    zerglings = army({UnitTypeId.ZERGLING: 20}, is_mine=False)
+    close_fight = simulate_fight(marines, zerglings, game_data)
+    far_fight = simulate_fight(marines, zerglings, game_data, distance=6)
+    assert far_fight.enemy_army_value < close_fight.enemy_army_value
+    assert far_fight.duration > close_fight.duration
+
+    # Units that can't attack each other
+    vikings = army({UnitTypeId.VIKINGFIGHTER: 5})
+    result = simulate_fight(vikings, zerglings, game_data)
+    assert result.outcome == Result.Tie
+    assert result.duration == 0
+    assert result.army_value == vikings.value.sum() and result.enemy_army_value == zerglings.value.sum()
+    result = simulate_fight(army({UnitTypeId.MUTALISK: 5}), zerglings, game_data)
+    assert result.outcome == Result.Victory
+    assert result.army_value == army({UnitTypeId.MUTALISK: 5}).value.sum()
+    result = simulate_fight(army({UnitTypeId.MUTALISK: 5}), zerglings, game_data, max_duration=5)
+    assert result.outcome == Result.Tie
+    assert result.duration == 5
+
+    # Armies can be combined
+    combined = FightArmy.concatenate([marines, army({UnitTypeId.MARINE: 5})])
+    assert combined.size == 15
+    result = simulate_fight(combined, enemy_marines, game_data)
+    expected = simulate_fight(army({UnitTypeId.MARINE: 15}), enemy_marines, game_data)
+    assert result.outcome == expected.outcome == Result.Victory
+    assert result.army_value == expected.army_value
+    assert (result.army_survivors == expected.army_survivors).all()
+
+    # No units
+    result = simulate_fight(army({}), enemy_marines, game_data)
+    assert result.outcome == Result.Defeat
+    assert result.enemy_army_value == 500
+
+
+def test_simulate_fight_with_units(monkeypatch):
+    # Keep the unit types of this test out of the class cache, which test_pickled_data checks
+    monkeypatch.setattr(Unit, "class_cache", CacheDict())
+    bot = get_map_specific_bot(MAPS[0])
+    template = bot.workers.first._proto
+    tags = itertools.count(1)
+    marines = Units(
+        [_create_unit(bot, template, next(tags), UnitTypeId.MARINE, 1, health=45, health_max=45) for _ in range(10)],
+        bot,
+    )
+    zerglings = Units(
+        [_create_unit(bot, template, next(tags), UnitTypeId.ZERGLING, 4, health=35, health_max=35) for _ in range(20)],
+        bot,
+    )
+    assert UnitTypeVitals.from_units(marines | zerglings) == {
+        UnitTypeId.MARINE: VITALS[UnitTypeId.MARINE],
+        UnitTypeId.ZERGLING: VITALS[UnitTypeId.ZERGLING],
+    }
+
+    result = simulate_fight(marines, zerglings, bot.game_data, distance=6)
+    expected = simulate_fight(
+        FightArmy.from_unit_types({UnitTypeId.MARINE: 10}, VITALS, bot.game_data),
+        FightArmy.from_unit_types({UnitTypeId.ZERGLING: 20}, VITALS, bot.game_data, is_mine=False),
+        bot.game_data,
+        distance=6,
+    )
+    assert result.outcome == expected.outcome
+    assert result.duration == expected.duration
+    assert result.army_value == expected.army_value
+    assert result.enemy_army_value == expected.enemy_army_value
@@ -8,35 +8,44 @@ It will load the pickle files, recreate the bot object from scratch and tests mo
 All functions that require some kind of query or interaction with the API directly will have to be tested in the "autotest_bot.py" in a live game.
 """
 
+import itertools
 import lzma
 import math
 import pickle
 import random
 import sys
 import unittest
+from collections import Counter
 from contextlib import suppress
 from pathlib import Path
-from typing import Any, List, Tuple
+from typing import Any, FrozenSet, List, Set, Tuple
 
+import numpy as np
+import pytest
 from google.protobuf.internal import api_implementation
 from hypothesis import given, settings
 from hypothesis import strategies as st
 from loguru import logger
 
+from sc2.action import combine_actions, group_actions
 from sc2.bot_ai import BotAI
+from sc2.bot_ai_internal import PERSISTENT_UNITS_MAX_AGE, PERSISTENT_UNITS_PRUNE_INTERVAL
 from sc2.client import Client
 from sc2.constants import ALL_GAS, CREATION_ABILITY_FIX
-from sc2.data import CloakState, Race
+from sc2.data import Attribute, CloakState, Race
 from sc2.game_data import AbilityData, Cost, GameData
-from sc2.game_info import GameInfo
+from sc2.game_info import GameInfo, Ramp
 from sc2.game_state import GameState
 from sc2.ids.ability_id import AbilityId
 from sc2.ids.buff_id import BuffId
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.ids.upgrade_id import UpgradeId
+from sc2.map_analysis import RAMP_OPTIONAL_POSITIONS, RAMP_POSITION_SETS, MapAnalysis, map_analysis_path
 from sc2.pixel_map import PixelMap
 from sc2.position import Point2, Point3, Rect, Size
+from sc2.power_source import PsionicMatrix
 from sc2.unit import Unit
+from sc2.unit_command import UnitCommand
 from sc2.units import Units
 
 MAPS: List[Path] = [
@@ -50,9 +59,10 @@ def load_map_pickle_data(map_path: Path) -> Tuple[Any, Any, Any]:
         return raw_game_data, raw_game_info, raw_observation
 
 
-def build_bot_object_from_pickle_data(raw_game_data, raw_game_info, raw_observation) -> BotAI:
+def build_bot_object_from_pickle_data(raw_game_data, raw_game_info, raw_observation, bot: BotAI = None) -> BotAI:
     # Build fresh bot object, and load the pickled data into the bot object
-    bot = BotAI()
+    if bot is None:
+        bot = BotAI()
     game_data = GameData(raw_game_data.data)
     game_info = GameInfo(raw_game_info.game_info)
     game_state = GameState(raw_observation)
@@ -1172,5 +1182,522 @@ def test_missing_enum():
     assert enum_converted == BuffId.NULL
 
 
+def test_unit_snapshot():
+    group_names = [
+        "all_units",
+        "units",
+        "workers",
+        "larva",
+        "structures",
+        "townhalls",
+        "gas_buildings",
+        "all_own_units",
+        "enemy_units",
+        "enemy_structures",
+        "all_enemy_units",
+        "resources",
+        "destructables",
+        "watchtowers",
+        "mineral_field",
+        "vespene_geyser",
+        "placeholders",
+    ]
+    for map_path in MAPS:
+        data = load_map_pickle_data(map_path)
+        bot: BotAI = build_bot_object_from_pickle_data(*data)
+        snapshot_bot = BotAI()
+        snapshot_bot.use_unit_snapshot = True
+        snapshot_bot = build_bot_object_from_pickle_data(*data, bot=snapshot_bot)
+
+        snapshot = snapshot_bot.unit_snapshot
+        assert len(snapshot) == len(bot.all_units)
+        assert snapshot.positions.shape == (len(bot.all_units), 2)
+        for name in group_names:
+            assert name in snapshot_bot._lazy_unit_groups
+            group: Units = getattr(snapshot_bot, name)
+            assert [unit.tag for unit in group] == [unit.tag for unit in getattr(bot, name)], name
+            assert name not in snapshot_bot._lazy_unit_groups
+            # Group is only created once
+            assert getattr(snapshot_bot, name) is group
+        assert snapshot_bot.techlab_tags == bot.techlab_tags
+        assert snapshot_bot.reactor_tags == bot.reactor_tags
+
+        for unit in bot.all_units:
+            snapshot_unit = snapshot.unit(unit.distance_calculation_index)
+            assert snapshot_unit.tag == unit.tag == snapshot["tag"][unit.distance_calculation_index]
+            assert snapshot_unit.game_loop == unit.game_loop
+            assert snapshot["type_id"][unit.distance_calculation_index] == unit.type_id.value
+            assert snapshot["health"][unit.distance_calculation_index] == unit.health
+            assert snapshot["radius"][unit.distance_calculation_index] == unit.radius
+            assert tuple(snapshot.positions[unit.distance_calculation_index]) == unit.position_tuple
+        # Distances use the positions of the snapshot
+        for unit in bot.townhalls:
+            snapshot_townhall = snapshot.unit(unit.distance_calculation_index)
+            assert {u.tag for u in snapshot_bot.mineral_field.closer_than(10, snapshot_townhall)
+                    } == {u.tag for u in bot.mineral_field.closer_than(10, unit)}
+        with pytest.raises(AttributeError):
+            _ = snapshot_bot.this_attribute_does_not_exist
+
+
+@pytest.mark.parametrize("use_unit_snapshot", [False, True])
+def test_persistent_units(use_unit_snapshot: bool):
+    raw_game_data, raw_game_info, raw_observation = load_map_pickle_data(MAPS[0])
+    bot = BotAI()
+    bot.persistent_units = True
+    bot.use_unit_snapshot = use_unit_snapshot
+    bot = build_bot_object_from_pickle_data(raw_game_data, raw_game_info, raw_observation, bot=bot)
+    worker = bot.workers.first
+    townhall = bot.townhalls.first
+    worker_type_data = worker._type_data
+    worker_position = worker.position
+    _ = worker.ground_range, townhall.name
+    memory = {worker: "mining"}
+
+    next_observation = type(raw_observation)()
+    next_observation.CopyFrom(raw_observation)
+    next_observation.observation.game_loop += 4
+    raw_units = {unit.tag: unit for unit in next_observation.observation.raw_data.units}
+    raw_units[worker.tag].pos.x += 1
+    raw_units[townhall.tag].unit_type = UnitTypeId.PLANETARYFORTRESS.value
+    bot._prepare_step(GameState(next_observation))
+
+    # The same objects are refreshed with the new frame
+    assert bot.workers.by_tag(worker.tag) is worker
+    assert bot.townhalls.first is townhall
+    assert worker.game_loop == townhall.game_loop == bot.state.game_loop
+    assert memory[bot.workers.by_tag(worker.tag)] == "mining"
+    # Caches of the unit type survive, caches of the frame are recalculated
+    assert "_type_row" in worker.__dict__
+    assert worker._type_data is worker_type_data
+    assert worker.position == worker_position.offset(Point2((1, 0)))
+    # All caches are cleared if the unit type changed
+    assert townhall.type_id == UnitTypeId.PLANETARYFORTRESS
+    assert townhall.name == "PlanetaryFortress"
+    # Units of the previous frame are copies with the raw unit of that frame
+    previous_worker = bot._units_previous_map[worker.tag]
+    assert previous_worker is not worker
+    assert previous_worker.position == worker_position
+    assert bot._structures_previous_map[townhall.tag].type_id != UnitTypeId.PLANETARYFORTRESS
+    # Distances are calculated with the refreshed units
+    assert bot.workers.closest_to(worker.position) is worker
+
+    next_observation.observation.game_loop += 4
+    next_observation.observation.raw_data.units.remove(raw_units[worker.tag])
+    next_observation.observation.raw_data.event.dead_units.append(worker.tag)
+    bot._prepare_step(GameState(next_observation))
+    assert worker.tag not in bot._persistent_units
+    assert townhall.tag in bot._persistent_units
+
+    # Units whose death was not reported are removed after they were not seen for a while, visible units are kept
+    mineral_field_tag = bot.mineral_field.first.tag
+    next_observation.observation.game_loop += PERSISTENT_UNITS_PRUNE_INTERVAL
+    next_observation.observation.raw_data.units.remove(raw_units[townhall.tag])
+    bot._prepare_step(GameState(next_observation))
+    assert townhall.tag in bot._persistent_units
+    next_observation.observation.game_loop += PERSISTENT_UNITS_MAX_AGE
+    bot._prepare_step(GameState(next_observation))
+    assert townhall.tag not in bot._persistent_units
+    assert mineral_field_tag in bot._persistent_units
+
+
+def test_unit_type_table():
+    bot = get_map_specific_bot(MAPS[0])
+    table = bot.game_data.unit_types
+    assert set(table.rows) == set(bot.game_data.units)
+    for unit_type, row in table.rows.items():
+        unit_type_data = bot.game_data.units[unit_type]
+        assert row.is_structure == (Attribute.Structure.value in unit_type_data.attributes)
+        assert row.is_light == (Attribute.Light.value in unit_type_data.attributes)
+        assert row.attributes == sum(1 << attribute for attribute in set(unit_type_data.attributes))
+        assert row.can_attack == (bool(unit_type_data._proto.weapons) or unit_type in {
+            UnitTypeId.BATTLECRUISER.value,
+            UnitTypeId.ORACLE.value,
+        })
+        assert row.armor == unit_type_data._proto.armor
+        assert row.footprint_radius == unit_type_data.footprint_radius
+        # The columns contain the same values as the rows
+        for name, value in row._asdict().items():
+            if value is None:
+                assert np.isnan(table[name][unit_type])
+            else:
+                assert table[name][unit_type] == value, name
+    marine = table.rows[UnitTypeId.MARINE.value]
+    assert marine.ground_range == marine.air_range == 5
+    assert marine.is_biological and marine.is_light and not marine.is_structure
+    assert table.rows[UnitTypeId.BATTLECRUISER.value].ground_range == 6
+    assert table.rows[UnitTypeId.ORACLE.value].ground_range == 4
+    assert table.rows[UnitTypeId.COMMANDCENTER.value].footprint_radius == 2.5
+    # Unknown unit types are looked up as the last entry
+    unit_types = np.array([UnitTypeId.COMMANDCENTER.value, 10**6])
+    assert table.lookup("is_structure", unit_types).tolist() == [True, False]
+    assert table.lookup("footprint_radius", unit_types)[0] == 2.5
+    assert np.isnan(table.lookup("footprint_radius", unit_types)[1])
+
+    for unit in bot.all_units:
+        assert unit._type_row is table.rows[unit._proto.unit_type]
+        assert unit.is_structure == (Attribute.Structure.value in unit._type_data.attributes)
+    assert bot.all_units.of_type(UnitTypeId.SCV) == bot.workers
+    assert bot.all_units.of_type([UnitTypeId.SCV, UnitTypeId.COMMANDCENTER]).tags == (bot.workers | bot.townhalls).tags
+    assert bot.all_units.exclude_type({UnitTypeId.SCV}).tags == bot.all_units.tags - bot.workers.tags
+    # Plain ints are not unit types
+    assert not bot.all_units.of_type([UnitTypeId.SCV.value])
+
+
+def test_pathing_grid_update_methods():
+    for map_path in MAPS:
+        bot = get_map_specific_bot(map_path)
+        if bot.destructables and bot.townhalls:
+            break
+    raw_game_data, raw_game_info, raw_observation = load_map_pickle_data(map_path)
+
+    bot = BotAI()
+    bot.pathing_grid_update_method = 1
+    bot = build_bot_object_from_pickle_data(raw_game_data, raw_game_info, raw_observation, bot=bot)
+    assert not bot._should_request_game_info(bot.state.game_loop + bot.game_info_request_interval - 1)
+    assert bot._should_request_game_info(bot.state.game_loop + bot.game_info_request_interval)
+
+    bot = BotAI()
+    bot.pathing_grid_update_method = 2
+    bot = build_bot_object_from_pickle_data(raw_game_data, raw_game_info, raw_observation, bot=bot)
+    initial_grid = bot.game_info.pathing_grid.data_numpy.copy()
+    assert not bot._should_request_game_info(bot.state.game_loop)
+
+    # No changes without new structures
+    bot._prepare_step(GameState(raw_observation))
+    assert (bot.game_info.pathing_grid.data_numpy == initial_grid).all()
+    assert not bot._should_request_game_info(bot.state.game_loop)
+
+    # Remove the townhall and a destructible rock from the observation
+    townhall = bot.townhalls.first
+    destructable = bot.destructables.first
+    observation = type(raw_observation)()
+    observation.CopyFrom(raw_observation)
+    raw_units = observation.observation.raw_data.units
+    for index in reversed(range(len(raw_units))):
+        if raw_units[index].tag in {townhall.tag, destructable.tag}:
+            del raw_units[index]
+    bot._prepare_step(GameState(observation))
+    grid = bot.game_info.pathing_grid
+    assert not initial_grid[int(townhall.position.y), int(townhall.position.x)]
+    assert grid[townhall.position.rounded] == 1
+    x_min, x_max, y_min, y_max, corners_pathable = bot._pathing_grid_footprint(townhall)
+    assert corners_pathable
+    assert (grid.data_numpy[y_min:y_max, x_min:x_max] == 1).all()
+    # Grid outside of the footprint is unchanged
+    changed = grid.data_numpy != initial_grid
+    changed[y_min:y_max, x_min:x_max] = False
+    assert not changed.any()
+    # Destroyed rocks require a new game info
+    assert bot._should_request_game_info(bot.state.game_loop)
+    bot._prepare_step(GameState(observation), raw_game_info)
+    assert not bot._should_request_game_info(bot.state.game_loop)
+
+    # Townhall is built again
+    bot._prepare_step(GameState(raw_observation))
+    assert grid[townhall.position.rounded] == 1
+    assert bot.game_info.pathing_grid[townhall.position.rounded] == 0
+
+
+def test_spatial_index_distance_functions(monkeypatch):
+    def distance(unit: Unit, position) -> float:
+        position = position.position if isinstance(position, Unit) else position
+        return math.hypot(unit.position.x - position[0], unit.position.y - position[1])
+
+    for map_path in MAPS[:10]:
+        for distance_calculation_method in [0, 2, 4]:
+            raw_game_data, raw_game_info, raw_observation = load_map_pickle_data(map_path)
+            bot = BotAI()
+            bot.distance_calculation_method = distance_calculation_method
+            if distance_calculation_method == 4:
+                # Don't calculate a distance matrix
+                monkeypatch.setattr("sc2.bot_ai_internal.DISTANCE_MATRIX_MAX_UNITS", 0)
+            bot = build_bot_object_from_pickle_data(raw_game_data, raw_game_info, raw_observation, bot=bot)
+            monkeypatch.undo()
+            if distance_calculation_method == 4:
+                assert bot._distance_squared_unit_to_unit == bot._distance_squared_unit_to_unit_method0
+
+            all_units: Units = bot.all_units
+            assert all_units._spatial_index_indices() is not None
+            assert Units(list(all_units)[:10], bot)._spatial_index_indices() is None
+            # The indices are collected once per frame, filtered groups inherit them and adding or removing units resets them
+            indices = all_units._spatial_index_indices()
+            assert all_units._spatial_index_indices() is indices
+            nearby_units = all_units.closer_than(200, bot.game_info.map_center)
+            assert (nearby_units._cached_indices == bot._distance_calculation_indices(nearby_units)).all()
+            changed_units = all_units.copy()
+            assert (changed_units._spatial_index_indices() == indices).all()
+            changed_units.pop()
+            assert (changed_units._spatial_index_indices() == indices[:-1]).all()
+            changed_units.pop(0)
+            changed_units.append(all_units[0])
+            assert (changed_units._spatial_index_indices() == np.append(indices[1:-1], indices[0])).all()
+            positions = [bot.game_info.map_center, bot.game_info.start_locations[0], all_units.first, all_units[-1]]
+            for position in positions:
+                for max_distance in [0.5, 5, 15, 200]:
+                    assert all_units.closer_than(max_distance, position).tags == {
+                        unit.tag
+                        for unit in all_units if distance(unit, position) < max_distance
+                    }
+                closest = all_units.closest_to(position)
+                assert distance(closest, position) == min(distance(unit, position) for unit in all_units)
+
+            mineral_fields = bot.mineral_field
+            assert all_units.in_distance_of_group(mineral_fields, 8).tags == {
+                unit.tag
+                for unit in all_units if any(distance(unit, mineral) < 8 for mineral in mineral_fields)
+            }
+            closest = bot.destructables.in_closest_distance_to_group(mineral_fields)
+            assert min(distance(closest, mineral) for mineral in mineral_fields) == pytest.approx(
+                min(distance(unit, mineral) for unit in bot.destructables for mineral in mineral_fields)
+            )
+            for worker in bot.workers[:3]:
+                assert all_units.in_attack_range_of(worker).tags == {
+                    unit.tag
+                    for unit in all_units if worker.target_in_range(unit)
+                }
+
+
+def test_distance_calculation_method_lazy_rows():
+    for map_path in MAPS[:10]:
+        data = load_map_pickle_data(map_path)
+        bot_matrix = BotAI()
+        bot_matrix.distance_calculation_method = 2
+        bot_matrix = build_bot_object_from_pickle_data(*data, bot=bot_matrix)
+        bot = BotAI()
+        bot.distance_calculation_method = 5
+        bot = build_bot_object_from_pickle_data(*data, bot=bot)
+        assert not bot._cached_distance_rows
+
+        townhall = bot.townhalls.first
+        # Small groups, so that the spatial index is not used
+        mineral_fields = bot.mineral_field.take(20)
+        matrix_mineral_fields = bot_matrix.mineral_field.take(20)
+        assert mineral_fields.closer_than(10, townhall).tags == matrix_mineral_fields.closer_than(
+            10, bot_matrix.townhalls.first
+        ).tags
+        assert set(bot._cached_distance_rows) == {townhall.distance_calculation_index}
+        # Loop with the same unit as unit1 only calculates one additional row
+        distances = [townhall.distance_to(mineral_field) for mineral_field in mineral_fields]
+        assert len(bot._cached_distance_rows) <= 2
+        matrix_townhall = bot_matrix.townhalls.first
+        assert distances == pytest.approx([
+            matrix_townhall.distance_to(mineral_field) for mineral_field in matrix_mineral_fields
+        ])
+        for unit1, unit2 in zip(bot.all_units, reversed(bot.all_units)):
+            assert bot._distance_squared_unit_to_unit(unit1, unit2) == pytest.approx(
+                bot_matrix._cdist[unit1.distance_calculation_index, unit2.distance_calculation_index]
+            )
+        # Rows are not kept for the next frame
+        bot._prepare_units()
+        assert not bot._cached_distance_rows
+
+
+def test_vectorized_units_filters(monkeypatch):
+
+    def run_filters(bot: BotAI) -> List[Any]:
+        results = []
+        all_units: Units = bot.all_units
+        for position in [bot.game_info.map_center, all_units.first, all_units[len(all_units) // 2]]:
+            results.append(all_units.closest_distance_to(position))
+            results.append(all_units.furthest_distance_to(position))
+            results.append(all_units.furthest_to(position).tag)
+            for distance in [0, 5, 20]:
+                results.append([unit.tag for unit in all_units.further_than(distance, position)])
+                results.append([unit.tag for unit in all_units.in_distance_between(position, distance, distance + 10)])
+            for n in [-1, 0, 1, 5, len(all_units) - 1, len(all_units), len(all_units) + 1]:
+                results.append([unit.tag for unit in all_units.closest_n_units(position, n)])
+                results.append([unit.tag for unit in all_units.furthest_n_units(position, n)])
+                results.append([unit.tag for unit in all_units.n_closest_to_distance(position, 10, n)])
+            results.append([unit.tag for unit in all_units.sorted_by_distance_to(position)])
+            results.append([unit.tag for unit in all_units.sorted_by_distance_to(position, reverse=True)])
+        return results
+
+    for map_path in MAPS[:10]:
+        bot = get_map_specific_bot(map_path)
+        assert bot.all_units._spatial_index_indices() is not None
+        vectorized_results = run_filters(bot)
+        monkeypatch.setattr("sc2.units.SPATIAL_INDEX_MIN_UNITS", 10**9)
+        assert bot.all_units._spatial_index_indices() is None
+        python_results = run_filters(bot)
+        monkeypatch.undo()
+        for vectorized_result, python_result in zip(vectorized_results, python_results):
+            if isinstance(python_result, float):
+                assert vectorized_result == pytest.approx(python_result)
+            else:
+                assert vectorized_result == python_result
+
+    # Ties are resolved like a stable sort
+    values = np.array([3, 1, 2, 1, 3, 2, 1, 3], dtype=float)
+    order = np.argsort(values, kind="stable").tolist()
+    for n in range(1, len(values)):
+        assert Units._n_smallest_indices(values, n) == order[:n]
+        assert Units._n_largest_indices(values, n) == order[-n:]
+
+
+def test_pixelmap_label_components():
+
+    def reference_flood_fill_all(pixel_map: PixelMap, pred) -> Set[FrozenSet[Point2]]:
+        # Breadth first search over the 8 neighbors of each point
+        groups: Set[FrozenSet[Point2]] = set()
+        visited: Set[Tuple[int, int]] = set()
+        for x in range(pixel_map.width):
+            for y in range(pixel_map.height):
+                if (x, y) in visited or not pred(pixel_map[x, y]):
+                    continue
+                group = set()
+                queue = [(x, y)]
+                visited.add((x, y))
+                while queue:
+                    px, py = queue.pop()
+                    group.add(Point2((px, py)))
+                    for a, b in itertools.product([-1, 0, 1], repeat=2):
+                        nx, ny = px + a, py + b
+                        if (0 <= nx < pixel_map.width and 0 <= ny < pixel_map.height and (nx, ny) not in visited
+                                and pred(pixel_map[nx, ny])):
+                            visited.add((nx, ny))
+                            queue.append((nx, ny))
+                groups.add(frozenset(group))
+        return groups
+
+    for map_path in MAPS[:3]:
+        bot = get_map_specific_bot(map_path)
+        for pixel_map, pred in [
+            (bot.game_info.pathing_grid, lambda value: value == 1),
+            (bot.game_info.placement_grid, lambda value: value == 0),
+            (bot.game_info.terrain_height, lambda value: value > 200),
+        ]:
+            groups = pixel_map.flood_fill_all(pred)
+            assert groups == reference_flood_fill_all(pixel_map, pred)
+            labels, amount = pixel_map.label_components(pred)
+            assert labels.shape == (pixel_map.height, pixel_map.width)
+            assert amount == len(groups)
+            assert (labels > 0).sum() == sum(len(group) for group in groups)
+            for group in groups:
+                point = next(iter(group))
+                assert pixel_map.flood_fill(point, pred) == set(group)
+        assert not bot.game_info.pathing_grid.flood_fill(Point2((-1, 0)), lambda value: True)
+        assert not bot.game_info.pathing_grid.flood_fill_all(lambda value: False)
+
+
+def test_map_analysis_cache(tmp_path, monkeypatch):
+    for map_path in MAPS[:5]:
+        data = load_map_pickle_data(map_path)
+        bot = BotAI()
+        bot.map_analysis_cache_dir = tmp_path
+        bot = build_bot_object_from_pickle_data(*data, bot=bot)
+        bot._prepare_first_step()
+        map_analysis_file = map_analysis_path(tmp_path, bot.game_info, bot.game_info.player_start_location)
+        assert map_analysis_file.is_file()
+
+        # The second bot loads the analysis from the cache file instead of calculating it
+        cached_bot = BotAI()
+        cached_bot.map_analysis_cache_dir = tmp_path
+        cached_bot = build_bot_object_from_pickle_data(*data, bot=cached_bot)
+        with monkeypatch.context() as m:
+            m.setattr(BotAI, "_find_expansion_locations", lambda self: pytest.fail("Expansions were calculated"))
+            m.setattr(GameInfo, "_find_ramps_and_vision_blockers", lambda self: pytest.fail("Ramps were calculated"))
+            cached_bot._prepare_first_step()
+
+        assert cached_bot.expansion_locations_list == bot.expansion_locations_list
+        assert cached_bot.expansion_locations_dict == bot.expansion_locations_dict
+        assert cached_bot.owned_expansions == bot.owned_expansions
+        assert [ramp.points for ramp in cached_bot.game_info.map_ramps] == [ramp.points for ramp in bot.game_info.map_ramps]
+        assert cached_bot.game_info.vision_blockers == bot.game_info.vision_blockers
+        assert all(isinstance(point.x, int) for point in cached_bot.game_info.vision_blockers)
+        fresh_bot = get_map_specific_bot(map_path)
+        fresh_bot._prepare_first_step()
+        fresh_ramp: Ramp = fresh_bot.main_base_ramp
+        for name in ["top_center", "upper", "lower"] + list(RAMP_OPTIONAL_POSITIONS + RAMP_POSITION_SETS):
+            assert getattr(cached_bot.main_base_ramp, name) == getattr(fresh_ramp, name)
+
+    # Cache files of a different version or broken files are ignored
+    assert MapAnalysis.load(tmp_path / "missing.npz") is None
+    (tmp_path / "broken.npz").write_bytes(b"not a npz file")
+    assert MapAnalysis.load(tmp_path / "broken.npz") is None
+
+
+def test_combine_actions():
+    bot: BotAI = get_map_specific_bot(random.choice(MAPS))
+    workers = bot.workers.take(6)
+    mineral_field = bot.mineral_field.first
+    point_a, point_b = Point2((20, 20)), Point2((30, 30))
+
+    # Identical commands are combined regardless of their order
+    actions = [
+        UnitCommand(AbilityId.ATTACK, worker, point_a if i % 2 == 0 else point_b) for i, worker in enumerate(workers)
+    ]
+    raw_actions = list(combine_actions(actions))
+    assert len(raw_actions) == 2
+    for raw_action, point in zip(raw_actions, [point_a, point_b]):
+        assert raw_action.unit_command.ability_id == AbilityId.ATTACK.value
+        assert Point2.from_proto(raw_action.unit_command.target_world_space_pos) == point
+    assert set(raw_actions[0].unit_command.unit_tags) == {worker.tag for worker in workers[::2]}
+
+    # The commands of each unit stay in their original order
+    worker_a, worker_b = workers[0], workers[1]
+    actions = [
+        UnitCommand(AbilityId.MOVE, worker_a, point_a),
+        UnitCommand(AbilityId.ATTACK, worker_a, point_b, queue=True),
+        UnitCommand(AbilityId.ATTACK, worker_b, point_b, queue=True),
+        UnitCommand(AbilityId.MOVE, worker_b, point_a),
+        UnitCommand(AbilityId.HARVEST_GATHER, workers[2], mineral_field),
+        UnitCommand(AbilityId.HARVEST_GATHER, workers[3], mineral_field),
+    ]
+    groups = group_actions(actions)
+    assert [[action.unit.tag for action in group] for _key, group in groups] == [
+        [worker_a.tag],
+        [worker_a.tag, worker_b.tag],
+        [worker_b.tag],
+        [workers[2].tag, workers[3].tag],
+    ]
+    for tag in [worker_a.tag, worker_b.tag]:
+        unit_actions = [action for action in actions if action.unit.tag == tag]
+        assert [action for _key, group in groups for action in group if action.unit.tag == tag] == unit_actions
+    raw_actions = list(combine_actions(actions))
+    assert len(raw_actions) == 4
+    assert raw_actions[3].unit_command.target_unit_tag == mineral_field.tag
+
+    # Commands which can not be combined result in one raw action per unit
+    actions = [UnitCommand(AbilityId.TERRANBUILD_SUPPLYDEPOT, worker, point_a) for worker in workers]
+    assert len(group_actions(actions)) == 1
+    assert len(list(combine_actions(actions))) == len(workers)
+
+
+def test_game_state_lazy_fields(monkeypatch):
+    bot: BotAI = get_map_specific_bot(random.choice(MAPS))
+    lazy_fields = ["psionic_matrix", "score", "upgrades", "visibility", "creep", "effects"]
+    monkeypatch.setattr(GameState, "measure_field_decode_times", True)
+    monkeypatch.setattr(GameState, "field_decode_times", Counter())
+    monkeypatch.setattr(GameState, "field_decode_counts", Counter())
+    state = GameState(bot.state.response_observation)
+    # Nothing is decoded until it is accessed
+    assert not set(lazy_fields) & set(state.__dict__)
+
+    raw = state.observation_raw
+    assert state.upgrades == {UpgradeId(upgrade) for upgrade in raw.player.upgrade_ids}
+    assert state.effects == set()
+    assert state.score.food_used_economy == state.observation.score.score_details.food_used.economy
+    assert state.psionic_matrix.sources == PsionicMatrix.from_proto(raw.player.power_sources).sources
+    # Visibility has one byte per pixel and shares the memory of the observation
+    visibility = state.visibility
+    assert "data_numpy" not in visibility.__dict__
+    assert visibility.data_numpy.shape == (visibility.height, visibility.width)
+    assert not visibility.data_numpy.flags.owndata
+    assert set(np.unique(visibility.data_numpy)) <= {0, 1, 2}
+    # Creep is stored in bits and only unpacked on first access
+    creep = state.creep
+    assert "data_numpy" not in creep.__dict__
+    assert (creep.data_numpy == np.unpackbits(np.frombuffer(raw.map_state.creep.data, dtype=np.uint8)).reshape(
+        creep.height, creep.width
+    )).all()
+    # Every field is decoded only once
+    assert state.creep is creep
+    for field in lazy_fields:
+        assert GameState.field_decode_counts[field] == 1
+    assert GameState.field_decode_counts["__init__"] == 1
+    report = GameState.field_decode_time_report()
+    assert all(field in report for field in lazy_fields)
+
+
 if __name__ == "__main__":
     test_unit()
@@ -8,13 +8,20 @@ It will load the pickle files, recreate the bot object from scratch and tests mo
 All functions that require some kind of query or interaction with the API directly will have to be tested in the "autotest_bot.py" in a live game.
 """
 
+import itertools
+import math
 import time
+from collections import deque
 from pathlib import Path
 from test.test_pickled_data import MAPS, get_map_specific_bot
+from typing import Dict, FrozenSet, List, Set, Tuple
 
+import numpy as np
 from loguru import logger
 
-from sc2.game_info import Ramp
+from sc2.bot_ai import BotAI
+from sc2.constants import geyser_ids
+from sc2.game_info import GameInfo, Ramp
 from sc2.position import Point2
 from sc2.unit import Unit
 from sc2.units import Units
@@ -32,6 +39,80 @@ def pytest_generate_tests(metafunc):
     metafunc.parametrize(argnames, argvalues, ids=idlist, scope="class")
 
 
+def find_ramp_groups_and_vision_blockers_reference(
+    game_info: GameInfo
+) -> Tuple[List[FrozenSet[Point2]], FrozenSet[Point2]]:
+    """ Point by point reference implementation of GameInfo._find_ramps_and_vision_blockers """
+
+    def equal_height_around(tile):
+        sliced = game_info.terrain_height.data_numpy[tile[1] - 1:tile[1] + 2, tile[0] - 1:tile[0] + 2]
+        return len(np.unique(sliced)) == 1
+
+    map_area = game_info.playable_area
+    points = [
+        Point2((a, b)) for (b, a), value in np.ndenumerate(game_info.pathing_grid.data_numpy)
+        if value == 1 and map_area.x <= a < map_area.x + map_area.width and map_area.y <= b < map_area.y +
+        map_area.height and game_info.placement_grid[(a, b)] == 0
+    ]
+    vision_blockers = frozenset(point for point in points if equal_height_around(point))
+
+    # Group the ramp points with a breadth first search over the 8 neighbours
+    remaining: Set[Point2] = {point for point in points if not equal_height_around(point)}
+    groups: List[FrozenSet[Point2]] = []
+    while remaining:
+        start = remaining.pop()
+        group: Set[Point2] = {start}
+        queue = deque([start])
+        while queue:
+            base = queue.popleft()
+            for neighbor in base.neighbors8:
+                if neighbor in remaining:
+                    remaining.discard(neighbor)
+                    group.add(neighbor)
+                    queue.append(neighbor)
+        if len(group) >= 8:
+            groups.append(frozenset(group))
+    return groups, vision_blockers
+
+
+def find_expansion_locations_reference(bot: BotAI) -> Dict[Point2, Point2]:
+    """ Pairwise merging reference implementation of BotAI._find_expansion_locations, returns resource position -> expansion location """
+    resource_groups: List[List[Unit]] = [
+        [resource] for resource in bot.resources if resource.name != "MineralField450"
+    ]
+    merged_group = True
+    height_grid = bot.game_info.terrain_height
+    while merged_group:
+        merged_group = False
+        for group_a, group_b in itertools.combinations(resource_groups, 2):
+            if any(
+                resource_a.distance_to(resource_b) <= 8.5
+                and abs(height_grid[resource_a.position.rounded] - height_grid[resource_b.position.rounded]) <= 10
+                for resource_a, resource_b in itertools.product(group_a, group_b)
+            ):
+                resource_groups.remove(group_a)
+                resource_groups.remove(group_b)
+                resource_groups.append(group_a + group_b)
+                merged_group = True
+                break
+    offsets = [(x, y) for x, y in itertools.product(range(-7, 8), repeat=2) if 4 < math.hypot(x, y) <= 8]
+    resource_to_expansion: Dict[Point2, Point2] = {}
+    for resources in resource_groups:
+        center_x = int(sum(resource.position.x for resource in resources) / len(resources)) + 0.5
+        center_y = int(sum(resource.position.y for resource in resources) / len(resources)) + 0.5
+        possible_points = (
+            point for point in (Point2((offset[0] + center_x, offset[1] + center_y)) for offset in offsets)
+            if bot.game_info.placement_grid[point.rounded] == 1 and all(
+                point.distance_to(resource) >= (7 if resource._proto.unit_type in geyser_ids else 6)
+                for resource in resources
+            )
+        )
+        result = min(possible_points, key=lambda point: sum(point.distance_to(resource) for resource in resources))
+        for resource in resources:
+            resource_to_expansion[resource.position] = result
+    return resource_to_expansion
+
+
 class TestClass:
     # Load all pickle files and convert them into bot objects from raw data (game_data, game_info, game_state)
     scenarios = [(map_path.name, {"map_path": map_path}) for map_path in MAPS]
@@ -85,6 +166,27 @@ class TestClass:
                 assert ramp.protoss_wall_buildings == frozenset()
                 assert ramp.protoss_wall_warpin is None
 
+    def test_ramps_and_vision_blockers(self, map_path: Path):
+        bot = get_map_specific_bot(map_path)
+        ramps, vision_blockers = bot.game_info._find_ramps_and_vision_blockers()
+        expected_groups, expected_vision_blockers = find_ramp_groups_and_vision_blockers_reference(bot.game_info)
+
+        assert vision_blockers == expected_vision_blockers
+        assert {ramp.points for ramp in ramps} == set(expected_groups)
+        assert len(ramps) == len(expected_groups)
+        for ramp in ramps:
+            assert all(isinstance(point, Point2) for point in ramp.points)
+        assert set(bot.game_info._find_groups(frozenset().union(*expected_groups))) == set(expected_groups)
+
+    def test_expansion_locations(self, map_path: Path):
+        bot = get_map_specific_bot(map_path)
+        bot._find_expansion_locations()
+        expected = find_expansion_locations_reference(bot)
+
+        assert bot._resource_location_to_expansion_position_dict == expected
+        assert sorted(bot.expansion_locations_list) == sorted(set(expected.values()))
+        assert all(isinstance(location, Point2) for location in bot.expansion_locations_list)
+
     def test_bot_ai(self, map_path: Path):
         bot = get_map_specific_bot(map_path)
 
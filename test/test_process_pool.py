@@ -0,0 +1,187 @@
+import asyncio
+from contextlib import suppress
+from pathlib import Path
+from typing import List
+
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2 import main
+from sc2.bot_ai import BotAI
+from sc2.controller import Controller
+from sc2.data import Race, Result, Status
+from sc2.main import GameMatch
+from sc2.maps import Map
+from sc2.player import Bot, Computer
+from sc2.process_pool import SC2ProcessPool
+
+
+class FakeWebSocket:
+    """ Answers every request immediately, like a SC2 client that is not in a game. """
+
+    def __init__(self):
+        self.closed = False
+        # Stops answering requests if set, like a SC2 client that hangs
+        self.hang = False
+        self.responses: asyncio.Queue = asyncio.Queue()
+
+    async def send_bytes(self, data: bytes):
+        request = sc_pb.Request()
+        request.ParseFromString(data)
+        if not self.hang:
+            await self.responses.put(sc_pb.Response(status=Status.launched.value).SerializeToString())
+
+    async def receive_bytes(self) -> bytes:
+        response = await self.responses.get()
+        if response is None:
+            # aiohttp returns a close message which is not bytes
+            raise TypeError("Received message is not bytes")
+        return response
+
+    async def close(self):
+        if not self.closed:
+            self.closed = True
+            await self.responses.put(None)
+
+
+class FakeSC2Process:
+    launched: List["FakeSC2Process"] = []
+    failures = 0
+
+    def __init__(self):
+        self._port = len(self.launched)
+        self._ws = FakeWebSocket()
+        self.cleaned = False
+
+    async def __aenter__(self) -> Controller:
+        await asyncio.sleep(0.01)
+        if FakeSC2Process.failures:
+            FakeSC2Process.failures -= 1
+            raise TimeoutError("Websocket")
+        self.launched.append(self)
+        return Controller(self._ws, self)
+
+    async def _close_connection(self):
+        await self._ws.close()
+
+    def _clean(self, verbose=True):
+        self.cleaned = True
+
+
+def test_sc2_process_pool():
+
+    async def run():
+        FakeSC2Process.failures = 1
+        async with SC2ProcessPool(size=3, launch_interval=0.001, process_factory=FakeSC2Process) as pool:
+            # The failed launch was retried
+            assert pool.idle_count == 3
+            assert pool.metrics.launched == 3 and pool.metrics.launch_failures == 1
+
+            controllers = await pool.acquire(2)
+            assert pool.in_use_count == 2 and pool.idle_count == 1
+            await pool.release(controllers[:1])
+            assert pool.metrics.recycled == 1 and pool.idle_count == 2
+
+            # Broken controllers are replaced in the background
+            controllers[1]._ws.closed = True
+            await pool.release(controllers[1:])
+            assert controllers[1]._process.cleaned
+            assert pool.metrics.replaced == 1
+            await pool.fill()
+            assert pool.idle_count == 3 and pool.metrics.launched == 4
+
+            # Idle controllers which fail the health check are not handed out
+            pool._idle[0]._ws.closed = True
+            pool._idle[1]._ws.hang = True
+            pool.ping_timeout = 0.1
+            controllers = await pool.acquire(3)
+            assert all(not controller._ws.closed for controller in controllers)
+            assert pool.metrics.health_check_failures == 2 and pool.metrics.launched == 6
+            await pool.release(controllers, recycle=False)
+            assert pool.metrics.replaced == 6
+        assert pool.idle_count == 0 and pool.in_use_count == 0
+        assert all(process.cleaned for process in FakeSC2Process.launched)
+
+    asyncio.run(run())
+
+
+def test_run_multiple_games_concurrently(monkeypatch):
+    running: List[int] = []
+    max_running: List[int] = [0]
+
+    async def fake_run_match(controllers: List[Controller], match: GameMatch, close_ws=True):
+        running.append(match.random_seed)
+        max_running[0] = max(max_running[0], len(running))
+        try:
+            if match.random_seed == 1:
+                raise RuntimeError("Bot crashed")
+            # Match 2 hangs until the timeout
+            await asyncio.sleep(10 if match.random_seed == 2 else 0.05 * (4 - match.random_seed))
+        finally:
+            running.remove(match.random_seed)
+        return {match.players[0]: Result.Victory}
+
+    monkeypatch.setattr(main, "run_match", fake_run_match)
+    matches = [
+        GameMatch(Map(Path("Fake.SC2Map")), [Bot(Race.Terran, BotAI()), Computer(Race.Zerg)], random_seed=seed)
+        for seed in range(4)
+    ]
+
+    async def run():
+        async with SC2ProcessPool(size=2, launch_interval=0.001, process_factory=FakeSC2Process) as pool:
+            results = [
+                item async for item in
+                main.a_run_multiple_games_concurrently(matches, max_parallel=2, pool=pool, match_timeout=0.5)
+            ]
+            # The crashed and the timed out match did not affect the other matches, and their processes were replaced
+            assert pool.metrics.replaced == 2
+            await pool.fill()
+            assert pool.idle_count == 2
+        return results
+
+    results = asyncio.run(run())
+    assert max_running[0] == 2
+    assert sorted(index for index, _ in results) == [0, 1, 2, 3]
+    results = dict(results)
+    assert results[1] is None and results[2] is None
+    assert results[0] == {matches[0].players[0]: Result.Victory}
+    assert results[3] == {matches[3].players[0]: Result.Victory}
+
+
+def test_run_multiple_games_concurrently_hanging_sc2(monkeypatch):
+
+    async def fake_run_match(controllers: List[Controller], match: GameMatch, close_ws=True):
+        # SC2 stops answering while a request is pending
+        controllers[0]._ws.hang = True
+        await controllers[0].ping()
+
+    monkeypatch.setattr(main, "run_match", fake_run_match)
+    matches = [GameMatch(Map(Path("Fake.SC2Map")), [Bot(Race.Terran, BotAI()), Computer(Race.Zerg)])]
+
+    async def run():
+        async with SC2ProcessPool(size=1, launch_interval=0.001, process_factory=FakeSC2Process) as pool:
+            controller = pool._idle[0]
+            results = [
+                item async for item in
+                main.a_run_multiple_games_concurrently(matches, max_parallel=1, pool=pool, match_timeout=0.2)
+            ]
+            # The hanging process was closed, which ended the pending request
+            assert controller._ws.closed and controller._process.cleaned
+            assert pool.metrics.replaced == 1
+        return results
+
+    assert asyncio.run(asyncio.wait_for(run(), timeout=5)) == [(0, None)]
+
+    async def cancel_hanging_match():
+        pool = SC2ProcessPool(size=1, launch_interval=0.001, process_factory=FakeSC2Process)
+        matches_iterator = main.a_run_multiple_games_concurrently(matches, pool=pool, match_timeout=None)
+        task = asyncio.ensure_future(matches_iterator.__anext__())
+        await asyncio.sleep(0.2)
+        # Stopping the iteration while SC2 hangs closes the match
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+        await matches_iterator.aclose()
+        assert pool.in_use_count == 0 and pool.metrics.replaced == 1
+        await pool.close()
+
+    asyncio.run(asyncio.wait_for(cancel_hanging_match(), timeout=5))
@@ -0,0 +1,75 @@
+import asyncio
+from typing import List
+
+import pytest
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2.data import Status
+from sc2.protocol import Protocol, ProtocolError
+
+
+class FakeWebSocket:
+    """ Answers requests in order, like the SC2 client. Responses are only available after the request was sent. """
+
+    def __init__(self):
+        self.requests: List[sc_pb.Request] = []
+        self.responses: asyncio.Queue = asyncio.Queue()
+
+    async def send_bytes(self, data: bytes):
+        request = sc_pb.Request()
+        request.ParseFromString(data)
+        self.requests.append(request)
+        response = sc_pb.Response(status=Status.in_game.value)
+        if request.HasField("step"):
+            response.step.SetInParent()
+        elif request.HasField("observation"):
+            response.observation.observation.game_loop = len(self.requests)
+        elif request.HasField("action"):
+            response.error.append("Not in a game")
+            response.status = Status.ended.value
+        await self.responses.put(response.SerializeToString())
+
+    async def receive_bytes(self) -> bytes:
+        # Give other tasks the chance to run, so that cancellation can be tested
+        await asyncio.sleep(0)
+        return await self.responses.get()
+
+
+def test_protocol_pipelined_requests():
+
+    async def run():
+        ws = FakeWebSocket()
+        protocol = Protocol(ws)
+
+        # Responses are matched to the requests in the order they were sent
+        step_request = await protocol._send_request(step=sc_pb.RequestStep(count=4))
+        action_request = await protocol._send_request(action=sc_pb.RequestAction())
+        observation_request = await protocol._send_request(observation=sc_pb.RequestObservation())
+        assert len(ws.requests) == 3
+        response = await protocol._receive_response(observation_request)
+        assert response.observation.observation.game_loop == 3
+        assert step_request.done() and action_request.done()
+        # The status is updated from every response in order
+        assert protocol._status == Status.in_game
+        # Errors are only raised when the response is received
+        with pytest.raises(ProtocolError):
+            await protocol._receive_response(action_request)
+        assert (await protocol._receive_response(step_request)).HasField("step")
+
+        # Concurrent requests
+        responses = await asyncio.gather(
+            *(protocol._execute(observation=sc_pb.RequestObservation()) for _ in range(5))
+        )
+        assert sorted(response.observation.observation.game_loop for response in responses) == [4, 5, 6, 7, 8]
+
+        # A cancelled request still receives its response, so the following responses stay in order
+        task = asyncio.create_task(protocol._execute(observation=sc_pb.RequestObservation()))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        response = await protocol._execute(observation=sc_pb.RequestObservation())
+        assert response.observation.observation.game_loop == 10
+        assert not protocol._pending_responses
+
+    asyncio.run(run())
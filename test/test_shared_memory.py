@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+import threading
+from test.test_pickled_data import MAPS, get_map_specific_bot
+
+import numpy as np
+import pytest
+
+from sc2.shared_memory import SHARED_GRIDS, SharedGridsReader
+
+READ_PATHING_GRID = """
+import sys
+from sc2.shared_memory import SharedGridsReader
+with SharedGridsReader(sys.argv[1]) as grids:
+    game_loop, pathing_grid = grids.copy("pathing_grid")
+    print(game_loop, int(pathing_grid.sum()))
+"""
+
+
+def test_shared_grids():
+    bot = get_map_specific_bot(MAPS[0])
+    bot.shared_grids_name = f"sc2_test_{os.getpid()}"
+    try:
+        bot._update_shared_grids()
+        pathing_grid = bot.game_info.pathing_grid.data_numpy.copy()
+        with SharedGridsReader(bot.shared_grids_name) as grids:
+            assert set(grids.grids) == set(SHARED_GRIDS)
+            assert grids.game_loop() == bot.state.game_loop
+            assert np.array_equal(grids["pathing_grid"], pathing_grid)
+            assert np.array_equal(grids["terrain_height"], bot.game_info.terrain_height.data_numpy)
+            assert np.array_equal(grids["creep"], bot.state.creep.data_numpy)
+
+            # The grids are updated in place, so the views of readers show the next step
+            view = grids["pathing_grid"]
+            bot.game_info.pathing_grid.data_numpy[:] = 0
+            bot._update_shared_grids()
+            assert not view.any()
+            game_loop, copy = grids.copy("pathing_grid")
+            assert game_loop == bot.state.game_loop and not copy.any()
+            bot.game_info.pathing_grid.data_numpy[:] = pathing_grid
+            bot._update_shared_grids()
+            assert np.array_equal(view, pathing_grid)
+
+            # Copies wait until a write that is in progress is finished
+            header = grids.grids["pathing_grid"]._header
+            header[0] += 1
+            finish_write = threading.Timer(0.05, lambda: header.__setitem__(0, header[0] + 1))
+            finish_write.start()
+            game_loop, copy = grids.copy("pathing_grid")
+            finish_write.join()
+            assert header[0] % 2 == 0 and np.array_equal(copy, pathing_grid)
+
+            # An independent process can attach by name, and does not unlink the blocks when it exits
+            bot.game_info.pathing_grid.data_numpy[:5, :5] = 1
+            bot._update_shared_grids()
+            pathing_grid_sum = int(bot.game_info.pathing_grid.data_numpy.sum())
+            assert pathing_grid_sum > 25
+            output = subprocess.run(
+                [sys.executable, "-c", READ_PATHING_GRID, bot.shared_grids_name],
+                capture_output=True,
+                text=True,
+                check=True,
+                env={
+                    **os.environ, "PYTHONPATH": os.getcwd()
+                },
+            ).stdout.split()
+            assert output == [str(bot.state.game_loop), str(pathing_grid_sum)]
+        with SharedGridsReader(bot.shared_grids_name, grid_names=["pathing_grid"]) as grids:
+            assert grids["pathing_grid"].sum() == pathing_grid_sum
+    finally:
+        bot._release_resources()
+    with pytest.raises(FileNotFoundError):
+        SharedGridsReader(bot.shared_grids_name)
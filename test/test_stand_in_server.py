@@ -0,0 +1,49 @@
+import asyncio
+from test.test_pickled_data import MAPS
+from typing import List
+
+import pytest
+
+from sc2.bot_ai import BotAI
+from sc2.data import Race, Result
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.main import play_from_websocket
+from sc2.player import Bot
+from sc2.stand_in_server import StandInServer
+
+
+class StepCountingBot(BotAI):
+
+    def __init__(self):
+        self.game_loops: List[int] = []
+        self.result: Result = None
+
+    async def on_step(self, iteration: int):
+        self.game_loops.append(self.state.game_loop)
+        for townhall in self.townhalls:
+            townhall.train(UnitTypeId.SCV)
+        self.client.debug_text_screen(f"Iteration {iteration}", pos=(0.1, 0.1))
+
+    async def on_end(self, game_result: Result):
+        self.result = game_result
+
+
+@pytest.mark.parametrize("pipeline_requests", [False, True])
+def test_stand_in_server(pipeline_requests: bool):
+    bot = StepCountingBot()
+    bot.pipeline_requests = pipeline_requests
+
+    async def run():
+        async with StandInServer.from_pickle(MAPS[0], game_loops=400) as server:
+            result = await play_from_websocket(server.ws_url, Bot(Race.Terran, bot))
+            return result, server.request_counts
+
+    result, request_counts = asyncio.run(run())
+    assert result == Result.Victory and bot.result == Result.Victory
+    # The default game step is 4 game loops
+    assert bot.game_loops == list(range(0, 400, 4))
+    assert request_counts["step"] == 100
+    assert request_counts["action"] == 100
+    assert request_counts["debug"] == 100
+    # One observation after each step, the first one, and one with the result after the game ended
+    assert request_counts["observation"] == 102
@@ -0,0 +1,45 @@
+import csv
+import json
+
+from sc2.step_profiler import PHASES, StepProfiler
+
+
+def test_step_profiler(tmp_path):
+    profiler = StepProfiler(capacity=3)
+    assert len(profiler) == 0
+    assert profiler.summary() == {phase: 0.0 for phase in PHASES}
+    # Marks outside of an iteration are ignored
+    profiler.mark("prepare_units")
+
+    for iteration in range(5):
+        profiler.begin_iteration(iteration)
+        profiler.set_game_loop(8 * iteration)
+        start = int(profiler._timestamps[profiler._row, 0])
+        # The step is not recorded, e.g. in realtime
+        for phase_index, phase in enumerate(PHASES[:-1], start=1):
+            profiler.mark(phase, start + 1000 * phase_index)
+
+    # Only the last 3 iterations are stored, oldest first
+    assert len(profiler) == 3
+    assert profiler._iterations[profiler._ordered_rows()].tolist() == [2, 3, 4]
+    durations = profiler.durations_ns()
+    assert durations.shape == (3, len(PHASES))
+    assert (durations[:, :-1] == 1000).all()
+    assert (durations[:, -1] == 0).all()
+    assert profiler.summary()["on_step"] == 0.001
+
+    profiler.to_csv(tmp_path / "steps.csv")
+    with open(tmp_path / "steps.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["game_loop"] for row in rows] == ["16", "24", "32"]
+    assert all(float(row["on_step_us"]) == 1 for row in rows)
+
+    profiler.to_chrome_trace(tmp_path / "trace.json")
+    with open(tmp_path / "trace.json") as f:
+        events = json.load(f)["traceEvents"]
+    iterations = [event for event in events if event["name"] == "iteration"]
+    assert [event["args"]["iteration"] for event in iterations] == [2, 3, 4]
+    assert all(event["dur"] == len(PHASES) - 1 for event in iterations)
+    # Phases without duration are not exported
+    assert len(events) == 3 * len(PHASES)
+    assert not any(event["name"] == "step" for event in events)
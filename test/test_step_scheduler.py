@@ -0,0 +1,117 @@
+import asyncio
+import time
+from test.test_pickled_data import MAPS, get_map_specific_bot
+from typing import List
+
+from sc2.step_scheduler import DEFERRAL_WARNING_STEPS, StepScheduler
+
+
+def test_step_scheduler():
+    calls: List[str] = []
+
+    def make_task(name: str, duration: float = 0):
+
+        async def task():
+            calls.append(name)
+            if duration:
+                time.sleep(duration)
+
+        task.__name__ = name
+        return task
+
+    async def run():
+        scheduler = StepScheduler()
+        low = scheduler.add(make_task("low"), interval=8)
+        high = scheduler.add(make_task("high"), interval=16, priority=1)
+        slow = scheduler.add(make_task("slow", duration=0.02), interval=8, max_delay=16)
+        assert low.name == "low"
+
+        # Enough time left: all tasks run, highest priority first
+        await scheduler.run(0, deadline=time.perf_counter() + 10)
+        assert calls[0] == "high"
+        assert sorted(calls) == ["high", "low", "slow"]
+        assert slow.average_duration >= 0.02
+        assert (low.next_game_loop, high.next_game_loop) == (8, 16)
+
+        # Tasks are only run when they are due
+        calls.clear()
+        await scheduler.run(4, deadline=time.perf_counter() + 10)
+        assert not calls
+
+        # The slow task does not fit into the remaining time and is postponed, the others still run
+        calls.clear()
+        await scheduler.run(8, deadline=time.perf_counter() + 0.01)
+        assert calls == ["low"]
+        assert slow.deferrals == 1 and slow.is_due(12)
+
+        # Without any time left, tasks are postponed until they are overdue by max_delay
+        calls.clear()
+        await scheduler.run(16, deadline=time.perf_counter() - 1)
+        assert not calls
+        await scheduler.run(24, deadline=time.perf_counter() - 1)
+        assert calls == ["slow"]
+        assert slow.overruns == 1 and scheduler.overruns == 1
+        assert slow.next_game_loop == 32
+
+        scheduler.remove(low)
+        assert low not in scheduler.tasks
+
+    asyncio.run(run())
+
+
+def test_step_scheduler_task_longer_than_budget():
+    runs: List[int] = []
+
+    async def run():
+        scheduler = StepScheduler()
+
+        async def slow():
+            runs.append(len(runs))
+            time.sleep(0.03)
+
+        slow_task = scheduler.add(slow, interval=2)
+        other_task = scheduler.add(slow, interval=2, priority=-1)
+        # The task takes longer than the whole budget of a step, but still runs if it is the first task of the step
+        for game_loop in range(0, 20, 2):
+            await scheduler.run(game_loop, deadline=time.perf_counter() + 0.01)
+        assert slow_task.runs == 10 and slow_task.consecutive_deferrals == 0
+        # Tasks after it have to fit into the remaining time
+        assert other_task.runs == 0 and other_task.deferrals == 10
+        scheduler.remove(slow_task)
+
+        # Tasks which are postponed many steps in a row are counted, a warning is logged regularly
+        for game_loop in range(20, 20 + 2 * DEFERRAL_WARNING_STEPS, 2):
+            await scheduler.run(game_loop, deadline=time.perf_counter() - 1)
+        assert other_task.consecutive_deferrals == 10 + DEFERRAL_WARNING_STEPS
+
+    asyncio.run(run())
+
+
+def test_bot_ai_schedule():
+    bot = get_map_specific_bot(MAPS[0])
+    runs: List[int] = []
+
+    async def plan():
+        runs.append(bot.state.game_loop)
+
+    task = bot.schedule(plan, every_game_loops=8)
+    assert task.next_game_loop == bot.state.game_loop
+    # The step budget is measured from the end of _prepare_step
+    bot._time_before_step = time.perf_counter()
+    asyncio.run(bot._run_scheduled_tasks())
+    assert runs == [bot.state.game_loop]
+    asyncio.run(bot._run_scheduled_tasks())
+    assert len(runs) == 1
+
+    # Without realtime, SC2 waits for the bot and due tasks run even if the step took longer than its budget
+    task.next_game_loop = bot.state.game_loop
+    bot._time_before_step = time.perf_counter() - 10
+    asyncio.run(bot._run_scheduled_tasks())
+    assert len(runs) == 2
+    # In realtime games, they are postponed instead
+    bot.realtime = True
+    task.next_game_loop = bot.state.game_loop
+    asyncio.run(bot._run_scheduled_tasks())
+    assert len(runs) == 2 and task.deferrals == 1
+    bot.unschedule(task)
+    assert not bot.scheduler.tasks
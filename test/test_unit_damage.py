@@ -0,0 +1,179 @@
+import itertools
+from test.test_pickled_data import MAPS, build_bot_object_from_pickle_data, load_map_pickle_data
+
+import numpy as np
+import pytest
+from s2clientprotocol import raw_pb2 as raw_pb
+
+from sc2.bot_ai import BotAI
+from sc2.ids.buff_id import BuffId
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.ids.upgrade_id import UpgradeId
+from sc2.unit import Unit
+from sc2.units import Units
+
+# Attacker and defender types of test/damagetest_bot.py, and the units with hard coded rules
+ATTACKER_TYPES = [
+    UnitTypeId.PROBE,
+    UnitTypeId.ZEALOT,
+    UnitTypeId.ADEPT,
+    UnitTypeId.STALKER,
+    UnitTypeId.HIGHTEMPLAR,
+    UnitTypeId.DARKTEMPLAR,
+    UnitTypeId.ARCHON,
+    UnitTypeId.IMMORTAL,
+    UnitTypeId.COLOSSUS,
+    UnitTypeId.PHOENIX,
+    UnitTypeId.VOIDRAY,
+    UnitTypeId.ORACLE,
+    UnitTypeId.MOTHERSHIP,
+    UnitTypeId.TEMPEST,
+    UnitTypeId.SCV,
+    UnitTypeId.MARINE,
+    UnitTypeId.MARAUDER,
+    UnitTypeId.GHOST,
+    UnitTypeId.HELLION,
+    UnitTypeId.HELLIONTANK,
+    UnitTypeId.SIEGETANK,
+    UnitTypeId.THOR,
+    UnitTypeId.BANSHEE,
+    UnitTypeId.VIKINGFIGHTER,
+    UnitTypeId.VIKINGASSAULT,
+    UnitTypeId.BATTLECRUISER,
+    UnitTypeId.BUNKER,
+    UnitTypeId.DRONE,
+    UnitTypeId.ZERGLING,
+    UnitTypeId.QUEEN,
+    UnitTypeId.ROACH,
+    UnitTypeId.RAVAGER,
+    UnitTypeId.HYDRALISK,
+    UnitTypeId.MUTALISK,
+    UnitTypeId.CORRUPTOR,
+    UnitTypeId.ULTRALISK,
+    UnitTypeId.MISSILETURRET,
+    UnitTypeId.SPINECRAWLER,
+    UnitTypeId.SPORECRAWLER,
+    UnitTypeId.PLANETARYFORTRESS,
+    UnitTypeId.LARVA,
+]
+DEFENDER_TYPES = [
+    UnitTypeId.RAVAGER,
+    UnitTypeId.MULE,
+    UnitTypeId.MARAUDER,
+    UnitTypeId.ROACH,
+    UnitTypeId.HIGHTEMPLAR,
+    UnitTypeId.STALKER,
+    UnitTypeId.ZEALOT,
+    UnitTypeId.ULTRALISK,
+    UnitTypeId.PYLON,
+    UnitTypeId.SUPPLYDEPOT,
+    UnitTypeId.BUNKER,
+    UnitTypeId.MISSILETURRET,
+    UnitTypeId.PHOENIX,
+    UnitTypeId.VOIDRAY,
+    UnitTypeId.CORRUPTOR,
+    UnitTypeId.VIPER,
+    UnitTypeId.MEDIVAC,
+    UnitTypeId.BATTLECRUISER,
+    UnitTypeId.BARRACKSFLYING,
+    UnitTypeId.COLOSSUS,
+]
+FLYING_TYPES = {
+    UnitTypeId.PHOENIX,
+    UnitTypeId.VOIDRAY,
+    UnitTypeId.CORRUPTOR,
+    UnitTypeId.VIPER,
+    UnitTypeId.MEDIVAC,
+    UnitTypeId.BATTLECRUISER,
+    UnitTypeId.BARRACKSFLYING,
+}
+
+
+def _create_unit(bot: BotAI, template: raw_pb.Unit, tag: int, unit_type: UnitTypeId, alliance: int, **fields) -> Unit:
+    proto = raw_pb.Unit()
+    proto.CopyFrom(template)
+    proto.tag = tag
+    proto.unit_type = unit_type.value
+    proto.alliance = alliance
+    proto.is_flying = unit_type in FLYING_TYPES
+    buff_ids = fields.pop("buff_ids", [])
+    proto.ClearField("buff_ids")
+    proto.buff_ids.extend(buff.value for buff in buff_ids)
+    for name, value in fields.items():
+        setattr(proto, name, value)
+    return Unit(proto, bot)
+
+
+@pytest.mark.parametrize("map_path", MAPS[:1])
+def test_damage_matrix(map_path):
+    raw_game_data, raw_game_info, raw_observation = load_map_pickle_data(map_path)
+    bot = build_bot_object_from_pickle_data(raw_game_data, raw_game_info, raw_observation)
+    bot.state.upgrades = {
+        UpgradeId.HIGHCAPACITYBARRELS,
+        UpgradeId.ZERGLINGATTACKSPEED,
+        UpgradeId.EVOLVEGROOVEDSPINES,
+        UpgradeId.HISECAUTOTRACKING,
+        UpgradeId.CHITINOUSPLATING,
+    }
+    template = bot.workers.first._proto
+    tags = itertools.count(1)
+
+    attackers = Units([], bot)
+    for unit_type, alliance, attack_upgrade_level in itertools.product(ATTACKER_TYPES, [1, 4], [0, 2]):
+        attackers.append(
+            _create_unit(
+                bot,
+                template,
+                next(tags),
+                unit_type,
+                alliance,
+                attack_upgrade_level=attack_upgrade_level,
+                is_active=True,
+            )
+        )
+    attackers.append(
+        _create_unit(bot, template, next(tags), UnitTypeId.MARINE, 1, buff_ids=[BuffId.STIMPACK], is_active=True)
+    )
+    attackers.append(_create_unit(bot, template, next(tags), UnitTypeId.BUNKER, 4, is_active=False))
+    attackers.append(_create_unit(bot, template, next(tags), UnitTypeId.SPINECRAWLER, 4, build_progress=0.5))
+
+    defenders = Units([], bot)
+    for unit_type, buff_ids in itertools.product(
+        DEFENDER_TYPES, [[], [BuffId.GUARDIANSHIELD], [BuffId.RAVENSHREDDERMISSILETINT]]
+    ):
+        for alliance, health, shield, upgrade_level in [(4, 200, 0, 0), (1, 35, 0, 1), (4, 1, 1, 2), (1, 45, 10, 3)]:
+            defenders.append(
+                _create_unit(
+                    bot,
+                    template,
+                    next(tags),
+                    unit_type,
+                    alliance,
+                    buff_ids=buff_ids,
+                    health=health,
+                    shield=shield,
+                    armor_upgrade_level=upgrade_level,
+                    shield_upgrade_level=upgrade_level,
+                )
+            )
+
+    for ignore_armor, include_overkill_damage in itertools.product([False, True], [False, True]):
+        damage, attack_speed, attack_range = attackers.damage_matrix(defenders, ignore_armor, include_overkill_damage)
+        dps = attackers.dps_matrix(defenders, ignore_armor, include_overkill_damage)
+        assert damage.shape == attack_speed.shape == attack_range.shape == dps.shape == (len(attackers), len(defenders))
+        for i, attacker in enumerate(attackers):
+            for j, defender in enumerate(defenders):
+                expected = attacker.calculate_damage_vs_target(defender, ignore_armor, include_overkill_damage)
+                assert (damage[i, j], attack_speed[i, j], attack_range[i, j]) == pytest.approx(expected), (
+                    f"{attacker.type_id} vs {defender.type_id} {defender.buffs}, ignore_armor={ignore_armor}, "
+                    f"include_overkill_damage={include_overkill_damage}"
+                )
+                assert dps[i, j] == pytest.approx(
+                    attacker.calculate_dps_vs_target(defender, ignore_armor, include_overkill_damage)
+                )
+        # Some pairs have to deal damage, otherwise the test is not meaningful
+        assert np.count_nonzero(damage) > len(attackers) * len(defenders) // 4
+
+    # Empty groups
+    assert attackers.damage_matrix(Units([], bot))[0].shape == (len(attackers), 0)
+    assert Units([], bot).dps_matrix(defenders).shape == (0, len(defenders))
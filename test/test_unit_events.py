@@ -0,0 +1,156 @@
+import asyncio
+from test.test_pickled_data import MAPS, build_bot_object_from_pickle_data, load_map_pickle_data
+
+import pytest
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2.bot_ai import BotAI
+from sc2.game_state import GameState
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.ids.upgrade_id import UpgradeId
+
+
+class EventRecordingBot(BotAI):
+
+    def __init__(self, use_unit_snapshot: bool, persistent_units: bool = False):
+        self.use_unit_snapshot = use_unit_snapshot
+        self.persistent_units = persistent_units
+        self.events = []
+
+    async def on_unit_destroyed(self, unit_tag):
+        self.events.append(("destroyed", unit_tag))
+
+    async def on_unit_created(self, unit):
+        self.events.append(("created", unit.tag))
+
+    async def on_unit_type_changed(self, unit, previous_type):
+        self.events.append(("type_changed", unit.tag, previous_type, unit.type_id))
+
+    async def on_building_construction_started(self, unit):
+        self.events.append(("construction_started", unit.tag))
+
+    async def on_building_construction_complete(self, unit):
+        self.events.append(("construction_complete", unit.tag))
+
+    async def on_upgrade_complete(self, upgrade):
+        self.events.append(("upgrade", upgrade))
+
+    async def on_unit_took_damage(self, unit, amount_damage_taken):
+        self.events.append(("took_damage", unit.tag, amount_damage_taken))
+
+    async def on_units_took_damage(self, damaged_units):
+        self.events.append(("units_took_damage", [(unit.tag, amount) for unit, amount in damaged_units]))
+
+    async def on_enemy_unit_entered_vision(self, unit):
+        self.events.append(("entered_vision", unit.tag))
+
+    async def on_enemy_unit_left_vision(self, unit_tag):
+        self.events.append(("left_vision", unit_tag))
+
+
+def _add_unit(raw_observation: sc_pb.ResponseObservation, template, tag: int, unit_type: int, alliance: int, **fields):
+    unit = raw_observation.observation.raw_data.units.add()
+    unit.CopyFrom(template)
+    unit.tag = tag
+    unit.unit_type = unit_type
+    unit.alliance = alliance
+    for name, value in fields.items():
+        setattr(unit, name, value)
+    return unit
+
+
+@pytest.mark.parametrize("use_unit_snapshot", [False, True])
+@pytest.mark.parametrize("persistent_units", [False, True])
+def test_unit_events(use_unit_snapshot: bool, persistent_units: bool):
+    raw_game_data, raw_game_info, raw_observation = load_map_pickle_data(MAPS[0])
+    raw_units = raw_observation.observation.raw_data.units
+    template = next(unit for unit in raw_units if unit.alliance == 1 and unit.unit_type == UnitTypeId.SCV.value)
+    # Enemies that are in vision in the first frame
+    _add_unit(raw_observation, template, 9001, UnitTypeId.ZERGLING.value, 4)
+    _add_unit(raw_observation, template, 9002, UnitTypeId.ZERGLING.value, 4)
+    _add_unit(raw_observation, template, 9003, UnitTypeId.HATCHERY.value, 4)
+
+    bot = EventRecordingBot(use_unit_snapshot, persistent_units)
+    build_bot_object_from_pickle_data(
+        raw_game_data, raw_game_info, sc_pb.ResponseObservation().FromString(raw_observation.SerializeToString()), bot
+    )
+
+    def step():
+        raw_observation.observation.game_loop += 4
+        # Units keep a reference to their raw unit, so each frame gets its own copy
+        bot._prepare_step(GameState(sc_pb.ResponseObservation().FromString(raw_observation.SerializeToString())))
+        bot.events.clear()
+        asyncio.run(bot.issue_events())
+        return bot.events
+
+    # The first frame is compared to an empty frame
+    asyncio.run(bot.issue_events())
+    scv_tags = sorted(unit.tag for unit in bot.workers)
+    townhall_tag = bot.townhalls.first.tag
+    assert sorted(tag for name, tag in bot.events if name == "created") == scv_tags
+    assert ("construction_complete", townhall_tag) in bot.events
+    assert {event for event in bot.events if event[0] == "entered_vision"} == {
+        ("entered_vision", 9001),
+        ("entered_vision", 9002),
+        ("entered_vision", 9003),
+    }
+    assert bot._units_created[UnitTypeId.SCV] == 12
+    assert bot._units_created[UnitTypeId.COMMANDCENTER] == 1
+
+    # Nothing changed
+    assert step() == []
+
+    dead_tag, damaged_tag, morphed_tag = scv_tags[:3]
+    units_by_tag = {unit.tag: unit for unit in raw_units}
+    units_by_tag[damaged_tag].health -= 5
+    units_by_tag[morphed_tag].unit_type = UnitTypeId.MULE.value
+    units_by_tag[townhall_tag].health -= 100
+    raw_units.remove(units_by_tag[dead_tag])
+    raw_units.remove(next(unit for unit in raw_units if unit.tag == 9001))
+    raw_observation.observation.raw_data.event.dead_units.append(dead_tag)
+    _add_unit(raw_observation, template, 9004, UnitTypeId.ZERGLING.value, 4)
+    _add_unit(raw_observation, template, 9005, UnitTypeId.SCV.value, 1)
+    _add_unit(raw_observation, template, 9006, UnitTypeId.SUPPLYDEPOT.value, 1, build_progress=0.5)
+    raw_observation.observation.raw_data.player.upgrade_ids.append(UpgradeId.STIMPACK.value)
+    events = step()
+    assert bot._units_previous_map[damaged_tag].health == bot.units.by_tag(damaged_tag).health + 5
+    assert dead_tag in bot._all_units_previous_map and 9005 not in bot._all_units_previous_map
+    assert set(bot._enemy_units_previous_map) == {9001, 9002}
+    assert set(bot._enemy_structures_previous_map) == {9003}
+    assert events == [
+        ("destroyed", dead_tag),
+        ("took_damage", damaged_tag, 5),
+        ("type_changed", morphed_tag, UnitTypeId.SCV, UnitTypeId.MULE),
+        ("created", 9005),
+        ("took_damage", townhall_tag, 100),
+        ("construction_started", 9006),
+        ("units_took_damage", [(damaged_tag, 5), (townhall_tag, 100)]),
+        ("upgrade", UpgradeId.STIMPACK),
+        ("entered_vision", 9004),
+        ("left_vision", 9001),
+    ]
+    assert bot._units_created[UnitTypeId.SCV] == 13
+
+    raw_observation.observation.raw_data.event.ClearField("dead_units")
+    next(unit for unit in raw_units if unit.tag == 9006).build_progress = 1
+    assert step() == [("construction_complete", 9006)]
+    assert bot._units_created[UnitTypeId.SUPPLYDEPOT] == 1
+
+
+class SilentBot(BotAI):
+
+    async def on_step(self, iteration: int):
+        pass
+
+
+@pytest.mark.parametrize("use_unit_snapshot", [False, True])
+def test_unit_events_without_hooks(use_unit_snapshot: bool):
+    raw_game_data, raw_game_info, raw_observation = load_map_pickle_data(MAPS[0])
+    bot = SilentBot()
+    bot.use_unit_snapshot = use_unit_snapshot
+    build_bot_object_from_pickle_data(raw_game_data, raw_game_info, raw_observation, bot)
+    assert bot._overridden_event_hooks() == set()
+    asyncio.run(bot.issue_events())
+    # Bookkeeping of created units does not depend on the hooks
+    assert bot._units_created[UnitTypeId.SCV] == 12
+    assert bot._units_created[UnitTypeId.COMMANDCENTER] == 1